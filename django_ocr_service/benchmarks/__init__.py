@@ -0,0 +1,62 @@
+"""
+Micro-benchmarks for the OCR pipeline. Run from the django_ocr_service directory as
+python -m benchmarks.<module_name>
+"""
+import os
+import time
+
+import django
+from PyPDF2 import PdfFileReader, PdfFileWriter
+
+TESTDATA_PDF = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "tests",
+    "testdata",
+    "sample-test-pdf.pdf",
+)
+
+
+def setup_django():
+    """
+    Configures django so benchmarks can import the ocr app outside manage.py
+
+    :return:
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_ocr_service.settings")
+    django.setup()
+
+
+def time_call(func, repeat: int = 3, **kwargs):
+    """
+    Returns best wall time in seconds of func over repeat runs and the last result
+
+    :param func:
+    :param repeat:
+    :param kwargs:
+    :return:
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(**kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def make_pdf(path: str, page_count: int):
+    """
+    Writes a pdf repeating the pages of the test pdf
+
+    :param path:
+    :param page_count:
+    :return:
+    """
+    with open(TESTDATA_PDF, "rb") as source_file:
+        reader = PdfFileReader(source_file)
+        writer = PdfFileWriter()
+        for page in range(page_count):
+            writer.addPage(reader.getPage(page % reader.numPages))
+        with open(path, "wb") as output_file:
+            writer.write(output_file)
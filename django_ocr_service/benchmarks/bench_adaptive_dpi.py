@@ -0,0 +1,159 @@
+"""
+Compares fixed 300 dpi rendering followed by the IMAGE_SIZE upscale against adaptive
+DPI selection. Reports pixels processed, time per page and word recall against the
+text layer of the test pdf, on its pages at their own size and scaled to a large format
+"""
+import argparse
+from collections import Counter
+import os
+import re
+import tempfile
+import time
+
+from . import setup_django
+
+setup_django()
+
+from django.test import override_settings  # noqa: E402
+from PyPDF2 import PdfFileReader, PdfFileWriter  # noqa: E402
+
+from ocr.adaptive_resolution import select_page_dpis  # noqa: E402
+from ocr.image_preprocessing import preprocess_image_for_ocr  # noqa: E402
+from ocr.ocr_utils import (  # noqa: E402
+    extract_pdf_text_layer,
+    iter_pdf_to_image,
+    ocr_using_tesseract_engine,
+)
+
+TEXT_LAYER_PDF = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "tests",
+    "testdata",
+    "sample-text-layer-pdf.pdf",
+)
+
+
+def make_scaled_pdf(path: str, scale: float):
+    """
+    Writes the text layer pdf with every page scaled by scale
+
+    :param path:
+    :param scale:
+    :return:
+    """
+    with open(TEXT_LAYER_PDF, "rb") as source_file:
+        reader = PdfFileReader(source_file)
+        writer = PdfFileWriter()
+        for page_index in range(reader.numPages):
+            page = reader.getPage(page_index)
+            if scale != 1:
+                page.scaleBy(scale)
+            writer.addPage(page)
+        with open(path, "wb") as output_file:
+            writer.write(output_file)
+
+
+def count_words(text: str):
+    """
+
+    :param text:
+    :return: Counter of lower case words
+    """
+    return Counter(re.findall(r"\w+", text.lower()))
+
+
+def word_recall(ocr_text: str, ground_truth: str):
+    """
+    Share of ground truth words found in the OCR text, counting repeated words
+
+    :param ocr_text:
+    :param ground_truth:
+    :return:
+    """
+    expected = count_words(ground_truth)
+    if not expected:
+        return None
+    found = count_words(ocr_text)
+    return sum(min(count, found[word]) for word, count in expected.items()) / sum(
+        expected.values()
+    )
+
+
+def run_mode(pdf_path: str, output_folder: str, adaptive: bool, run_ocr: bool):
+    """
+    Renders, preprocesses and optionally OCRs every page
+
+    :param pdf_path:
+    :param output_folder:
+    :param adaptive:
+    :param run_ocr:
+    :return: Page count, pixels processed, seconds and OCR text per page
+    """
+    pixels = 0
+    texts = []
+    start = time.perf_counter()
+    with override_settings(OCR_ADAPTIVE_DPI=adaptive):
+        page_dpis = None
+        with open(pdf_path, "rb") as pdf_file:
+            pdf_reader = PdfFileReader(pdf_file)
+            pages = list(range(1, pdf_reader.numPages + 1))
+            if adaptive:
+                page_dpis = select_page_dpis(pdf_reader, pages)
+
+        for image_path in iter_pdf_to_image(
+            pdf_path, output_folder=output_folder, pages=pages, page_dpis=page_dpis
+        ):
+            image = preprocess_image_for_ocr(image_path, in_memory=True)
+            pixels += image.size
+            if run_ocr:
+                texts.append(ocr_using_tesseract_engine(image, in_memory=True))
+            os.remove(image_path)
+
+    return len(pages), pixels, time.perf_counter() - start, texts
+
+
+def main():
+    """
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scales", type=float, nargs="+", default=[1.0, 2.0])
+    parser.add_argument("--skip-ocr", action="store_true")
+    args = parser.parse_args()
+
+    ground_truth = extract_pdf_text_layer(TEXT_LAYER_PDF, min_chars=1)
+    print(
+        f"{'scale':>5} {'mode':>8} {'Mpixels/page':>12} {'s/page':>7} {'word recall':>11}"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for scale in args.scales:
+            pdf_path = os.path.join(tmp_dir, f"scaled-{scale}.pdf")
+            make_scaled_pdf(pdf_path, scale)
+
+            for mode in ("fixed", "adaptive"):
+                try:
+                    page_count, pixels, seconds, texts = run_mode(
+                        pdf_path,
+                        output_folder=os.path.join(tmp_dir, mode),
+                        adaptive=mode == "adaptive",
+                        run_ocr=not args.skip_ocr,
+                    )
+                except Exception as exception:
+                    print(f"{scale:>5} {mode:>8} failed - {exception}")
+                    continue
+
+                recalls = [
+                    word_recall(text, ground_truth.get(page_number, ""))
+                    for page_number, text in enumerate(texts, start=1)
+                ]
+                recalls = [recall for recall in recalls if recall is not None]
+                recall = f"{sum(recalls) / len(recalls):.3f}" if recalls else "n/a"
+                print(
+                    f"{scale:>5} {mode:>8} {pixels / page_count / 1e6:>12.2f} "
+                    f"{seconds / page_count:>7.2f} {recall:>11}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Reports bytes per page and encode time per archive format for rendered test pages
+"""
+import argparse
+import os
+import shutil
+import tempfile
+
+from . import TESTDATA_PDF, setup_django, time_call
+
+setup_django()
+
+from ocr.archival import ARCHIVE_FORMATS, encode_archival_image  # noqa: E402
+from ocr.ocr_utils import pdf_to_image  # noqa: E402
+
+TESTDATA_IMAGE = os.path.join(os.path.dirname(TESTDATA_PDF), "test-image.png")
+
+
+def render_pages(output_folder: str, dpi: int):
+    """
+    Renders the test pdf, falling back to the test image if poppler is not installed
+
+    :param output_folder:
+    :param dpi:
+    :return:
+    """
+    try:
+        return pdf_to_image(TESTDATA_PDF, output_folder=output_folder, dpi=dpi)
+    except Exception as exception:
+        print(f"Rendering the test pdf failed, using the test image - {exception}")
+        image_path = os.path.join(output_folder, "test-image.png")
+        shutil.copy(TESTDATA_IMAGE, image_path)
+        return [image_path]
+
+
+def main():
+    """
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--quality", type=int, default=75)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pages = render_pages(tmp_dir, args.dpi)
+        print(f"{len(pages)} pages at {args.dpi} dpi, quality {args.quality}")
+        print(f"{'format':>8} {'bytes/page':>11} {'ratio':>6} {'encode ms/page':>15}")
+
+        png_bytes = sum(os.path.getsize(page) for page in pages) / len(pages)
+        for archive_format in ARCHIVE_FORMATS:
+            encode_seconds = 0.0
+            encoded_bytes = 0
+            for page_number, page in enumerate(pages):
+                output_path = os.path.join(
+                    tmp_dir, f"archived-{page_number}.{archive_format}"
+                )
+                seconds, _ = time_call(
+                    encode_archival_image,
+                    repeat=args.repeat,
+                    image_path=page,
+                    archive_format=archive_format,
+                    quality=args.quality,
+                    output_path=output_path,
+                )
+                encode_seconds += seconds
+                encoded_bytes += os.path.getsize(output_path)
+
+            bytes_per_page = encoded_bytes / len(pages)
+            print(
+                f"{archive_format:>8} {bytes_per_page:>11.0f} "
+                f"{bytes_per_page / png_bytes:>6.2f} "
+                f"{encode_seconds * 1000 / len(pages):>15.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
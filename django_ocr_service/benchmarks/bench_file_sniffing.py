@@ -0,0 +1,105 @@
+"""
+Compares full-parse is_pdf/is_image plus pdfinfo against single-pass file sniffing
+on large synthetic PDFs and multi-frame TIFFs
+"""
+import argparse
+import os
+import tempfile
+
+import cv2
+from PIL import Image
+from PyPDF2 import PdfFileReader
+
+from . import make_pdf, setup_django, time_call
+
+setup_django()
+
+from ocr.file_sniffing import sniff_file  # noqa: E402
+from ocr.ocr_utils import get_pdf_page_count  # noqa: E402
+
+PAGE_COUNTS = [10, 100, 500]
+
+
+def make_tiff(path: str, page_count: int):
+    """
+    Writes a multi-frame A4 sized tiff at 150 dpi
+
+    :param path:
+    :param page_count:
+    :return:
+    """
+    frames = [Image.new("L", (1240, 1754), 255) for _ in range(page_count)]
+    frames[0].save(path, save_all=True, append_images=frames[1:])
+
+
+def full_parse(filepath: str):
+    """
+    Type detection and page count as done before sniffing
+
+    :param filepath:
+    :return:
+    """
+    try:
+        with open(filepath, "rb") as pdf_file:
+            if PdfFileReader(pdf_file).numPages > 0:
+                try:
+                    return "pdf", get_pdf_page_count(filepath)
+                except Exception:
+                    # pdfinfo is not installed, fall back to a second parse
+                    with open(filepath, "rb") as pdf_file_again:
+                        return "pdf", PdfFileReader(pdf_file_again).numPages
+    except Exception:
+        pass
+
+    if cv2.imread(filepath) is not None:
+        return "image", 1
+    return None, 0
+
+
+def sniffed(filepath: str):
+    """
+
+    :param filepath:
+    :return:
+    """
+    with sniff_file(filepath) as sniffed_file:
+        return sniffed_file.file_type, sniffed_file.page_count
+
+
+def main():
+    """
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'fixture':>12} {'full (s)':>9} {'sniff (s)':>10} full result / sniff result"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for page_count in PAGE_COUNTS:
+            pdf_path = os.path.join(tmp_dir, f"{page_count}.pdf")
+            tiff_path = os.path.join(tmp_dir, f"{page_count}.tiff")
+            make_pdf(pdf_path, page_count)
+            make_tiff(tiff_path, page_count)
+
+            for name, path in (
+                (f"pdf-{page_count}", pdf_path),
+                (f"tiff-{page_count}", tiff_path),
+            ):
+                full_time, full_result = time_call(
+                    full_parse, repeat=args.repeat, filepath=path
+                )
+                sniff_time, sniff_result = time_call(
+                    sniffed, repeat=args.repeat, filepath=path
+                )
+                print(
+                    f"{name:>12} {full_time:>9.4f} {sniff_time:>10.4f} "
+                    f"{full_result} / {sniff_result}"
+                )
+
+
+if __name__ == "__main__":
+    main()
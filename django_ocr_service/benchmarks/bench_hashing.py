@@ -0,0 +1,51 @@
+"""
+Compares checksum.get_for_file against chunked BLAKE2 hashing and the hash recorded
+while a file is written, on synthetic inputs of increasing size
+"""
+import argparse
+import os
+import tempfile
+
+import checksum
+
+from . import setup_django, time_call
+
+setup_django()
+
+from ocr.hashing import get_file_checksum, hash_file, write_and_hash_file  # noqa: E402
+
+SIZES_MB = [1, 16, 128]
+
+
+def main():
+    """
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'size (MB)':>9} {'checksum (s)':>12} {'blake2b (s)':>11} {'remembered (s)':>14}"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size_mb in SIZES_MB:
+            path = os.path.join(tmp_dir, f"{size_mb}.bin")
+            write_and_hash_file(path, os.urandom(size_mb * 1024 * 1024))
+
+            checksum_time, _ = time_call(
+                checksum.get_for_file, repeat=args.repeat, fp=path
+            )
+            blake2_time, _ = time_call(hash_file, repeat=args.repeat, filepath=path)
+            remembered_time, _ = time_call(
+                get_file_checksum, repeat=args.repeat, filepath=path
+            )
+            print(
+                f"{size_mb:>9} {checksum_time:>12.4f} {blake2_time:>11.4f} "
+                f"{remembered_time:>14.6f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+OCRs sparse and dense pages whole and by text regions, reporting the pixels fed to
+tesseract, region detection time and, when tesseract is installed, OCR time per page
+"""
+import argparse
+import shutil
+import time
+
+import cv2
+import numpy as np
+
+from . import setup_django
+
+setup_django()
+
+from ocr.layout_segmentation import find_text_regions  # noqa: E402
+from ocr.ocr_utils import (  # noqa: E402
+    ocr_using_layout_regions,
+    ocr_using_tesseract_engine,
+)
+
+PAGE_SHAPE = (3300, 2550)
+LINE = "the quick brown fox jumps over the lazy dog 0123456789"
+
+
+def make_pages():
+    """
+    Letter pages at 300 dpi, a sparse letter with a photo and a dense page of text
+
+    :return: Dictionary of page kind to grayscale array
+    """
+    sparse = np.full(PAGE_SHAPE, 255, dtype=np.uint8)
+    cv2.putText(sparse, "Invoice 42", (150, 300), cv2.FONT_HERSHEY_SIMPLEX, 3, 0, 6)
+    sparse[500:1400, 1300:2300] = 60
+    for top in range(2600, 3000, 90):
+        cv2.putText(sparse, LINE, (150, top), cv2.FONT_HERSHEY_SIMPLEX, 1.8, 0, 4)
+
+    dense = np.full(PAGE_SHAPE, 255, dtype=np.uint8)
+    for top in range(200, PAGE_SHAPE[0] - 100, 90):
+        cv2.putText(dense, LINE, (150, top), cv2.FONT_HERSHEY_SIMPLEX, 2.2, 0, 4)
+
+    return {"sparse": sparse, "dense": dense}
+
+
+def main():
+    """
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    has_tesseract = shutil.which("tesseract") is not None
+
+    print(
+        f"{'page':>7} {'regions':>8} {'pixels OCRed':>13} {'detect (ms)':>12}"
+        f" {'whole OCR (s)':>14} {'region OCR (s)':>15}"
+    )
+    for kind, page in make_pages().items():
+        best = None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            regions = find_text_regions(page)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        region_pixels = (
+            sum(width * height for _, _, width, height in regions)
+            if regions
+            else page.size
+        )
+        whole_seconds = region_seconds = "n/a"
+        if has_tesseract:
+            start = time.perf_counter()
+            ocr_using_tesseract_engine(page)
+            whole_seconds = f"{time.perf_counter() - start:.2f}"
+            start = time.perf_counter()
+            ocr_using_layout_regions(page)
+            region_seconds = f"{time.perf_counter() - start:.2f}"
+
+        print(
+            f"{kind:>7} {len(regions) if regions else 0:>8} "
+            f"{region_pixels / page.size:>13.0%} {best * 1000:>12.1f}"
+            f" {whole_seconds:>14} {region_seconds:>15}"
+        )
+
+
+if __name__ == "__main__":
+    main()
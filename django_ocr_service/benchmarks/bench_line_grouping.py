@@ -0,0 +1,87 @@
+"""
+Compares the legacy and sweep line grouping engines over synthetic word tables
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from . import setup_django, time_call
+
+setup_django()
+
+from ocr.ocr_utils import generate_text_from_ocr_output  # noqa: E402
+
+WORD_COUNTS = [100, 500, 1000, 5000, 20000]
+WORDS = np.array(["invoice", "total", "12.50", "qty", "item", "", " "], dtype=object)
+
+
+def make_word_table(word_count: int, seed: int = 0):
+    """
+    Builds a dataframe shaped like pytesseract data.frame output with roughly
+    twelve words per line and a couple of block level rows without text
+
+    :param word_count:
+    :param seed:
+    :return:
+    """
+    rng = np.random.default_rng(seed)
+    line_count = max(1, word_count // 12)
+    line_number = rng.integers(0, line_count, word_count)
+    words = pd.DataFrame(
+        {
+            "top": line_number * 40 + rng.integers(-6, 7, word_count) + 50,
+            "height": rng.integers(18, 32, word_count),
+            "left": rng.integers(0, 2400, word_count),
+            "text": WORDS[rng.integers(0, len(WORDS), word_count)],
+        }
+    )
+    blocks = pd.DataFrame(
+        {
+            "top": [0, 40],
+            "height": [line_count * 40 + 100, line_count * 20],
+            "left": [0, 0],
+            "text": [np.nan, np.nan],
+        }
+    )
+    return pd.concat([blocks, words], ignore_index=True)
+
+
+def main():
+    """
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-legacy-words", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'words':>8} {'legacy (s)':>12} {'sweep (s)':>12} {'speedup':>9} same")
+    for word_count in WORD_COUNTS:
+        table = make_word_table(word_count)
+        sweep_time, sweep_text = time_call(
+            generate_text_from_ocr_output,
+            repeat=args.repeat,
+            ocr_dataframe=table,
+            line_grouping="sweep",
+        )
+
+        if word_count > args.max_legacy_words:
+            print(f"{word_count:>8} {'skipped':>12} {sweep_time:>12.4f} {'-':>9} -")
+            continue
+
+        legacy_time, legacy_text = time_call(
+            generate_text_from_ocr_output,
+            repeat=args.repeat,
+            ocr_dataframe=table,
+            line_grouping="legacy",
+        )
+        print(
+            f"{word_count:>8} {legacy_time:>12.4f} {sweep_time:>12.4f} "
+            f"{legacy_time / sweep_time:>8.1f}x {legacy_text == sweep_text}"
+        )
+
+
+if __name__ == "__main__":
+    main()
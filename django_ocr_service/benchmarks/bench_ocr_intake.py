@@ -0,0 +1,92 @@
+"""
+Load tests POST /api/ocr/ of a running service with pdfs of increasing page count.
+With ASYNC_OCR_INTAKE the request latency should not depend on the page count
+
+python -m benchmarks.bench_ocr_intake --url http://localhost:8000 --username admin --password ...
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from . import make_pdf
+
+PAGE_COUNTS = [1, 10, 50, 200]
+
+
+def get_token(url: str, username: str, password: str):
+    """
+
+    :param url:
+    :param username:
+    :param password:
+    :return:
+    """
+    response = requests.get(f"{url}/api/get-token/", auth=(username, password))
+    response.raise_for_status()
+    return response.json()["token"]
+
+
+def post_file(url: str, token: str, filepath: str):
+    """
+    Uploads a file for OCR and returns the request latency and status code
+
+    :param url:
+    :param token:
+    :param filepath:
+    :return:
+    """
+    with open(filepath, "rb") as upload_file:
+        start = time.perf_counter()
+        response = requests.post(
+            f"{url}/api/ocr/",
+            headers={"Authorization": f"Token {token}"},
+            files={"file": upload_file},
+        )
+    return time.perf_counter() - start, response.status_code
+
+
+def main():
+    """
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    token = get_token(args.url, args.username, args.password)
+
+    print(f"{'pages':>6} {'p50 (s)':>9} {'p95 (s)':>9} {'max (s)':>9} statuses")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for page_count in PAGE_COUNTS:
+            pdf_path = os.path.join(tmp_dir, f"{page_count}.pdf")
+            make_pdf(pdf_path, page_count)
+
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                results = list(
+                    executor.map(
+                        lambda _: post_file(args.url, token, pdf_path),
+                        range(args.requests),
+                    )
+                )
+
+            latencies = sorted(latency for latency, _ in results)
+            statuses = sorted({status_code for _, status_code in results})
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            print(
+                f"{page_count:>6} {statistics.median(latencies):>9.3f} {p95:>9.3f} "
+                f"{latencies[-1]:>9.3f} {statuses}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Preprocesses a mix of rendered, fax and scanned pages with and without
+OCR_AUTO_SKIP_PREPROCESSING, reporting time per page, classifier time and the CPU time
+the skip stats estimate was saved
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from . import setup_django
+
+setup_django()
+
+from django.test import override_settings  # noqa: E402
+
+from ocr.page_quality import get_preprocessing_skip_stats  # noqa: E402
+from ocr.preprocessing_profiles import run_preprocessing_profile  # noqa: E402
+
+PAGE_SHAPE = (3300, 2550)
+
+
+def make_pages(output_folder: str):
+    """
+    Letter pages at 300 dpi, rendered in grey with anti-aliased text, as a 1-bit fax
+    and as a noisy scan
+
+    :param output_folder:
+    :return: Dictionary of page kind to path
+    """
+    rendered = np.full(PAGE_SHAPE, 255, dtype=np.uint8)
+    for top in range(200, PAGE_SHAPE[0] - 200, 90):
+        cv2.putText(
+            rendered,
+            "the quick brown fox jumps over the lazy dog 0123456789",
+            (150, top),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            1.8,
+            0,
+            4,
+            cv2.LINE_AA,
+        )
+    rng = np.random.default_rng(0)
+    scanned = np.clip(rendered * 0.9 + rng.normal(0, 6, PAGE_SHAPE), 0, 255).astype(
+        np.uint8
+    )
+
+    pages = {}
+    for kind, image in (
+        ("rendered", Image.fromarray(rendered)),
+        ("fax", Image.fromarray(rendered).convert("1")),
+        ("scanned", Image.fromarray(scanned)),
+    ):
+        pages[kind] = os.path.join(output_folder, f"{kind}.png")
+        image.save(pages[kind])
+    return pages
+
+
+def main():
+    """
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pages = make_pages(tmp_dir)
+        print(f"{'page':>9} {'full (ms)':>10} {'auto skip (ms)':>15}")
+
+        total = {False: 0.0, True: 0.0}
+        stats_before = get_preprocessing_skip_stats()
+        for kind, path in pages.items():
+            page_times = {}
+            for auto_skip in (False, True):
+                with override_settings(OCR_AUTO_SKIP_PREPROCESSING=auto_skip):
+                    best = None
+                    for _ in range(args.repeat):
+                        start = time.perf_counter()
+                        run_preprocessing_profile(path, profile="default")
+                        elapsed = time.perf_counter() - start
+                        best = elapsed if best is None else min(best, elapsed)
+                page_times[auto_skip] = best
+                total[auto_skip] += best
+            print(
+                f"{kind:>9} {page_times[False] * 1000:>10.1f} "
+                f"{page_times[True] * 1000:>15.1f}"
+            )
+
+        stats = get_preprocessing_skip_stats()
+        classified = stats["pages_classified"] - stats_before["pages_classified"]
+        skipped = stats["pages_skipped"] - stats_before["pages_skipped"]
+        classifier_seconds = (
+            stats["classifier_seconds"] - stats_before["classifier_seconds"]
+        )
+        seconds_saved = stats["seconds_saved"] - stats_before["seconds_saved"]
+        print(
+            f"Measured saving {(total[False] - total[True]) * 1000:.1f}ms per run of "
+            f"{len(pages)} pages. {skipped} of {classified} pages skipped, classifier "
+            f"{classifier_seconds * 1000 / args.repeat:.1f}ms and estimated net saving "
+            f"{seconds_saved * 1000 / args.repeat:.1f}ms per run"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Times each stage of the legacy remove_noise_and_smooth against the fused kernel on a
+letter page at 300 dpi, along with peak memory allocated per page
+"""
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from . import setup_django
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+
+from ocr.image_preprocessing import (  # noqa: E402
+    ADAPTIVE_BLOCK_SIZE,
+    ADAPTIVE_C,
+    remove_noise_and_smooth_fused,
+    remove_noise_and_smooth_legacy,
+)
+from tests.help_testutils import TESTFILE_IMAGE_PATH  # noqa: E402
+
+PAGE_SHAPE = (3300, 2550)
+
+
+def make_page():
+    """
+    Letter page at 300 dpi tiled from the test image
+
+    :return:
+    """
+    tile = cv2.imread(TESTFILE_IMAGE_PATH, 0)
+    reps = (-(-PAGE_SHAPE[0] // tile.shape[0]), -(-PAGE_SHAPE[1] // tile.shape[1]))
+    return np.ascontiguousarray(np.tile(tile, reps)[: PAGE_SHAPE[0], : PAGE_SHAPE[1]])
+
+
+def legacy_stages(img):
+    """
+    Stages of remove_noise_and_smooth_legacy, each taking the previous results
+
+    :param img:
+    :return: List of (stage name, function of the results dictionary)
+    """
+    kernel = np.ones((1, 1), np.uint8)
+    threshold = settings.BINARY_THRESHOLD
+    otsu = cv2.THRESH_BINARY + cv2.THRESH_OTSU
+    return [
+        (
+            "adaptive threshold",
+            lambda r: cv2.adaptiveThreshold(
+                img.astype(np.uint8),
+                255,
+                cv2.ADAPTIVE_THRESH_MEAN_C,
+                cv2.THRESH_BINARY,
+                ADAPTIVE_BLOCK_SIZE,
+                ADAPTIVE_C,
+            ),
+        ),
+        (
+            "open 1x1",
+            lambda r: cv2.morphologyEx(r["adaptive threshold"], cv2.MORPH_OPEN, kernel),
+        ),
+        (
+            "close 1x1",
+            lambda r: cv2.morphologyEx(r["open 1x1"], cv2.MORPH_CLOSE, kernel),
+        ),
+        (
+            "threshold",
+            lambda r: cv2.threshold(img, threshold, 255, cv2.THRESH_BINARY)[1],
+        ),
+        ("otsu", lambda r: cv2.threshold(r["threshold"], 0, 255, otsu)[1]),
+        ("blur 1x1", lambda r: cv2.GaussianBlur(r["otsu"], (1, 1), 0)),
+        ("otsu again", lambda r: cv2.threshold(r["blur 1x1"], 0, 255, otsu)[1]),
+        ("or", lambda r: cv2.bitwise_or(r["otsu again"], r["close 1x1"])),
+    ]
+
+
+def fused_stages(img):
+    """
+    Stages of remove_noise_and_smooth_fused writing to preallocated buffers
+
+    :param img:
+    :return: List of (stage name, function of the results dictionary)
+    """
+    out = np.empty_like(img)
+    smooth = np.empty_like(img)
+    return [
+        (
+            "threshold",
+            lambda r: cv2.threshold(
+                img, settings.BINARY_THRESHOLD, 255, cv2.THRESH_BINARY, dst=smooth
+            )[1],
+        ),
+        (
+            "adaptive threshold",
+            lambda r: cv2.adaptiveThreshold(
+                img,
+                255,
+                cv2.ADAPTIVE_THRESH_MEAN_C,
+                cv2.THRESH_BINARY,
+                ADAPTIVE_BLOCK_SIZE,
+                ADAPTIVE_C,
+                dst=out,
+            ),
+        ),
+        ("or", lambda r: cv2.bitwise_or(out, smooth, dst=out)),
+    ]
+
+
+def time_stages(stages, repeat: int):
+    """
+    Best wall time in milliseconds of each stage over repeat runs
+
+    :param stages:
+    :param repeat:
+    :return: List of (stage name, milliseconds)
+    """
+    best = {}
+    for _ in range(repeat):
+        results = {}
+        for name, stage in stages:
+            start = time.perf_counter()
+            results[name] = stage(results)
+            elapsed = (time.perf_counter() - start) * 1000
+            best[name] = min(best.get(name, elapsed), elapsed)
+    return [(name, best[name]) for name, _ in stages]
+
+
+def peak_allocated_mb(func, **kwargs):
+    """
+    Peak memory allocated by one call of func, after a warm up call
+
+    :param func:
+    :param kwargs:
+    :return:
+    """
+    func(**kwargs)
+    tracemalloc.start()
+    func(**kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def main():
+    """
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    page = make_page()
+    in_place_page = page.copy()
+    assert np.array_equal(
+        remove_noise_and_smooth_fused(page), remove_noise_and_smooth_legacy(page)
+    )
+    print(f"Page {page.shape[1]}x{page.shape[0]}, {page.nbytes / 1024 / 1024:.1f} MB")
+
+    for kernel, stages in (
+        ("legacy", legacy_stages(page)),
+        ("fused", fused_stages(page)),
+    ):
+        stage_times = time_stages(stages, repeat=args.repeat)
+        print(f"{kernel}")
+        for name, milliseconds in stage_times:
+            print(f"  {name:>20} {milliseconds:>8.2f} ms")
+        print(f"  {'total':>20} {sum(ms for _, ms in stage_times):>8.2f} ms")
+
+    legacy_mb = peak_allocated_mb(remove_noise_and_smooth_legacy, img=page)
+    fused_mb = peak_allocated_mb(remove_noise_and_smooth_fused, img=page)
+    in_place_mb = peak_allocated_mb(
+        remove_noise_and_smooth_fused, img=in_place_page, out=in_place_page
+    )
+    print(
+        f"Peak allocated per page - legacy {legacy_mb:.1f} MB, fused {fused_mb:.1f} MB, "
+        f"fused in place {in_place_mb:.1f} MB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Compares enqueue time, task count and pickled payload size of one async task per
+page against batched fan-out. Tasks go to a separate
+queue of the configured django-q broker which is purged afterwards
+"""
+import argparse
+import time
+
+from . import setup_django
+
+setup_django()
+
+from django_q.brokers import get_broker  # noqa: E402
+from django_q.signing import SignedPackage  # noqa: E402
+from django_q.tasks import async_task  # noqa: E402
+
+BENCH_QUEUE = "bench_ocr_fanout"
+BATCH_SIZES = [1, 2, 4, 8]
+
+
+def make_pages_kw_args(page_count: int):
+    """
+    ocr_image kw_args as built by OCRInput._do_ocr
+
+    :param page_count:
+    :return:
+    """
+    pages_kw_args = []
+    for page in range(1, page_count + 1):
+        image = f"/tmp/ocr_inputs/0f3c9a2e-{page:04d}.png"
+        save_kw_args = {
+            "path": image,
+            "bucket": "bucket",
+            "prefix": "media/2021-01-01-00-00-00",
+            "key": f"document.pdf/0f3c9a2e-{page:04d}.png",
+            "append_datetime": False,
+        }
+        pages_kw_args.append(
+            {
+                "imagepath": image,
+                "preprocess": True,
+                "ocr_config": None,
+                "ocr_engine": "tesseract",
+                "inputocr_guid": "0f3c9a2e" * 4,
+                "cloud_imagepath": f"s3://bucket/{save_kw_args['prefix']}/{save_kw_args['key']}",
+                "save_images_to_cloud": True,
+                "save_to_cloud_kw_args": save_kw_args,
+                "use_async_to_upload": True,
+            }
+        )
+    return pages_kw_args
+
+
+def build_tasks(pages_kw_args: list, batch_size: int):
+    """
+    Task func and kwargs for each batch, plus the upload task each batch adds
+
+    :param pages_kw_args:
+    :param batch_size:
+    :return:
+    """
+    tasks = []
+    for start in range(0, len(pages_kw_args), batch_size):
+        batch = pages_kw_args[start : start + batch_size]
+        if len(batch) == 1:
+            tasks.append(("ocr.ocr_utils.ocr_image", batch[0]))
+            upload_kw_args = {"kw_args": batch[0]["save_to_cloud_kw_args"]}
+        else:
+            tasks.append(("ocr.ocr_utils.ocr_images", {"pages_kw_args": batch}))
+            upload_kw_args = {
+                "kw_args": [page["save_to_cloud_kw_args"] for page in batch]
+            }
+        tasks.append(("ocr.ocr_utils.save_images", upload_kw_args))
+    return tasks
+
+
+def payload_bytes(tasks: list):
+    """
+
+    :param tasks:
+    :return:
+    """
+    return sum(
+        len(SignedPackage.dumps({"func": func, "args": (), "kwargs": kwargs}))
+        for func, kwargs in tasks
+    )
+
+
+def enqueue(tasks: list):
+    """
+    Enqueues tasks and returns the wall time in seconds
+
+    :param tasks:
+    :return:
+    """
+    start = time.perf_counter()
+    for func, kwargs in tasks:
+        # A broker per task like async_task builds for OCRInput._dispatch_ocr_pages,
+        # only pointed at the benchmark queue
+        async_task(
+            func,
+            q_options={"group": "Bench", "broker": get_broker(list_key=BENCH_QUEUE)},
+            **kwargs,
+        )
+    return time.perf_counter() - start
+
+
+def main():
+    """
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument(
+        "--no-broker",
+        action="store_true",
+        help="Only report task counts and payload sizes",
+    )
+    args = parser.parse_args()
+
+    pages_kw_args = make_pages_kw_args(args.pages)
+    print(f"{'mode':>8} {'tasks':>6} {'payload KiB':>12} {'enqueue (s)':>12}")
+    for batch_size in BATCH_SIZES:
+        tasks = build_tasks(pages_kw_args, batch_size)
+        mode = f"batch {batch_size}"
+        enqueue_time = "-"
+        if not args.no_broker:
+            enqueue_time = f"{enqueue(tasks):.3f}"
+            get_broker(list_key=BENCH_QUEUE).purge_queue()
+        print(
+            f"{mode:>8} {len(tasks):>6} {payload_bytes(tasks) / 1024:>12.1f} "
+            f"{enqueue_time:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
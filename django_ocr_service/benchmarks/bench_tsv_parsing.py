@@ -0,0 +1,129 @@
+"""
+Compares the pandas DataFrame and direct TSV parsing paths on the same TSV fixtures
+"""
+import argparse
+import csv
+import io
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from . import setup_django, time_call
+from .bench_line_grouping import make_word_table
+
+setup_django()
+
+from ocr.ocr_utils import generate_text_from_ocr_output  # noqa: E402
+from ocr.tesseract_tsv import (  # noqa: E402
+    TSV_COLUMNS,
+    generate_text_from_tesseract_words,
+    parse_tesseract_tsv,
+)
+
+TESTDATA_TSV = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "tests",
+    "testdata",
+    "ocr_output.tsv",
+)
+WORD_COUNTS = [100, 1000, 5000, 20000]
+
+
+def make_tsv(word_count: int):
+    """
+    Renders a synthetic word table as Tesseract TSV output
+
+    :param word_count:
+    :return:
+    """
+    table = make_word_table(word_count)
+    for column in TSV_COLUMNS:
+        if column not in table:
+            table[column] = 1
+    table["width"] = 60
+    return table[list(TSV_COLUMNS)].to_csv(sep="\t", index=False)
+
+
+def dataframe_path(tsv: str):
+    """
+    Mirrors pytesseract output_type="data.frame"
+
+    :param tsv:
+    :return:
+    """
+    import pandas as pd
+
+    dataframe = pd.read_csv(io.StringIO(tsv), quoting=csv.QUOTE_NONE, sep="\t")
+    return generate_text_from_ocr_output(dataframe, line_grouping="sweep")
+
+
+def tsv_path(tsv: str):
+    """
+
+    :param tsv:
+    :return:
+    """
+    return generate_text_from_tesseract_words(parse_tesseract_tsv(tsv))
+
+
+def peak_memory(func, tsv: str):
+    """
+    Peak traced allocation in KiB while running func
+
+    :param func:
+    :param tsv:
+    :return:
+    """
+    tracemalloc.start()
+    func(tsv)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def pandas_import_time():
+    """
+    Wall time of importing pandas in a fresh interpreter, the cost the tsv path avoids
+
+    :return:
+    """
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import pandas"], check=True)
+    with_pandas = time.perf_counter() - start
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import numpy"], check=True)
+    return with_pandas - (time.perf_counter() - start)
+
+
+def main():
+    """
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(TESTDATA_TSV, "r") as tsv_file:
+        fixtures = [("testdata", tsv_file.read())]
+    fixtures += [(f"synthetic-{count}", make_tsv(count)) for count in WORD_COUNTS]
+
+    print(f"Extra import time of pandas per worker: {pandas_import_time():.3f}s")
+    print(
+        f"{'fixture':>16} {'df (s)':>9} {'tsv (s)':>9} "
+        f"{'df peak KiB':>12} {'tsv peak KiB':>13} same"
+    )
+    for name, tsv in fixtures:
+        df_time, df_text = time_call(dataframe_path, repeat=args.repeat, tsv=tsv)
+        tsv_time, tsv_text = time_call(tsv_path, repeat=args.repeat, tsv=tsv)
+        print(
+            f"{name:>16} {df_time:>9.4f} {tsv_time:>9.4f} "
+            f"{peak_memory(dataframe_path, tsv):>12.0f} "
+            f"{peak_memory(tsv_path, tsv):>13.0f} {df_text == tsv_text}"
+        )
+
+
+if __name__ == "__main__":
+    main()
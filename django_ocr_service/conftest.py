@@ -12,6 +12,7 @@ from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 import pytest
 
 from common_utils import get_schema_name
+from ocr.dedup_cache import get_dedup_cache
 
 
 def run_sql(sql, database):
@@ -69,6 +70,19 @@ def django_db_setup(django_db_blocker, django_db_createdb):
         pass
 
 
+@pytest.fixture(autouse=True)
+def clear_dedup_cache():
+    """
+    Database flushes between tests do not send delete signals, so cached outputs
+    would leak from one test into another
+
+    :return:
+    """
+    get_dedup_cache().clear()
+    yield
+    get_dedup_cache().clear()
+
+
 def pytest_sessionstart(session):
     prefix = "test_data"
     settings.MEDIA_ROOT = os.path.join(settings.BASE_DIR, prefix)
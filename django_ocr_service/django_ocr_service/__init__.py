@@ -74,11 +74,110 @@ if not config.get("IMAGE_SIZE"):
 if not config.get("BINARY_THRESHOLD"):
     config["BINARY_THRESHOLD"] = 180
 
+# OCR_ADAPTIVE_DPI, render pdf pages at a DPI chosen from their media box and rescale
+# images by their estimated text size instead of rendering at 300 dpi and upscaling
+if os.environ.get("OCR_ADAPTIVE_DPI"):
+    config["OCR_ADAPTIVE_DPI"] = ast.literal_eval(os.environ.get("OCR_ADAPTIVE_DPI"))
+if config.get("OCR_ADAPTIVE_DPI") is None:
+    config["OCR_ADAPTIVE_DPI"] = False
+
+# OCR_TARGET_X_HEIGHT in pixels that OCR_ADAPTIVE_DPI aims the text of every page at
+if os.environ.get("OCR_TARGET_X_HEIGHT"):
+    config["OCR_TARGET_X_HEIGHT"] = int(os.environ.get("OCR_TARGET_X_HEIGHT"))
+if config.get("OCR_TARGET_X_HEIGHT") is None:
+    config["OCR_TARGET_X_HEIGHT"] = 20
+
+# OCR_PREPROCESSING_KERNEL, fused gives the same image as legacy in fewer passes
+if os.environ.get("OCR_PREPROCESSING_KERNEL"):
+    config["OCR_PREPROCESSING_KERNEL"] = os.environ.get("OCR_PREPROCESSING_KERNEL")
+if not config.get("OCR_PREPROCESSING_KERNEL"):
+    config["OCR_PREPROCESSING_KERNEL"] = "fused"
+
+# OCR_PREPROCESSING_PROFILE used for inputs that do not pick one, see
+# ocr.preprocessing_profiles for the built in profiles
+if os.environ.get("OCR_PREPROCESSING_PROFILE"):
+    config["OCR_PREPROCESSING_PROFILE"] = os.environ.get("OCR_PREPROCESSING_PROFILE")
+if not config.get("OCR_PREPROCESSING_PROFILE"):
+    config["OCR_PREPROCESSING_PROFILE"] = "default"
+
+# OCR_PREPROCESSING_PROFILES, extra profiles as a mapping of name to list of stages
+if os.environ.get("OCR_PREPROCESSING_PROFILES"):
+    config["OCR_PREPROCESSING_PROFILES"] = ast.literal_eval(
+        os.environ.get("OCR_PREPROCESSING_PROFILES")
+    )
+if config.get("OCR_PREPROCESSING_PROFILES") is None:
+    config["OCR_PREPROCESSING_PROFILES"] = {}
+
+# OCR_AUTO_SKIP_PREPROCESSING, classify each page from a thumbnail and skip binarize on
+# pages that are already clean black and white
+if os.environ.get("OCR_AUTO_SKIP_PREPROCESSING"):
+    config["OCR_AUTO_SKIP_PREPROCESSING"] = ast.literal_eval(
+        os.environ.get("OCR_AUTO_SKIP_PREPROCESSING")
+    )
+if config.get("OCR_AUTO_SKIP_PREPROCESSING") is None:
+    config["OCR_AUTO_SKIP_PREPROCESSING"] = False
+
+# OCR_LAYOUT_SEGMENTATION, OCR only the text blocks found on a page instead of the whole
+# page with its margins, photos and logos
+if os.environ.get("OCR_LAYOUT_SEGMENTATION"):
+    config["OCR_LAYOUT_SEGMENTATION"] = ast.literal_eval(
+        os.environ.get("OCR_LAYOUT_SEGMENTATION")
+    )
+if config.get("OCR_LAYOUT_SEGMENTATION") is None:
+    config["OCR_LAYOUT_SEGMENTATION"] = False
+
+# OCR_REGION_WORKERS, text regions of a page OCRed in parallel by the tesseract engine
+if os.environ.get("OCR_REGION_WORKERS"):
+    config["OCR_REGION_WORKERS"] = int(os.environ.get("OCR_REGION_WORKERS"))
+if config.get("OCR_REGION_WORKERS") is None:
+    config["OCR_REGION_WORKERS"] = 4
+
+if os.environ.get("OCR_IN_MEMORY_PIPELINE"):
+    config["OCR_IN_MEMORY_PIPELINE"] = ast.literal_eval(
+        os.environ.get("OCR_IN_MEMORY_PIPELINE")
+    )
+if config.get("OCR_IN_MEMORY_PIPELINE") is None:
+    config["OCR_IN_MEMORY_PIPELINE"] = True
+
 
 # OCR
 if not config.get("OCR_OEM"):
     config["OCR_OEM"] = 11
 
+if os.environ.get("OCR_ENGINE"):
+    config["OCR_ENGINE"] = os.environ.get("OCR_ENGINE")
+if not config.get("OCR_ENGINE"):
+    config["OCR_ENGINE"] = "tesseract"
+
+if os.environ.get("OCR_LINE_GROUPING"):
+    config["OCR_LINE_GROUPING"] = os.environ.get("OCR_LINE_GROUPING")
+if not config.get("OCR_LINE_GROUPING"):
+    config["OCR_LINE_GROUPING"] = "sweep"
+
+if os.environ.get("OCR_OUTPUT_PARSER"):
+    config["OCR_OUTPUT_PARSER"] = os.environ.get("OCR_OUTPUT_PARSER")
+if not config.get("OCR_OUTPUT_PARSER"):
+    config["OCR_OUTPUT_PARSER"] = "tsv"
+
+# PDF_STREAM_CHUNK_SIZE, 0 renders the whole pdf before OCR starts
+if os.environ.get("PDF_STREAM_CHUNK_SIZE"):
+    config["PDF_STREAM_CHUNK_SIZE"] = int(os.environ.get("PDF_STREAM_CHUNK_SIZE"))
+if config.get("PDF_STREAM_CHUNK_SIZE") is None:
+    config["PDF_STREAM_CHUNK_SIZE"] = 4
+
+# USE_PDF_TEXT_LAYER, skips OCR for pdf pages with an embedded text layer
+if os.environ.get("USE_PDF_TEXT_LAYER"):
+    config["USE_PDF_TEXT_LAYER"] = ast.literal_eval(
+        os.environ.get("USE_PDF_TEXT_LAYER")
+    )
+if config.get("USE_PDF_TEXT_LAYER") is None:
+    config["USE_PDF_TEXT_LAYER"] = True
+
+if os.environ.get("PDF_TEXT_LAYER_MIN_CHARS"):
+    config["PDF_TEXT_LAYER_MIN_CHARS"] = int(os.environ.get("PDF_TEXT_LAYER_MIN_CHARS"))
+if config.get("PDF_TEXT_LAYER_MIN_CHARS") is None:
+    config["PDF_TEXT_LAYER_MIN_CHARS"] = 20
+
 # DATABASES
 if not config.get("DATABASES"):
     config["DATABASES"] = {
@@ -113,6 +212,113 @@ if os.environ.get("USE_ASYNC_FOR_SPEED"):
 if config.get("USE_ASYNC_FOR_SPEED") is None:
     config["USE_ASYNC_FOR_SPEED"] = True
 
+# ASYNC_OCR_INTAKE, POST only saves the input and pre-work runs on the django-q cluster
+if os.environ.get("ASYNC_OCR_INTAKE"):
+    config["ASYNC_OCR_INTAKE"] = ast.literal_eval(os.environ.get("ASYNC_OCR_INTAKE"))
+if config.get("ASYNC_OCR_INTAKE") is None:
+    config["ASYNC_OCR_INTAKE"] = False
+
+# OCR_TASK_BATCH_SIZE, pages OCRed per async task. 0 sizes batches from the cluster workers
+if os.environ.get("OCR_TASK_BATCH_SIZE"):
+    config["OCR_TASK_BATCH_SIZE"] = int(os.environ.get("OCR_TASK_BATCH_SIZE"))
+if config.get("OCR_TASK_BATCH_SIZE") is None:
+    config["OCR_TASK_BATCH_SIZE"] = 0
+
+# OCR_DEDUP_CACHE_SIZE, OCR outputs cached per process by page checksum. 0 disables the cache
+if os.environ.get("OCR_DEDUP_CACHE_SIZE"):
+    config["OCR_DEDUP_CACHE_SIZE"] = int(os.environ.get("OCR_DEDUP_CACHE_SIZE"))
+if config.get("OCR_DEDUP_CACHE_SIZE") is None:
+    config["OCR_DEDUP_CACHE_SIZE"] = 10000
+
+# OCR_RESULT_CACHE_BACKEND, memory keeps results per process, django uses settings.CACHES
+if os.environ.get("OCR_RESULT_CACHE_BACKEND"):
+    config["OCR_RESULT_CACHE_BACKEND"] = os.environ.get("OCR_RESULT_CACHE_BACKEND")
+if not config.get("OCR_RESULT_CACHE_BACKEND"):
+    config["OCR_RESULT_CACHE_BACKEND"] = "memory"
+
+if os.environ.get("OCR_RESULT_CACHE_ALIAS"):
+    config["OCR_RESULT_CACHE_ALIAS"] = os.environ.get("OCR_RESULT_CACHE_ALIAS")
+if not config.get("OCR_RESULT_CACHE_ALIAS"):
+    config["OCR_RESULT_CACHE_ALIAS"] = "default"
+
+# OCR_RESULT_CACHE_TTL in seconds, 0 keeps results until evicted
+if os.environ.get("OCR_RESULT_CACHE_TTL"):
+    config["OCR_RESULT_CACHE_TTL"] = int(os.environ.get("OCR_RESULT_CACHE_TTL"))
+if config.get("OCR_RESULT_CACHE_TTL") is None:
+    config["OCR_RESULT_CACHE_TTL"] = 86400
+
+# USE_DOCUMENT_DEDUP, copies the outputs of an already OCRed identical document
+if os.environ.get("USE_DOCUMENT_DEDUP"):
+    config["USE_DOCUMENT_DEDUP"] = ast.literal_eval(
+        os.environ.get("USE_DOCUMENT_DEDUP")
+    )
+if config.get("USE_DOCUMENT_DEDUP") is None:
+    config["USE_DOCUMENT_DEDUP"] = True
+
+# OCR_HASH_ALGORITHM used for input and page image checksums, blake2b, sha256 or md5
+if os.environ.get("OCR_HASH_ALGORITHM"):
+    config["OCR_HASH_ALGORITHM"] = os.environ.get("OCR_HASH_ALGORITHM")
+if config.get("OCR_HASH_ALGORITHM") is None:
+    config["OCR_HASH_ALGORITHM"] = "blake2b"
+
+# OCR_DOWNLOAD_PART_SIZE in bytes, larger inputs are downloaded as parallel ranged GETs
+if os.environ.get("OCR_DOWNLOAD_PART_SIZE"):
+    config["OCR_DOWNLOAD_PART_SIZE"] = int(os.environ.get("OCR_DOWNLOAD_PART_SIZE"))
+if config.get("OCR_DOWNLOAD_PART_SIZE") is None:
+    config["OCR_DOWNLOAD_PART_SIZE"] = 8 * 1024 * 1024
+
+# OCR_DOWNLOAD_CONCURRENCY, parallel ranged GETs per download, 1 streams sequentially
+if os.environ.get("OCR_DOWNLOAD_CONCURRENCY"):
+    config["OCR_DOWNLOAD_CONCURRENCY"] = int(os.environ.get("OCR_DOWNLOAD_CONCURRENCY"))
+if config.get("OCR_DOWNLOAD_CONCURRENCY") is None:
+    config["OCR_DOWNLOAD_CONCURRENCY"] = 4
+
+# OCR_S3_MAX_POOL_CONNECTIONS, HTTP connections kept per pooled S3 client
+if os.environ.get("OCR_S3_MAX_POOL_CONNECTIONS"):
+    config["OCR_S3_MAX_POOL_CONNECTIONS"] = int(
+        os.environ.get("OCR_S3_MAX_POOL_CONNECTIONS")
+    )
+if config.get("OCR_S3_MAX_POOL_CONNECTIONS") is None:
+    config["OCR_S3_MAX_POOL_CONNECTIONS"] = 20
+
+# OCR_UPLOAD_MULTIPART_THRESHOLD in bytes, larger files are uploaded as multipart parts
+if os.environ.get("OCR_UPLOAD_MULTIPART_THRESHOLD"):
+    config["OCR_UPLOAD_MULTIPART_THRESHOLD"] = int(
+        os.environ.get("OCR_UPLOAD_MULTIPART_THRESHOLD")
+    )
+if config.get("OCR_UPLOAD_MULTIPART_THRESHOLD") is None:
+    config["OCR_UPLOAD_MULTIPART_THRESHOLD"] = 8 * 1024 * 1024
+
+# OCR_UPLOAD_PART_SIZE in bytes of each multipart upload part, at least 5 MiB for S3
+if os.environ.get("OCR_UPLOAD_PART_SIZE"):
+    config["OCR_UPLOAD_PART_SIZE"] = int(os.environ.get("OCR_UPLOAD_PART_SIZE"))
+if config.get("OCR_UPLOAD_PART_SIZE") is None:
+    config["OCR_UPLOAD_PART_SIZE"] = 8 * 1024 * 1024
+
+# OCR_UPLOAD_CONCURRENCY, parallel part uploads per file, 1 uploads parts serially
+if os.environ.get("OCR_UPLOAD_CONCURRENCY"):
+    config["OCR_UPLOAD_CONCURRENCY"] = int(os.environ.get("OCR_UPLOAD_CONCURRENCY"))
+if config.get("OCR_UPLOAD_CONCURRENCY") is None:
+    config["OCR_UPLOAD_CONCURRENCY"] = 4
+
+# OCR_UPLOAD_BATCH_WORKERS, parallel page image uploads per document
+if os.environ.get("OCR_UPLOAD_BATCH_WORKERS"):
+    config["OCR_UPLOAD_BATCH_WORKERS"] = int(os.environ.get("OCR_UPLOAD_BATCH_WORKERS"))
+if config.get("OCR_UPLOAD_BATCH_WORKERS") is None:
+    config["OCR_UPLOAD_BATCH_WORKERS"] = 8
+
+# OCR_ARCHIVE_FORMAT of page images kept in cloud storage, png, tiff_g4, webp or jpeg
+if os.environ.get("OCR_ARCHIVE_FORMAT"):
+    config["OCR_ARCHIVE_FORMAT"] = os.environ.get("OCR_ARCHIVE_FORMAT")
+if config.get("OCR_ARCHIVE_FORMAT") is None:
+    config["OCR_ARCHIVE_FORMAT"] = "png"
+
+# OCR_ARCHIVE_QUALITY of webp and jpeg archived page images
+if os.environ.get("OCR_ARCHIVE_QUALITY"):
+    config["OCR_ARCHIVE_QUALITY"] = int(os.environ.get("OCR_ARCHIVE_QUALITY"))
+if config.get("OCR_ARCHIVE_QUALITY") is None:
+    config["OCR_ARCHIVE_QUALITY"] = 75
+
 # DROP_INPUT_FILE_POST_PROCESSING
 if os.environ.get("DROP_INPUT_FILE_POST_PROCESSING"):
     config["DROP_INPUT_FILE_POST_PROCESSING"] = ast.literal_eval(
@@ -157,6 +363,15 @@ if os.environ.get("DELETE_OLD_IMAGES_DAYS"):
 if not config.get("DELETE_OLD_IMAGES_DAYS"):
     config["DELETE_OLD_IMAGES_DAYS"] = 2
 
+# DELETE_OLD_CLOUD_IMAGES_DAYS, page images older than this are expired from the bucket,
+# 0 keeps them
+if os.environ.get("DELETE_OLD_CLOUD_IMAGES_DAYS"):
+    config["DELETE_OLD_CLOUD_IMAGES_DAYS"] = int(
+        os.environ.get("DELETE_OLD_CLOUD_IMAGES_DAYS")
+    )
+if config.get("DELETE_OLD_CLOUD_IMAGES_DAYS") is None:
+    config["DELETE_OLD_CLOUD_IMAGES_DAYS"] = 0
+
 
 if os.environ.get("LOCAL_FILES_SAVE_DIR"):
     config["LOCAL_FILES_SAVE_DIR"] = os.environ.get("LOCAL_FILES_SAVE_DIR")
@@ -4,6 +4,8 @@ Custom storage to allow saving file to local and uploading to cloud as async tas
 
 import logging
 import os
+import threading
+import weakref
 
 from django.conf import settings
 from django.core.files.storage import FileSystemStorage
@@ -18,6 +20,50 @@ class CloudMediaStorage(S3Boto3Storage):
     file_overwrite = False
 
 
+class PooledCloudMediaStorage(CloudMediaStorage):
+    """
+    Cloud media storage shared across calls in a process. boto3 connections are
+    created once per thread and tracked so their connection pools can be reported
+    """
+
+    def __init__(self, **kwargs):
+        """
+
+        :param kwargs: S3Boto3Storage settings
+        """
+        super(PooledCloudMediaStorage, self).__init__(**kwargs)
+        self.thread_connections = weakref.WeakSet()
+        self._thread_connections_lock = threading.Lock()
+        self._shared_connection = None
+
+    @property
+    def connection(self):
+        """
+        Thread local boto3 resource, registered on creation
+        :return:
+        """
+        connection = getattr(self._connections, "connection", None)
+        if connection is None:
+            connection = super(PooledCloudMediaStorage, self).connection
+            with self._thread_connections_lock:
+                self.thread_connections.add(connection)
+        return connection
+
+    @property
+    def client(self):
+        """
+        boto3 client shared by all threads. Unlike resources clients are thread safe, so
+        thread pools use one client and its connection pool instead of one per thread
+        :return:
+        """
+        if self._shared_connection is None:
+            connection = self.connection
+            with self._thread_connections_lock:
+                if self._shared_connection is None:
+                    self._shared_connection = connection
+        return self._shared_connection.meta.client
+
+
 class CloudStaticStorage(S3Boto3Storage):
     bucket_name = settings.AWS_STORAGE_BUCKET_NAME
     location = "static"
@@ -73,9 +119,15 @@ class CloudMediaHybridStorage(CloudMediaStorage):
             )
         else:
             logging.info("Uploading input file to cloud storage in a blocking thread")
-            filepath = super(CloudMediaHybridStorage, self)._save(name, content)
+            # Stream from the local copy instead of passing the content again. Upload
+            # errors are raised so the input is not saved with a uri to a missing object
+            from ocr.storage_utils import stream_upload_to_cloud_storage
+
+            stream_upload_to_cloud_storage(
+                path=local_full_path, key=normalised_name, bucket=self.bucket_name
+            )
             logging.info(
-                f"Input file upload complete in blocking thread. Cloud URL - {filepath}"
+                f"Input file upload complete in blocking thread. Cloud key - {normalised_name}"
             )
 
         self.local_filepath = local_full_path
@@ -51,17 +51,50 @@ os.environ["DJANGO_SUPERUSER_PASSWORD"] = config.get("DJANGO_SUPERUSER_PASSWORD"
 # IMAGE PREPROCESSING
 IMAGE_SIZE = config["IMAGE_SIZE"]
 BINARY_THRESHOLD = config["BINARY_THRESHOLD"]
+OCR_ADAPTIVE_DPI = config.get("OCR_ADAPTIVE_DPI")
+OCR_TARGET_X_HEIGHT = config.get("OCR_TARGET_X_HEIGHT")
+OCR_PREPROCESSING_KERNEL = config.get("OCR_PREPROCESSING_KERNEL")
+OCR_PREPROCESSING_PROFILE = config.get("OCR_PREPROCESSING_PROFILE")
+OCR_PREPROCESSING_PROFILES = config.get("OCR_PREPROCESSING_PROFILES")
+OCR_AUTO_SKIP_PREPROCESSING = config.get("OCR_AUTO_SKIP_PREPROCESSING")
+OCR_LAYOUT_SEGMENTATION = config.get("OCR_LAYOUT_SEGMENTATION")
+OCR_REGION_WORKERS = config.get("OCR_REGION_WORKERS")
 LOCAL_FILES_SAVE_DIR = config.get("LOCAL_FILES_SAVE_DIR")
+OCR_IN_MEMORY_PIPELINE = config.get("OCR_IN_MEMORY_PIPELINE")
+PDF_STREAM_CHUNK_SIZE = config.get("PDF_STREAM_CHUNK_SIZE")
+USE_PDF_TEXT_LAYER = config.get("USE_PDF_TEXT_LAYER")
+PDF_TEXT_LAYER_MIN_CHARS = config.get("PDF_TEXT_LAYER_MIN_CHARS")
 
 # OCR
+OCR_ENGINE = config.get("OCR_ENGINE")
 OCR_OEM = config.get("OCR_OEM")
 OCR_PSM = config.get("OCR_PSM")
 OCR_TESSDATA_DIR = config.get("OCR_TESSDATA_DIR")
 OCR_LANGUAGE = config.get("OCR_LANGUAGE")
+OCR_LINE_GROUPING = config.get("OCR_LINE_GROUPING")
+OCR_OUTPUT_PARSER = config.get("OCR_OUTPUT_PARSER")
 SAVE_IMAGES_TO_CLOUD = config.get("SAVE_IMAGES_TO_CLOUD")
 DROP_INPUT_FILE_POST_PROCESSING = config.get("DROP_INPUT_FILE_POST_PROCESSING")
 USE_ASYNC_FOR_SPEED = config.get("USE_ASYNC_FOR_SPEED")
+ASYNC_OCR_INTAKE = config.get("ASYNC_OCR_INTAKE")
+OCR_TASK_BATCH_SIZE = config.get("OCR_TASK_BATCH_SIZE")
+OCR_DEDUP_CACHE_SIZE = config.get("OCR_DEDUP_CACHE_SIZE")
+OCR_RESULT_CACHE_BACKEND = config.get("OCR_RESULT_CACHE_BACKEND")
+OCR_RESULT_CACHE_ALIAS = config.get("OCR_RESULT_CACHE_ALIAS")
+OCR_RESULT_CACHE_TTL = config.get("OCR_RESULT_CACHE_TTL")
+USE_DOCUMENT_DEDUP = config.get("USE_DOCUMENT_DEDUP")
+OCR_HASH_ALGORITHM = config.get("OCR_HASH_ALGORITHM")
+OCR_DOWNLOAD_PART_SIZE = config.get("OCR_DOWNLOAD_PART_SIZE")
+OCR_DOWNLOAD_CONCURRENCY = config.get("OCR_DOWNLOAD_CONCURRENCY")
+OCR_S3_MAX_POOL_CONNECTIONS = config.get("OCR_S3_MAX_POOL_CONNECTIONS")
+OCR_UPLOAD_MULTIPART_THRESHOLD = config.get("OCR_UPLOAD_MULTIPART_THRESHOLD")
+OCR_UPLOAD_PART_SIZE = config.get("OCR_UPLOAD_PART_SIZE")
+OCR_UPLOAD_CONCURRENCY = config.get("OCR_UPLOAD_CONCURRENCY")
+OCR_UPLOAD_BATCH_WORKERS = config.get("OCR_UPLOAD_BATCH_WORKERS")
+OCR_ARCHIVE_FORMAT = config.get("OCR_ARCHIVE_FORMAT")
+OCR_ARCHIVE_QUALITY = config.get("OCR_ARCHIVE_QUALITY")
 DELETE_OLD_IMAGES_DAYS = config.get("DELETE_OLD_IMAGES_DAYS")
+DELETE_OLD_CLOUD_IMAGES_DAYS = config.get("DELETE_OLD_CLOUD_IMAGES_DAYS")
 
 # REST
 TOKEN_VALIDITY_IN_HOURS = config["TOKEN_VALIDITY_IN_HOURS"]
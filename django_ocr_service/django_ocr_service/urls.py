@@ -66,3 +66,28 @@ try:
     logger.info("Storage cleaning task schedule created!!!")
 except Exception as exception:
     logger.error(f"{schedule_task_name} task scheduling failed - {exception}")
+
+# Adding scheduled retention task to expire old page images from cloud storage
+
+cloud_schedule_task_name = "CleanUpCloudStorage"
+
+try:
+    Schedule.objects.filter(name=cloud_schedule_task_name).delete()
+
+    if settings.DELETE_OLD_CLOUD_IMAGES_DAYS:
+        _ = schedule(
+            name=cloud_schedule_task_name,
+            func="ocr.storage_utils.expire_old_images_from_cloud_storage",
+            schedule_type=Schedule.DAILY,
+            days=settings.DELETE_OLD_CLOUD_IMAGES_DAYS,
+            q_options={
+                "ack_failure": True,
+                "catch_up": False,
+                "max_attempts": 1,
+            },
+            next_run=arrow.utcnow().shift(days=1).replace(hour=11, minute=0).datetime,
+        )
+
+        logger.info("Cloud storage retention task schedule created!!!")
+except Exception as exception:
+    logger.error(f"{cloud_schedule_task_name} task scheduling failed - {exception}")
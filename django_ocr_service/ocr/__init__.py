@@ -2,21 +2,34 @@
 
 """
 from .storage_utils import (
+    bulk_delete_objects_from_cloud_storage,
+    download_from_cloud_storage,
     generate_cloud_storage_key,
     is_cloud_storage,
     load_from_cloud_storage_and_save,
     object_exists_in_cloud_storage,
+    stream_upload_to_cloud_storage,
+    upload_batch_to_cloud_storage,
     upload_to_cloud_storage,
 )
 
+from .file_sniffing import sniff_file
 from .image_preprocessing import preprocess_image_for_ocr
 
 from .ocr_utils import (
+    build_ocr_config_key,
     download_locally_if_cloud_storage_path,
+    extract_pdf_text_layer,
     generate_save_image_kwargs,
+    get_pdf_page_count,
+    get_task_batch_size,
     is_pdf,
     is_image,
+    iter_image_frames,
+    iter_pdf_to_image,
+    iter_save_image_kwargs,
     ocr_image,
+    ocr_images,
     pdf_to_image,
     save_images,
 )
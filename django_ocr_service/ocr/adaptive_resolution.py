@@ -0,0 +1,122 @@
+"""
+Picks the resolution of each page so its text reaches the x-height Tesseract reads best.
+Pdf pages are rendered at a DPI chosen from their media box, images are rescaled from
+the x-height estimated on the image, and pages already close to the target are left
+at their size
+"""
+import logging
+
+import cv2
+from django.conf import settings
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+POINTS_PER_INCH = 72
+# x-height of 10pt body text, averaged over common serif and sans serif fonts
+BODY_TEXT_X_HEIGHT_PT = 4.8
+# Short side in inches of letter, body text is assumed to be set for A4 or letter pages
+REFERENCE_SHORT_SIDE_IN = 8.5
+MIN_RENDER_DPI = 100
+MAX_RENDER_DPI = 600
+# Images are only rescaled if their text is further than this factor from the target
+RESCALE_TOLERANCE = 1.25
+MIN_SCALE_FACTOR = 0.25
+MAX_SCALE_FACTOR = 4.0
+# Fewer glyph like components than this give no usable x-height estimate
+MIN_GLYPH_COUNT = 20
+
+
+def select_render_dpi(
+    page_width_in: float, page_height_in: float, target_x_height: int = None
+):
+    """
+    Render DPI of a page of the given size. Text on pages larger than letter is assumed
+    to grow with the page, text on smaller pages keeps the body text size
+
+    :param page_width_in:
+    :param page_height_in:
+    :param target_x_height: x-height in pixels, defaults to settings.OCR_TARGET_X_HEIGHT
+    :return:
+    """
+    if not target_x_height:
+        target_x_height = settings.OCR_TARGET_X_HEIGHT
+
+    font_scale = max(1.0, min(page_width_in, page_height_in) / REFERENCE_SHORT_SIDE_IN)
+    x_height_in = BODY_TEXT_X_HEIGHT_PT * font_scale / POINTS_PER_INCH
+    dpi = round(target_x_height / x_height_in)
+    return max(MIN_RENDER_DPI, min(dpi, MAX_RENDER_DPI))
+
+
+def select_page_dpis(pdf_reader, pages, target_x_height: int = None):
+    """
+    Render DPI of each page from its media box
+
+    :param pdf_reader: Open PdfFileReader
+    :param pages: 1-based page numbers
+    :param target_x_height:
+    :return: Dictionary of page number to DPI
+    """
+    page_dpis = {}
+    for page in pages:
+        media_box = pdf_reader.getPage(page - 1).mediaBox
+        page_dpis[page] = select_render_dpi(
+            float(media_box.getWidth()) / POINTS_PER_INCH,
+            float(media_box.getHeight()) / POINTS_PER_INCH,
+            target_x_height=target_x_height,
+        )
+
+    logger.info(f"Render DPI per page - {page_dpis}")
+    return page_dpis
+
+
+def estimate_x_height(gray: np.ndarray):
+    """
+    Estimates the x-height of the text in a grayscale image as the lower quartile of
+    the heights of glyph like connected components, most of which are lower case
+    letters without ascenders
+
+    :param gray: Grayscale image array
+    :return: x-height in pixels, None if too little text was found
+    """
+    _, inverted = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(inverted, connectivity=8)
+
+    # Row 0 is the background
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    is_glyph = (
+        (heights >= 4)
+        & (heights <= gray.shape[0] / 10)
+        & (widths <= 3 * heights)
+        & (areas >= 8)
+    )
+
+    if np.count_nonzero(is_glyph) < MIN_GLYPH_COUNT:
+        return None
+
+    return float(np.percentile(heights[is_glyph], 25))
+
+
+def get_text_scale_factor(gray: np.ndarray, target_x_height: int = None):
+    """
+    Factor an image has to be scaled by for its text to reach the target x-height
+
+    :param gray: Grayscale image array
+    :param target_x_height: x-height in pixels, defaults to settings.OCR_TARGET_X_HEIGHT
+    :return: 1.0 if no rescale is needed
+    """
+    if not target_x_height:
+        target_x_height = settings.OCR_TARGET_X_HEIGHT
+
+    x_height = estimate_x_height(gray)
+    if not x_height:
+        return 1.0
+
+    scale = target_x_height / x_height
+    if 1 / RESCALE_TOLERANCE <= scale <= RESCALE_TOLERANCE:
+        return 1.0
+
+    logger.info(f"Estimated x-height {x_height:.1f}px, rescaling by {scale:.2f}")
+    return max(MIN_SCALE_FACTOR, min(scale, MAX_SCALE_FACTOR))
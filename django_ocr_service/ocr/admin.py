@@ -73,6 +73,7 @@ class OCRInputAdmin(admin.ModelAdmin):
     list_filter = (
         "bucket_name",
         "ocr_config",
+        "preprocessing_profile",
         OCRStatusFilter,
     )
 
@@ -80,3 +81,4 @@ class OCRInputAdmin(admin.ModelAdmin):
 @admin.register(OCROutput)
 class OCROutputAdmin(admin.ModelAdmin):
     search_fields = ["guid__guid", "image_path", "modified_at"]
+    list_filter = ("source", "preprocessing_decision")
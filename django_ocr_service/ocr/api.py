@@ -75,7 +75,12 @@ class GenerateOCR(APIView):
             logger.info("Serializer is valid")
             try:
                 model_obj = OCRInput.objects.create(**data)
-                if model_obj.result_response:
+                if model_obj.prepare_enqueued:
+                    return Response(
+                        data={"guid": model_obj.guid},
+                        status=status.HTTP_202_ACCEPTED,
+                    )
+                elif model_obj.result_response:
                     return Response(
                         data={"guid": model_obj.guid},
                         status=status.HTTP_200_OK,
@@ -127,6 +132,9 @@ class GetOCR(APIView):
             elif len(output_objs) == 0:  # pragma: no cover
                 logger.info("No OCR output found. Have you waited enough?")
                 stat = status.HTTP_204_NO_CONTENT
+        else:
+            logger.info("Input is not prepared for OCR yet. Have you waited enough?")
+            stat = status.HTTP_204_NO_CONTENT
 
         return stat
 
@@ -0,0 +1,132 @@
+"""
+Encodes page images into a compact archival format after OCR. Recognition always runs
+on the lossless rendered page, only the copy kept in cloud storage for audit is
+re-encoded
+"""
+import logging
+import os
+
+import cv2
+from django.conf import settings
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FORMATS = ("png", "tiff_g4", "webp", "jpeg")
+ARCHIVE_EXTENSIONS = {
+    "png": "png",
+    "tiff_g4": "tiff",
+    "webp": "webp",
+    "jpeg": "jpg",
+}
+
+
+def validate_archive_format(archive_format: str = None):
+    """
+
+    :param archive_format: Defaults to settings.OCR_ARCHIVE_FORMAT
+    :return: Archive format
+    """
+    if not archive_format:
+        archive_format = settings.OCR_ARCHIVE_FORMAT
+
+    if archive_format not in ARCHIVE_FORMATS:
+        raise NotImplementedError(
+            f"Archive format {archive_format} not implemented, use one of {ARCHIVE_FORMATS}"
+        )
+
+    return archive_format
+
+
+def get_archive_filename(filename: str, archive_format: str = None):
+    """
+    Filename of a page image once encoded in the archive format, png keeps the
+    rendered page and its name
+
+    :param filename:
+    :param archive_format:
+    :return:
+    """
+    archive_format = validate_archive_format(archive_format)
+    if archive_format == "png":
+        return filename
+    return f"{os.path.splitext(filename)[0]}.{ARCHIVE_EXTENSIONS[archive_format]}"
+
+
+def binarize_for_archive(image: Image.Image):
+    """
+    Otsu thresholded bilevel copy of an image
+
+    :param image:
+    :return: PIL image in mode 1
+    """
+    gray = np.asarray(image.convert("L"))
+    _, bilevel = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return Image.fromarray(bilevel).convert("1")
+
+
+def encode_archival_image(
+    image_path: str,
+    archive_format: str = None,
+    quality: int = None,
+    output_path: str = None,
+):
+    """
+    Encodes a page image in the archive format
+
+    :param image_path: Lossless page image used for OCR
+    :param archive_format: png, tiff_g4 (bilevel CCITT group 4), webp or jpeg, defaults
+    to settings.OCR_ARCHIVE_FORMAT
+    :param quality: webp and jpeg quality, defaults to settings.OCR_ARCHIVE_QUALITY
+    :param output_path: Defaults to image_path with the archive extension
+    :return: Path of the encoded image
+    """
+    archive_format = validate_archive_format(archive_format)
+    if not quality:
+        quality = settings.OCR_ARCHIVE_QUALITY
+    if not output_path:
+        output_path = get_archive_filename(image_path, archive_format)
+
+    if archive_format == "png" and output_path == image_path:
+        return image_path
+
+    with Image.open(image_path) as image:
+        if archive_format == "tiff_g4":
+            binarize_for_archive(image).save(
+                output_path, format="TIFF", compression="group4"
+            )
+        elif archive_format in ("webp", "jpeg"):
+            if image.mode not in ("L", "RGB"):
+                image = image.convert("RGB")
+            if archive_format == "webp":
+                image.save(output_path, format="WEBP", quality=quality, method=4)
+            else:
+                image.save(output_path, format="JPEG", quality=quality, optimize=True)
+        else:
+            image.save(output_path, format="PNG", optimize=True)
+
+    logger.info(
+        f"Encoded {image_path} as {archive_format}, {os.path.getsize(image_path)} to "
+        f"{os.path.getsize(output_path)} bytes"
+    )
+    return output_path
+
+
+def prepare_archival_upload(save_to_cloud_kw_args: dict, archive_format: str = None):
+    """
+    Encodes the page image of upload kw_args in the archive format
+
+    :param save_to_cloud_kw_args: Upload kw_args from generate_save_image_kwargs
+    :param archive_format:
+    :return: Copy of the kw_args pointing at the encoded image
+    """
+    archive_format = validate_archive_format(archive_format)
+    if archive_format == "png":
+        return save_to_cloud_kw_args
+
+    archived_kw_args = dict(save_to_cloud_kw_args)
+    archived_kw_args["path"] = encode_archival_image(
+        save_to_cloud_kw_args["path"], archive_format=archive_format
+    )
+    return archived_kw_args
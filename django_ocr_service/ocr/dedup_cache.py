@@ -0,0 +1,292 @@
+"""
+Result cache of OCR outputs keyed by page image checksum and OCR configuration, so
+repeated pages are answered without a database query. The in-process LRU backend is
+the default, the django backend shares results through any Django cache framework
+cache, including file based caches on local disk
+"""
+from collections import OrderedDict
+import hashlib
+import logging
+import shlex
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_BACKENDS = ("memory", "django")
+
+_dedup_cache = None
+_dedup_cache_signature = None
+_dedup_cache_lock = threading.Lock()
+
+
+def build_result_cache_key(
+    checksum: str, ocr_config: str, ocr_language: str, preprocessing: str
+):
+    """
+    Key of a page result, pages only share results if everything that changes the
+    OCR text is equal
+
+    :param checksum: Page image checksum
+    :param ocr_config: Tesseract config as built by build_tesseract_ocr_config
+    :param ocr_language:
+    :param preprocessing: Preprocessing pipeline signature, "none" if not preprocessed
+    :return:
+    """
+    normalised_config = " ".join(shlex.split(ocr_config or ""))
+    key_parts = [checksum, normalised_config, ocr_language or "", preprocessing]
+    return hashlib.sha1("|".join(key_parts).encode("utf-8")).hexdigest()
+
+
+class ResultCacheStats:
+    """
+    Hit, miss and eviction counters shared by the cache backends
+    """
+
+    def __init__(self):
+        """ """
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def reset(self):
+        """
+
+        :return:
+        """
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def as_dict(self):
+        """
+
+        :return:
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class ChecksumCache:
+    """
+    Least recently used in-process mapping of result key to OCROutput, entries expire
+    after ttl seconds
+    """
+
+    def __init__(self, max_size: int, ttl: int = 0):
+        """
+
+        :param max_size: Entries kept before the least recently used one is evicted,
+        0 disables caching
+        :param ttl: Seconds an entry stays valid, 0 keeps entries until evicted
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.counters = ResultCacheStats()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """
+
+        :param key:
+        :return: Cached OCROutput or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[0] and entry[0] < time.monotonic():
+                del self._entries[key]
+                self.counters.evictions += 1
+                entry = None
+
+            if entry is None:
+                self.counters.misses += 1
+                return None
+
+            self.counters.hits += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, output_obj):
+        """
+
+        :param key:
+        :param output_obj:
+        :return:
+        """
+        if not self.max_size or not key:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0
+        with self._lock:
+            self._entries[key] = (expires_at, output_obj)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.counters.evictions += 1
+
+    def evict(self, key: str):
+        """
+
+        :param key:
+        :return:
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Drops all entries and resets the counters
+        :return:
+        """
+        with self._lock:
+            self._entries.clear()
+            self.counters.reset()
+
+    def stats(self):
+        """
+
+        :return: Dictionary of backend, size, hits, misses, evictions and hit rate
+        """
+        with self._lock:
+            return {
+                "backend": "memory",
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                **self.counters.as_dict(),
+            }
+
+    def __len__(self):
+        """
+
+        :return:
+        """
+        return len(self._entries)
+
+
+class DjangoResultCache:
+    """
+    Result cache stored in a Django cache framework cache, shared by every process
+    using the same cache. Hit and miss counters are kept per process
+    """
+
+    key_prefix = "ocr_result"
+
+    def __init__(self, alias: str = "default", ttl: int = 0):
+        """
+
+        :param alias: Cache alias in settings.CACHES
+        :param ttl: Seconds an entry stays valid, 0 keeps entries until evicted
+        """
+        self.alias = alias
+        self.ttl = ttl
+        self.counters = ResultCacheStats()
+
+    @property
+    def cache(self):
+        """
+
+        :return:
+        """
+        return caches[self.alias]
+
+    def _cache_key(self, key: str):
+        """
+
+        :param key:
+        :return:
+        """
+        return f"{self.key_prefix}:{key}"
+
+    def get(self, key: str):
+        """
+
+        :param key:
+        :return: Cached OCROutput or None
+        """
+        output_obj = self.cache.get(self._cache_key(key))
+        if output_obj is None:
+            self.counters.misses += 1
+        else:
+            self.counters.hits += 1
+        return output_obj
+
+    def set(self, key: str, output_obj):
+        """
+
+        :param key:
+        :param output_obj:
+        :return:
+        """
+        if not key:
+            return
+        self.cache.set(self._cache_key(key), output_obj, timeout=self.ttl or None)
+
+    def evict(self, key: str):
+        """
+
+        :param key:
+        :return:
+        """
+        self.cache.delete(self._cache_key(key))
+
+    def clear(self):
+        """
+        Resets the counters, entries are left to expire since the cache may be shared
+        :return:
+        """
+        self.counters.reset()
+
+    def stats(self):
+        """
+
+        :return: Dictionary of backend, hits, misses and hit rate
+        """
+        return {"backend": "django", "alias": self.alias, **self.counters.as_dict()}
+
+
+def get_dedup_cache():
+    """
+    Returns the process wide result cache configured by settings.OCR_RESULT_CACHE_BACKEND
+    :return:
+    """
+    global _dedup_cache, _dedup_cache_signature
+
+    backend = settings.OCR_RESULT_CACHE_BACKEND
+    signature = (
+        backend,
+        settings.OCR_DEDUP_CACHE_SIZE,
+        settings.OCR_RESULT_CACHE_TTL,
+        settings.OCR_RESULT_CACHE_ALIAS,
+    )
+
+    with _dedup_cache_lock:
+        if _dedup_cache is None or _dedup_cache_signature != signature:
+            logger.info(f"Creating OCR result cache {signature}")
+
+            if backend == "memory":
+                _dedup_cache = ChecksumCache(
+                    max_size=settings.OCR_DEDUP_CACHE_SIZE,
+                    ttl=settings.OCR_RESULT_CACHE_TTL,
+                )
+            elif backend == "django":
+                _dedup_cache = DjangoResultCache(
+                    alias=settings.OCR_RESULT_CACHE_ALIAS,
+                    ttl=settings.OCR_RESULT_CACHE_TTL,
+                )
+            else:
+                raise NotImplementedError(
+                    f"Result cache backend {backend} not implemented, use one of {RESULT_CACHE_BACKENDS}"
+                )
+
+            _dedup_cache_signature = signature
+        return _dedup_cache
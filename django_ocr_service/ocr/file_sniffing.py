@@ -0,0 +1,144 @@
+"""
+Classifies input files from their magic bytes and reads page counts from headers so
+each input is parsed at most once before OCR
+"""
+import logging
+
+from PIL import Image
+from PyPDF2 import PdfFileReader
+
+logger = logging.getLogger(__name__)
+
+SNIFF_BYTES = 1024
+
+IMAGE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+    (b"BM", "bmp"),
+    (b"\x00\x00\x00\x0cjP  \r\n\x87\n", "jp2"),
+    (b"P1", "pnm"),
+    (b"P2", "pnm"),
+    (b"P3", "pnm"),
+    (b"P4", "pnm"),
+    (b"P5", "pnm"),
+    (b"P6", "pnm"),
+]
+IMAGE_TYPES = {file_type for _, file_type in IMAGE_SIGNATURES} | {"webp"}
+
+
+def sniff_file_type(header: bytes):
+    """
+    Returns the file type for the leading bytes of a file
+
+    :param header: First SNIFF_BYTES bytes of the file
+    :return: pdf, an image type or None
+    """
+    # The pdf spec allows junk before the %PDF- marker within the first 1024 bytes
+    if b"%PDF-" in header[:SNIFF_BYTES]:
+        return "pdf"
+
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+
+    for signature, file_type in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return file_type
+
+    return None
+
+
+class SniffedFile:
+    """
+    File type, page count and the open parser of an input file. The pdf reader is kept
+    open so later steps reuse it instead of parsing the file again. Images are only
+    opened for their header, OCR page tasks get paths as they may run in other processes
+    """
+
+    def __init__(self, filepath: str):
+        """
+
+        :param filepath:
+        """
+        self.filepath = filepath
+        self.file_type = None
+        self.page_count = 0
+        self.pdf_reader = None
+        self._file = None
+
+        try:
+            self._file = open(filepath, "rb")
+            self.file_type = sniff_file_type(self._file.read(SNIFF_BYTES))
+            self._file.seek(0)
+        except OSError as exception:
+            logger.info(f"{filepath} could not be read - {exception}")
+            self.close()
+            return
+
+        try:
+            if self.file_type == "pdf":
+                self.pdf_reader = PdfFileReader(self._file)
+                self.page_count = self.pdf_reader.numPages
+            elif self.file_type in IMAGE_TYPES:
+                # Image.open only reads the header, pixels are decoded on first access
+                image = Image.open(self._file)
+                self.page_count = getattr(image, "n_frames", 1)
+        except Exception as exception:
+            logger.info(
+                f"{filepath} is NOT a valid {self.file_type} file - {exception}"
+            )
+            self.page_count = 0
+
+        logger.info(
+            f"{filepath} sniffed as {self.file_type} with {self.page_count} pages"
+        )
+
+    @property
+    def is_pdf(self):
+        """
+
+        :return:
+        """
+        return self.file_type == "pdf" and self.page_count > 0
+
+    @property
+    def is_image(self):
+        """
+
+        :return:
+        """
+        return self.file_type in IMAGE_TYPES and self.page_count > 0
+
+    def close(self):
+        """
+        Closes the underlying file handle
+        :return:
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        """
+
+        :return:
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+
+        :return:
+        """
+        self.close()
+
+
+def sniff_file(filepath: str):
+    """
+    Sniffs a file, use as a context manager to release the file handle
+
+    :param filepath:
+    :return: SniffedFile
+    """
+    return SniffedFile(filepath)
@@ -0,0 +1,264 @@
+"""
+Content hashing of inputs and page images. Files are hashed in large chunks with
+BLAKE2 by default, and bytes that are already in memory while being downloaded or
+rendered are hashed on the way so the file does not have to be read again
+"""
+import hashlib
+import logging
+import os
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+HASH_ALGORITHMS = ("blake2b", "sha256", "md5")
+HASH_CHUNK_SIZE = 1024 * 1024
+MAX_REMEMBERED_HASHES = 4096
+
+# Hashes computed while a file was written, validated against size and mtime on use
+_file_hashes = {}
+_file_hashes_lock = threading.Lock()
+
+
+def new_hasher(algorithm: str = None):
+    """
+    Returns a hashlib object for the algorithm
+
+    :param algorithm: Defaults to settings.OCR_HASH_ALGORITHM
+    :return:
+    """
+    if not algorithm:
+        algorithm = settings.OCR_HASH_ALGORITHM
+
+    if algorithm == "blake2b":
+        return hashlib.blake2b(digest_size=32)
+    elif algorithm in HASH_ALGORITHMS:
+        return hashlib.new(algorithm)
+
+    raise NotImplementedError(
+        f"Hash algorithm {algorithm} not implemented, use one of {HASH_ALGORITHMS}"
+    )
+
+
+def hash_bytes(data, algorithm: str = None):
+    """
+
+    :param data: Bytes like object
+    :param algorithm:
+    :return: Hex digest
+    """
+    hasher = new_hasher(algorithm)
+    hasher.update(data)
+    return hasher.hexdigest()
+
+
+def hash_file(filepath: str, algorithm: str = None, chunk_size: int = HASH_CHUNK_SIZE):
+    """
+    Hashes a file reading it into one reused buffer
+
+    :param filepath:
+    :param algorithm:
+    :param chunk_size:
+    :return: Hex digest
+    """
+    hasher = new_hasher(algorithm)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+
+    with open(filepath, "rb", buffering=0) as infile:
+        while True:
+            nbytes = infile.readinto(buffer)
+            if not nbytes:
+                break
+            hasher.update(view[:nbytes])
+
+    return hasher.hexdigest()
+
+
+def read_and_hash_file(filepath: str, algorithm: str = None):
+    """
+    Reads a whole file and hashes its bytes, for files that are decoded from memory
+    right after so they are read from disk only once
+
+    :param filepath:
+    :param algorithm:
+    :return: File bytes and hex digest
+    """
+    with open(filepath, "rb") as infile:
+        data = infile.read()
+
+    return data, hash_bytes(data, algorithm=algorithm)
+
+
+def _file_signature(filepath: str):
+    """
+
+    :param filepath:
+    :return: Size and modification time, None if the file is missing
+    """
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def remember_file_hash(filepath: str, digest: str, algorithm: str = None):
+    """
+    Records the hash of a file computed while it was written
+
+    :param filepath:
+    :param digest:
+    :param algorithm:
+    :return:
+    """
+    signature = _file_signature(filepath)
+    if signature is None:
+        return
+
+    with _file_hashes_lock:
+        if len(_file_hashes) >= MAX_REMEMBERED_HASHES:
+            _file_hashes.pop(next(iter(_file_hashes)))
+        _file_hashes[os.path.abspath(filepath)] = (
+            signature,
+            algorithm or settings.OCR_HASH_ALGORITHM,
+            digest,
+        )
+
+
+def lookup_file_hash(filepath: str, algorithm: str = None):
+    """
+    Hash recorded for a file, if the file has not changed since
+
+    :param filepath:
+    :param algorithm:
+    :return: Hex digest or None
+    """
+    with _file_hashes_lock:
+        entry = _file_hashes.get(os.path.abspath(filepath))
+
+    if entry is None:
+        return None
+
+    signature, entry_algorithm, digest = entry
+    if entry_algorithm != (algorithm or settings.OCR_HASH_ALGORITHM):
+        return None
+    if signature != _file_signature(filepath):
+        return None
+
+    return digest
+
+
+def get_file_checksum(filepath: str, algorithm: str = None):
+    """
+    Checksum of a file, reusing the hash recorded while it was written if possible
+
+    :param filepath:
+    :param algorithm:
+    :return: Hex digest
+    """
+    digest = lookup_file_hash(filepath, algorithm=algorithm)
+    if digest is not None:
+        logger.info(f"Reusing hash of {filepath} computed while it was written")
+        return digest
+
+    return hash_file(filepath, algorithm=algorithm)
+
+
+class HashingWriter:
+    """
+    File like wrapper that hashes everything written through it
+    """
+
+    def __init__(self, fileobj, algorithm: str = None):
+        """
+
+        :param fileobj: Binary file object to write to
+        :param algorithm:
+        """
+        self.fileobj = fileobj
+        self.hasher = new_hasher(algorithm)
+        self.nbytes = 0
+
+    def write(self, data):
+        """
+
+        :param data:
+        :return:
+        """
+        self.hasher.update(data)
+        self.nbytes += len(data)
+        return self.fileobj.write(data)
+
+    def hexdigest(self):
+        """
+
+        :return:
+        """
+        return self.hasher.hexdigest()
+
+
+class OrderedPartHasher:
+    """
+    Hashes a file written in parts that complete out of order. Each time a part
+    completes, the parts now contiguous with the bytes already hashed are read back
+    while still in the page cache, so the hash is done when the last part lands
+    """
+
+    def __init__(self, fileno: int, byte_ranges, algorithm: str = None):
+        """
+
+        :param fileno: File descriptor opened for reading
+        :param byte_ranges: Inclusive (first, last) byte ranges of the parts in order
+        :param algorithm:
+        """
+        self.fileno = fileno
+        self.byte_ranges = byte_ranges
+        self.hasher = new_hasher(algorithm)
+        self._completed = set()
+        self._next_part = 0
+        self._lock = threading.Lock()
+
+    def part_done(self, part_index: int):
+        """
+        Marks a part as written and hashes every part now contiguous with the hash
+
+        :param part_index: Position of the part in byte_ranges
+        :return:
+        """
+        with self._lock:
+            self._completed.add(part_index)
+            while self._next_part in self._completed:
+                first, last = self.byte_ranges[self._next_part]
+                for offset in range(first, last + 1, HASH_CHUNK_SIZE):
+                    self.hasher.update(
+                        os.pread(
+                            self.fileno, min(HASH_CHUNK_SIZE, last + 1 - offset), offset
+                        )
+                    )
+                self._completed.discard(self._next_part)
+                self._next_part += 1
+
+    def hexdigest(self):
+        """
+
+        :return: Hex digest, only complete once every part is done
+        """
+        return self.hasher.hexdigest()
+
+
+def write_and_hash_file(filepath: str, data, algorithm: str = None):
+    """
+    Writes bytes produced in memory to a file and records their hash
+
+    :param filepath:
+    :param data:
+    :param algorithm:
+    :return: Hex digest
+    """
+    digest = hash_bytes(data, algorithm=algorithm)
+    with open(filepath, "wb") as outfile:
+        outfile.write(data)
+    remember_file_hash(filepath, digest, algorithm=algorithm)
+    return digest
@@ -2,7 +2,9 @@
 Utilities to enable image preprocessing before OCR
 """
 import logging
+import os
 import tempfile
+import threading
 
 import cv2
 from django.conf import settings
@@ -10,43 +12,160 @@ import numpy as np
 from PIL import Image
 from PIL import ImageFile
 
+from .adaptive_resolution import get_text_scale_factor
+
 logger = logging.getLogger(__name__)
 
 # Below line is to ensure PIL does not throw error if it feels image is truncated
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 
+# Bump whenever a change to the preprocessing steps changes the image passed to OCR
+PREPROCESSING_VERSION = 1
+
+PREPROCESSING_KERNELS = ("fused", "legacy")
+# Block size and offset of the mean adaptive threshold
+ADAPTIVE_BLOCK_SIZE = 41
+ADAPTIVE_C = 3
+
+# Bytes written to local disk by the current thread, reported per page by ocr_image
+_disk_writes = threading.local()
+# Scratch buffer of the fused preprocessing kernel, one per worker thread
+_scratch_buffers = threading.local()
+
+
+def record_disk_write(nbytes: int):
+    """
+    Adds nbytes to the bytes written to disk by the current thread
+
+    :param nbytes:
+    :return:
+    """
+    _disk_writes.nbytes = getattr(_disk_writes, "nbytes", 0) + nbytes
+
+
+def pop_disk_writes():
+    """
+    Returns bytes written to disk by the current thread since the last call and resets the count
+
+    :return:
+    """
+    nbytes = getattr(_disk_writes, "nbytes", 0)
+    _disk_writes.nbytes = 0
+    return nbytes
+
+
+def get_preprocessing_signature(preprocess: bool = True):
+    """
+    Identifies the preprocessing applied to a page so cached OCR results are only
+    reused for identically preprocessed pages
+
+    :param preprocess:
+    :return:
+    """
+    if not preprocess:
+        return "none"
+
+    signature = (
+        f"v{PREPROCESSING_VERSION}-{settings.IMAGE_SIZE}-{settings.BINARY_THRESHOLD}"
+    )
+    if settings.OCR_ADAPTIVE_DPI:
+        signature = f"{signature}-xh{settings.OCR_TARGET_X_HEIGHT}"
+    if settings.OCR_AUTO_SKIP_PREPROCESSING:
+        signature = f"{signature}-autoskip"
+    return signature
+
 
-def get_size_of_scaled_image(im):
+def get_size_of_scaled_image(im, rescale: bool = True):
     """
     Return resize scale
 
     :param im:
+    :param rescale: False for pages rendered at the DPI select_page_dpis picked, they
+    keep their size without estimating their text size
     :return:
     """
     length_x, width_y = im.size
+
+    if not rescale:
+        return im.size
+
+    if settings.OCR_ADAPTIVE_DPI:
+        # Scale by the estimated text size, pages already close to it stay as is
+        factor = get_text_scale_factor(np.asarray(im.convert("L")))
+        if factor == 1.0:
+            return im.size
+        return round(factor * length_x), round(factor * width_y)
+
     factor = max(1, int(settings.IMAGE_SIZE / length_x))
     size = factor * length_x, factor * width_y
     return size
 
 
-def set_image_dpi(file_path, dpi=(300, 300)):
+def set_image_dpi(file_path, dpi=(300, 300), rescale: bool = True):
     """
     Sets image dpi
 
     :param file_path:
+    :param rescale: See get_size_of_scaled_image
     :return:
     """
     im = Image.open(file_path)
-    size = get_size_of_scaled_image(im)
-    im_resized = im.resize(size, Image.ANTIALIAS)
+    size = get_size_of_scaled_image(im, rescale=rescale)
+    im_resized = im.resize(size, Image.ANTIALIAS) if size != im.size else im
     temp_file = tempfile.NamedTemporaryFile(
         delete=False, dir=settings.LOCAL_FILES_SAVE_DIR, suffix=".png"
     )
     temp_filename = temp_file.name
     im_resized.save(temp_filename, dpi=dpi)
+    record_disk_write(os.path.getsize(temp_filename))
     return temp_filename
 
 
+def scale_image(im, rescale: bool = True):
+    """
+    Resizes a PIL image to the size get_size_of_scaled_image returns for it, images
+    that keep their size are returned without a copy
+
+    :param im:
+    :param rescale: See get_size_of_scaled_image
+    :return:
+    """
+    size = get_size_of_scaled_image(im, rescale=rescale)
+    if size == im.size:
+        return im
+    return im.resize(size, Image.LANCZOS)
+
+
+def to_gray_array(im):
+    """
+    Grayscale array of a PIL image, arrays are returned as they are
+
+    :param im: PIL image or grayscale array
+    :return:
+    """
+    if isinstance(im, np.ndarray):
+        return im
+
+    if im.mode == "L":
+        return np.asarray(im)
+    elif im.mode in ("RGB", "RGBA"):
+        return cv2.cvtColor(np.asarray(im)[..., :3], cv2.COLOR_RGB2GRAY)
+
+    return np.asarray(im.convert("L"))
+
+
+def load_scaled_gray_image(file_path, rescale: bool = True):
+    """
+    In-memory equivalent of set_image_dpi followed by a grayscale read. Returns the
+    scaled page as a grayscale array without writing anything to disk
+
+    :param file_path:
+    :param rescale: See get_size_of_scaled_image
+    :return:
+    """
+    return to_gray_array(scale_image(Image.open(file_path), rescale=rescale))
+
+
 def image_smoothening(img):
     """
     Smoothens image
@@ -68,10 +187,47 @@ def remove_noise_and_smooth(file_name):
     :param file_name:
     :return:
     """
-    logging.info("Removing noise and smoothening image")
     img = cv2.imread(file_name, 0)
+    return remove_noise_and_smooth_array(img, in_place=True)
+
+
+def remove_noise_and_smooth_array(img, kernel: str = None, in_place: bool = False):
+    """
+    Removes additional noise in a grayscale image array
+
+    :param img:
+    :param kernel: fused or legacy, defaults to settings.OCR_PREPROCESSING_KERNEL
+    :param in_place: Let the fused kernel overwrite img with the result
+    :return:
+    """
+    if not kernel:
+        kernel = settings.OCR_PREPROCESSING_KERNEL
+
+    if kernel == "fused":
+        return remove_noise_and_smooth_fused(img, out=img if in_place else None)
+    elif kernel == "legacy":
+        return remove_noise_and_smooth_legacy(img)
+    else:
+        raise NotImplementedError(
+            f"Preprocessing kernel {kernel} not implemented, use one of {PREPROCESSING_KERNELS}"
+        )
+
+
+def remove_noise_and_smooth_legacy(img):
+    """
+    Removes additional noise in a grayscale image array, one full size copy per step
+
+    :param img:
+    :return:
+    """
+    logging.info("Removing noise and smoothening image")
     filtered = cv2.adaptiveThreshold(
-        img.astype(np.uint8), 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 41, 3
+        img.astype(np.uint8),
+        255,
+        cv2.ADAPTIVE_THRESH_MEAN_C,
+        cv2.THRESH_BINARY,
+        ADAPTIVE_BLOCK_SIZE,
+        ADAPTIVE_C,
     )
     kernel = np.ones((1, 1), np.uint8)
     opening = cv2.morphologyEx(filtered, cv2.MORPH_OPEN, kernel)
@@ -81,8 +237,75 @@ def remove_noise_and_smooth(file_name):
     return or_image
 
 
-def preprocess_image_for_ocr(file_path):
+def get_scratch_buffer(shape: tuple):
+    """
+    uint8 buffer of the given shape owned by the current thread, reused across pages
+    of the same size
+
+    :param shape:
+    :return:
+    """
+    buffer = getattr(_scratch_buffers, "buffer", None)
+    if buffer is None or buffer.shape != shape:
+        buffer = np.empty(shape, dtype=np.uint8)
+        _scratch_buffers.buffer = buffer
+    return buffer
+
+
+def remove_noise_and_smooth_fused(img, out=None):
+    """
+    Pixel identical to remove_noise_and_smooth_legacy in three passes. Opening and
+    closing with a 1x1 kernel and a 1x1 Gaussian blur leave the image unchanged, and
+    Otsu on an image that is already 0 or 255 returns it as is, so the result is the
+    adaptive threshold OR the BINARY_THRESHOLD threshold of the input
+
+    :param img: Grayscale image array
+    :param out: uint8 array of the same shape to write the result to, may be img itself
+    :return:
+    """
+    logging.info("Removing noise and smoothening image in a single pass")
+    if img.dtype != np.uint8:
+        img = img.astype(np.uint8)
+    if out is None or out.dtype != np.uint8:
+        out = np.empty_like(img)
+
+    # Fixed threshold first so out may overwrite img
+    smooth = get_scratch_buffer(img.shape)
+    _, smooth = cv2.threshold(
+        img, settings.BINARY_THRESHOLD, 255, cv2.THRESH_BINARY, dst=smooth
+    )
+    out = cv2.adaptiveThreshold(
+        img,
+        255,
+        cv2.ADAPTIVE_THRESH_MEAN_C,
+        cv2.THRESH_BINARY,
+        ADAPTIVE_BLOCK_SIZE,
+        ADAPTIVE_C,
+        dst=out,
+    )
+    return cv2.bitwise_or(out, smooth, dst=out)
+
+
+def preprocess_image_for_ocr(file_path, in_memory: bool = None, rescale: bool = True):
+    """
+    Scales and binarises an image for OCR
+
+    :param file_path:
+    :param in_memory: Keep the scaled image in memory, defaults to settings.OCR_IN_MEMORY_PIPELINE
+    :param rescale: See get_size_of_scaled_image
+    :return:
+    """
     logging.info("Processing image for OCR")
-    temp_filename = set_image_dpi(file_path)
-    im_new = remove_noise_and_smooth(temp_filename)
+    if in_memory is None:
+        in_memory = settings.OCR_IN_MEMORY_PIPELINE
+
+    if in_memory:
+        gray = load_scaled_gray_image(file_path, rescale=rescale)
+        return remove_noise_and_smooth_array(gray, in_place=gray.flags.writeable)
+
+    temp_filename = set_image_dpi(file_path, rescale=rescale)
+    try:
+        im_new = remove_noise_and_smooth(temp_filename)
+    finally:
+        os.remove(temp_filename)
     return im_new
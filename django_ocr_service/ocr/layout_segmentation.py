@@ -0,0 +1,195 @@
+"""
+Finds the text blocks of a binarized page so OCR runs on those crops only instead of
+the whole page with its margins, photos and logos. Words found in the crops are moved
+back to page coordinates and stitched into lines by the sweep line grouping
+"""
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+import cv2
+from django.conf import settings
+import numpy as np
+
+from .tesseract_tsv import TesseractWords
+
+logger = logging.getLogger(__name__)
+
+# Gaps between words and lines closed to merge them into blocks, in glyph heights
+REGION_JOIN_WIDTH = 2.0
+REGION_JOIN_HEIGHT = 1.5
+# Glyph height of pages without measurable glyphs
+DEFAULT_GLYPH_HEIGHT = 20
+# Blocks smaller than this are specks of noise
+MIN_REGION_HEIGHT = 8
+MIN_REGION_AREA = 400
+# Blocks with more ink than this are photos, logos or rules, text stays well below
+MAX_TEXT_INK_DENSITY = 0.45
+REGION_PADDING = 10
+# Pages whose regions cover more than this are OCRed whole, cropping saves nothing
+MAX_REGION_COVERAGE = 0.85
+
+
+def merge_overlapping_regions(regions):
+    """
+    Merges boxes until none overlap
+
+    :param regions: List of (left, top, width, height)
+    :return:
+    """
+    boxes = [
+        [left, top, left + width, top + height] for left, top, width, height in regions
+    ]
+    merged = True
+    while merged:
+        merged = False
+        for index, box in enumerate(boxes):
+            for other_index in range(index + 1, len(boxes)):
+                other = boxes[other_index]
+                if (
+                    box[0] < other[2]
+                    and other[0] < box[2]
+                    and box[1] < other[3]
+                    and other[1] < box[3]
+                ):
+                    box[0], box[1] = min(box[0], other[0]), min(box[1], other[1])
+                    box[2], box[3] = max(box[2], other[2]), max(box[3], other[3])
+                    del boxes[other_index]
+                    merged = True
+                    break
+            if merged:
+                break
+
+    return [
+        (left, top, right - left, bottom - top) for left, top, right, bottom in boxes
+    ]
+
+
+def estimate_glyph_height(ink: np.ndarray):
+    """
+    Median height of the connected ink components, about the x-height of the text
+
+    :param ink: Binary image with ink as non zero
+    :return:
+    """
+    _, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    heights = heights[heights >= 3]
+    if not heights.size:
+        return DEFAULT_GLYPH_HEIGHT
+    return int(np.median(heights))
+
+
+def find_text_regions(image: np.ndarray):
+    """
+    Text blocks of a page, found by closing the gaps between glyphs, words and lines of
+    the ink, scaled to the glyph height, and keeping connected blocks with the ink
+    density of text
+
+    :param image: Grayscale page, usually binarized by remove_noise_and_smooth. Colour
+    pages read by cv2 when preprocessing is off are segmented on their grayscale
+    :return: List of (left, top, width, height) in reading order, None if the page
+    should be OCRed whole
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(
+            image,
+            cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY,
+        )
+
+    _, ink = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    height, width = ink.shape
+
+    glyph_height = estimate_glyph_height(ink)
+    kernel = cv2.getStructuringElement(
+        cv2.MORPH_RECT,
+        (
+            max(3, int(glyph_height * REGION_JOIN_WIDTH)),
+            max(3, int(glyph_height * REGION_JOIN_HEIGHT)),
+        ),
+    )
+    blocks = cv2.morphologyEx(ink, cv2.MORPH_CLOSE, kernel)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(blocks, connectivity=8)
+
+    regions = []
+    # Row 0 is the background
+    for left, top, region_width, region_height, _ in stats[1:]:
+        if (
+            region_height < MIN_REGION_HEIGHT
+            or region_width * region_height < MIN_REGION_AREA
+        ):
+            continue
+
+        region_ink = ink[top : top + region_height, left : left + region_width]
+        density = np.count_nonzero(region_ink) / region_ink.size
+        if density > MAX_TEXT_INK_DENSITY:
+            logger.info(
+                f"Skipping region at {left},{top} of {region_width}x{region_height}, "
+                f"ink density {density:.2f}"
+            )
+            continue
+
+        padded_left = max(0, left - REGION_PADDING)
+        padded_top = max(0, top - REGION_PADDING)
+        regions.append(
+            (
+                padded_left,
+                padded_top,
+                min(width, left + region_width + REGION_PADDING) - padded_left,
+                min(height, top + region_height + REGION_PADDING) - padded_top,
+            )
+        )
+
+    regions = merge_overlapping_regions(regions)
+    region_pixels = sum(region[2] * region[3] for region in regions)
+    if not regions or region_pixels > MAX_REGION_COVERAGE * width * height:
+        logger.info(
+            f"{len(regions)} text regions cover {region_pixels / (width * height):.0%} "
+            f"of the page, OCRing the whole page"
+        )
+        return None
+
+    logger.info(
+        f"Cloud Log: {len(regions)} text regions cover "
+        f"{region_pixels / (width * height):.0%} of the page"
+    )
+    return sorted(regions, key=lambda region: (region[1], region[0]))
+
+
+def ocr_text_regions(image: np.ndarray, regions, ocr_words, max_workers: int = None):
+    """
+    OCRs the crops of the regions in parallel and moves their words to page coordinates
+
+    :param image: Page image the regions were found on
+    :param regions: List of (left, top, width, height)
+    :param ocr_words: Function of an image crop returning its TesseractWords
+    :param max_workers: Defaults to settings.OCR_REGION_WORKERS, 1 OCRs the crops in
+    this thread
+    :return: TesseractWords of the whole page
+    """
+    if not max_workers:
+        max_workers = settings.OCR_REGION_WORKERS
+
+    crops = [
+        np.ascontiguousarray(image[top : top + height, left : left + width])
+        for left, top, width, height in regions
+    ]
+    if max_workers == 1:
+        region_words = [ocr_words(crop) for crop in crops]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(crops))) as executor:
+            region_words = list(executor.map(ocr_words, crops))
+
+    return TesseractWords(
+        left=np.concatenate(
+            [words.left + left for words, (left, _, _, _) in zip(region_words, regions)]
+        ).astype(np.int32),
+        top=np.concatenate(
+            [words.top + top for words, (_, top, _, _) in zip(region_words, regions)]
+        ).astype(np.int32),
+        width=np.concatenate([words.width for words in region_words]).astype(np.int32),
+        height=np.concatenate([words.height for words in region_words]).astype(
+            np.int32
+        ),
+        conf=np.concatenate([words.conf for words in region_words]).astype(np.float32),
+        text=[text for words in region_words for text in words.text],
+    )
@@ -0,0 +1,133 @@
+"""
+Line reconstruction engines that turn word level OCR output into text lines
+"""
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LINE_GROUPING_ENGINES = ("sweep", "legacy")
+
+
+def _normalise_text(values):
+    """
+    Converts a text column to a list of strings, mapping missing values to ""
+
+    :param values:
+    :return:
+    """
+    texts = []
+    for value in values:
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            texts.append("")
+        else:
+            texts.append(str(value))
+    return texts
+
+
+def group_words_into_lines(top, height, left, texts, overlap=0.3):
+    """
+    Groups words into lines using a single sort by top followed by a sweep over
+    the sorted arrays. Every row is assigned to at most one line, words inside a
+    line are ordered by left and lines are returned in the same order as
+    generate_text_from_ocr_output used to produce them.
+
+    :param top: Array of word top coordinates
+    :param height: Array of word heights
+    :param left: Array of word left coordinates
+    :param texts: List of word texts, "" for rows without text
+    :param overlap: Fraction of a word height that must overlap to share a line
+    :return: List of arrays holding the positional indexes of each line
+    """
+    top = np.asarray(top, dtype=np.int64)
+    height = np.asarray(height, dtype=np.int64)
+    left = np.asarray(left, dtype=np.int64)
+    row_count = len(top)
+
+    if not row_count:
+        return []
+
+    bottom = top + height
+    has_text = np.fromiter(
+        (bool(text) and bool(text.strip()) for text in texts),
+        dtype=bool,
+        count=row_count,
+    )
+
+    order = np.argsort(top, kind="stable")
+    sorted_top = top[order]
+    sorted_bottom = bottom[order]
+
+    # Tallest alive row bounds how far above a line a member row may start
+    by_height = np.argsort(-height, kind="stable")
+    height_pointer = 0
+
+    alive = np.ones(row_count, dtype=bool)
+    lines = []
+    for index in np.flatnonzero(has_text):
+        if not alive[index]:
+            continue
+
+        upper_limit = bottom[index] - (overlap * height[index])
+        lower_limit = top[index] + (overlap * height[index])
+
+        while not alive[by_height[height_pointer]]:
+            height_pointer += 1
+        max_height = height[by_height[height_pointer]]
+
+        start = np.searchsorted(sorted_top, lower_limit - max_height - 1, side="left")
+        end = np.searchsorted(sorted_top, upper_limit, side="right")
+
+        window = order[start:end]
+        members = window[alive[window] & (sorted_bottom[start:end] >= lower_limit)]
+        members.sort()
+        members = members[np.argsort(left[members], kind="quicksort")]
+
+        alive[members] = False
+        lines.append(members)
+
+    # Lines are ordered by the top of their first word, looked up in row order
+    first_rows = np.sort(np.array([line[0] for line in lines]))
+    line_order = np.argsort(top[first_rows], kind="quicksort")
+
+    return [lines[position] for position in line_order]
+
+
+def generate_text_from_word_arrays(
+    top, height, left, texts, text_join_delimiter="\n", overlap=0.3
+):
+    """
+    Generates OCR text from column arrays of Tesseract word level output
+
+    :param top:
+    :param height:
+    :param left:
+    :param texts:
+    :param text_join_delimiter:
+    :param overlap:
+    :return:
+    """
+    top = np.asarray(top, dtype=np.int64)
+    height = np.asarray(height, dtype=np.int64)
+    left = np.asarray(left, dtype=np.int64)
+    texts = _normalise_text(texts)
+
+    if not len(top):
+        return ""
+
+    keep = np.flatnonzero(height < top.max())
+    texts = [texts[index] for index in keep]
+    lines = group_words_into_lines(
+        top=top[keep],
+        height=height[keep],
+        left=left[keep],
+        texts=texts,
+        overlap=overlap,
+    )
+
+    text_list = [
+        " ".join([texts[index] for index in line if texts[index]]) for line in lines
+    ]
+
+    return text_join_delimiter.join(text_list)
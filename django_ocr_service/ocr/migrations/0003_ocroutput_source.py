@@ -0,0 +1,21 @@
+# Generated by Django 3.2.4 on 2021-07-20 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ocr", "0002_auto_20210629_0348"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ocroutput",
+            name="source",
+            field=models.CharField(
+                choices=[("ocr", "OCR"), ("text_layer", "PDF text layer")],
+                default="ocr",
+                max_length=20,
+            ),
+        ),
+    ]
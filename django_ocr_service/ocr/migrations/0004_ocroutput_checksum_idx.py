@@ -0,0 +1,18 @@
+# Generated by Django 3.2.4 on 2021-07-27 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ocr", "0003_ocroutput_source"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="ocroutput",
+            index=models.Index(
+                fields=["checksum", "-modified_at"], name="ocroutput_checksum_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.4 on 2021-07-29 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ocr", "0004_ocroutput_checksum_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ocrinput",
+            name="ocr_config_key",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="ocrinput",
+            index=models.Index(
+                fields=["checksum", "ocr_config_key"], name="ocrinput_checksum_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.4 on 2021-08-03 08:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ocr", "0005_ocrinput_ocr_config_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ocroutput",
+            name="result_key",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="ocroutput",
+            index=models.Index(
+                fields=["result_key", "-modified_at"], name="ocroutput_result_key_idx"
+            ),
+        ),
+    ]
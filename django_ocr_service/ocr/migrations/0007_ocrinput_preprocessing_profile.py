@@ -0,0 +1,22 @@
+# Generated by Django 3.2.4 on 2021-08-10 09:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ocr", "0006_ocroutput_result_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ocrinput",
+            name="preprocessing_profile",
+            field=models.CharField(
+                blank=True,
+                help_text="Preprocessing profile, defaults to OCR_PREPROCESSING_PROFILE",
+                max_length=50,
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.4 on 2021-08-12 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ocr", "0007_ocrinput_preprocessing_profile"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ocroutput",
+            name="preprocessing_decision",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("full", "Preprocessed"),
+                    ("skipped", "Clean page, preprocessing skipped"),
+                ],
+                help_text="Set when OCR_AUTO_SKIP_PREPROCESSING classified the page",
+                max_length=20,
+                null=True,
+            ),
+        ),
+    ]
@@ -1,28 +1,41 @@
 """
 Define models to enable easy integration
 """
+import itertools
 import logging
+import os
+import time
 import uuid
 
-import checksum
 import s3urls
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from s3urls import parse_url
 from urllib.parse import unquote_plus, unquote
 
 from django_ocr_service.custom_storage import CloudMediaHybridStorage
 from . import (
+    build_ocr_config_key,
     download_locally_if_cloud_storage_path,
+    extract_pdf_text_layer,
     generate_cloud_storage_key,
-    generate_save_image_kwargs,
-    is_image,
-    is_pdf,
+    get_task_batch_size,
     is_cloud_storage,
+    iter_image_frames,
+    iter_pdf_to_image,
+    iter_save_image_kwargs,
     ocr_image,
     pdf_to_image,
+    sniff_file,
 )
+from .adaptive_resolution import select_page_dpis
+from .dedup_cache import get_dedup_cache
+from .hashing import get_file_checksum, lookup_file_hash
+from .page_quality import PREPROCESSING_FULL, PREPROCESSING_SKIPPED
+from .preprocessing_profiles import get_profile_stages
 
 logger = logging.getLogger(__name__)
 
@@ -50,12 +63,27 @@ class OCRInput(models.Model):
     filename = models.CharField(max_length=255, blank=True, null=True)
     ocr_config = models.CharField(max_length=255, blank=True, null=True)
     ocr_language = models.CharField(max_length=50, blank=True, null=True)
+    preprocessing_profile = models.CharField(
+        max_length=50,
+        blank=True,
+        null=True,
+        help_text="Preprocessing profile, defaults to OCR_PREPROCESSING_PROFILE",
+    )
     page_count = models.PositiveIntegerField(default=0)
     result_response = models.TextField(max_length=None, blank=True, null=True)
     checksum = models.CharField(max_length=255, blank=True, null=True)
+    ocr_config_key = models.CharField(max_length=64, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Document dedup looks up inputs by file checksum and OCR config
+            models.Index(
+                fields=["checksum", "ocr_config_key"], name="ocrinput_checksum_idx"
+            ),
+        ]
+
     def clean(self):
         """
         Applies validators
@@ -64,16 +92,28 @@ class OCRInput(models.Model):
         if not self.file.name and not self.cloud_storage_uri:
             raise ValidationError("Cloud file path or file upload required")
 
-    def _prepare_for_ocr(self):
+        try:
+            get_profile_stages(self.preprocessing_profile)
+        except NotImplementedError as exception:
+            raise ValidationError(str(exception))
+
+    def _prepare_for_ocr(self, local_filepath: str = None):
         """
         Perform OCR on input file
+
+        :param local_filepath: Local copy of an uploaded file, if already known
         :return:
         """
         self.input_is_image = False
+        self.text_layer_pages = {}
+        self.page_dpis = {}
+        self.duplicate_of = None
         image_filepaths = []
 
-        if self.file.name:
+        if self.file.name and not local_filepath:
             local_filepath = self.file.storage.local_filepath
+
+        if local_filepath and os.path.isfile(local_filepath):
             logger.info(f"Received uploaded file - {local_filepath} as input")
         else:
             self.cloud_storage_uri = unquote(unquote_plus(self.cloud_storage_uri))
@@ -88,109 +128,305 @@ class OCRInput(models.Model):
             logger.info("File download failed")
             return
 
-        self.checksum = checksum.get_for_file(local_filepath)
+        self.checksum = get_file_checksum(local_filepath)
+
+        if settings.USE_DOCUMENT_DEDUP and self._copy_outputs_of_duplicate():
+            return image_filepaths, local_filepath
+
+        # Type, page count and text layer all come from a single parse of the file
+        with sniff_file(local_filepath) as sniffed_file:
+            if sniffed_file.is_pdf:
+                self.page_count = sniffed_file.page_count
+
+                if settings.USE_PDF_TEXT_LAYER:
+                    self.text_layer_pages = extract_pdf_text_layer(
+                        local_filepath, pdf_reader=sniffed_file.pdf_reader
+                    )
+
+                # Only pages without a usable text layer are rasterized for OCR
+                pages_to_ocr = [
+                    page
+                    for page in range(1, self.page_count + 1)
+                    if page not in self.text_layer_pages
+                ]
+
+                page_dpis = None
+                if settings.OCR_ADAPTIVE_DPI:
+                    page_dpis = select_page_dpis(sniffed_file.pdf_reader, pages_to_ocr)
+                    self.page_dpis = page_dpis
+
+                if settings.PDF_STREAM_CHUNK_SIZE:
+                    # Pages are rendered lazily while _do_ocr dispatches them
+                    image_filepaths = iter_pdf_to_image(
+                        pdf_path=local_filepath,
+                        output_folder=settings.LOCAL_FILES_SAVE_DIR,
+                        chunk_size=settings.PDF_STREAM_CHUNK_SIZE,
+                        pages=pages_to_ocr,
+                        page_dpis=page_dpis,
+                    )
+                elif self.text_layer_pages or page_dpis:
+                    image_filepaths = list(
+                        iter_pdf_to_image(
+                            pdf_path=local_filepath,
+                            output_folder=settings.LOCAL_FILES_SAVE_DIR,
+                            chunk_size=self.page_count,
+                            pages=pages_to_ocr,
+                            page_dpis=page_dpis,
+                        )
+                    )
+                else:
+                    image_filepaths = pdf_to_image(
+                        pdf_path=local_filepath,
+                        output_folder=settings.LOCAL_FILES_SAVE_DIR,
+                    )
+
+            elif sniffed_file.is_image:
+                self.input_is_image = True
+                self.page_count = sniffed_file.page_count
+
+                if self.page_count > 1:
+                    # Multi-page tiffs are split lazily, one frame per OCR page task
+                    image_filepaths = iter_image_frames(
+                        image_path=local_filepath,
+                        output_folder=settings.LOCAL_FILES_SAVE_DIR,
+                    )
+                else:
+                    image_filepaths = [local_filepath]
+
+        return image_filepaths, local_filepath
 
-        if is_pdf(local_filepath):
-            image_filepaths = pdf_to_image(
-                pdf_path=local_filepath,
-                output_folder=settings.LOCAL_FILES_SAVE_DIR,
+    def _copy_outputs_of_duplicate(self):
+        """
+        Copies the OCROutput rows of the latest completed input with the same file
+        checksum and OCR config, so the document is not rasterized or OCRed again
+
+        :return: True if outputs were copied
+        """
+        duplicate_input = (
+            OCRInput.objects.filter(
+                checksum=self.checksum,
+                ocr_config_key=self.ocr_config_key,
+                page_count__gt=0,
             )
+            .exclude(pk=self.pk)
+            .annotate(output_count=models.Count("ocroutput"))
+            .filter(output_count=models.F("page_count"))
+            .order_by("-modified_at")
+            .first()
+        )
 
-        elif is_image(local_filepath):
-            image_filepaths = [local_filepath]
-            self.input_is_image = True
+        if duplicate_input is None:
+            logger.info(f"No completed input found with checksum {self.checksum}")
+            return False
 
-        return image_filepaths, local_filepath
+        logger.info(
+            f"Input {duplicate_input.guid} has the same checksum and OCR config, "
+            f"copying its {duplicate_input.page_count} pages"
+        )
+        OCROutput.objects.bulk_create(
+            [
+                OCROutput(
+                    guid=self,
+                    image_path=output_obj.image_path,
+                    text=output_obj.text,
+                    checksum=output_obj.checksum,
+                    result_key=output_obj.result_key,
+                    source=output_obj.source,
+                    preprocessing_decision=output_obj.preprocessing_decision,
+                )
+                for output_obj in OCROutput.objects.filter(guid=duplicate_input)
+            ]
+        )
+        self.page_count = duplicate_input.page_count
+        self.duplicate_of = duplicate_input.guid
+        return True
+
+    def _save_text_layer_outputs(self):
+        """
+        Saves pages with an embedded text layer to OCROutput without running OCR
+        :return:
+        """
+        for page_number, text in self.text_layer_pages.items():
+            logger.info(f"Saving text layer of page {page_number} to DB")
+            _ = OCROutput.objects.create(
+                guid=self,
+                image_path=f"{self.cloud_storage_uri}#page={page_number}",
+                text=text,
+                source=OCROutput.SOURCE_TEXT_LAYER,
+            )
 
-    def _do_ocr(self, image_filepaths: list, cloud_storage_objects_kw_args: list):
+    def _dispatch_ocr_pages(self, pages_kw_args):
         """
+        Adds one async task for a batch of pages, OCRs them in place if that fails
 
+        :param pages_kw_args: ocr_image kw_args of each page in the batch
         :return:
         """
+        use_async_to_ocr = settings.USE_ASYNC_FOR_SPEED
+
+        if use_async_to_ocr:
+            try:
+                from django_q.tasks import async_task
+
+                q_options = {"group": "OCR"}
+                logger.info(f"Adding async task to OCR {len(pages_kw_args)} pages!!!")
+                start = time.perf_counter()
+                if len(pages_kw_args) == 1:
+                    async_task(
+                        func="ocr.ocr_utils.ocr_image",
+                        q_options=q_options,
+                        **pages_kw_args[0],
+                    )
+                else:
+                    async_task(
+                        func="ocr.ocr_utils.ocr_images",
+                        q_options=q_options,
+                        pages_kw_args=pages_kw_args,
+                        use_async_to_upload=settings.USE_ASYNC_FOR_SPEED,
+                    )
+                self.enqueue_metrics["seconds"] += time.perf_counter() - start
+                self.enqueue_metrics["tasks"] += 1
+                logger.info("Async task to OCR pages added!!!")
+            except Exception as exception:
+                logger.error("Error adding async task to OCR pages")
+                logger.error(exception)
+                use_async_to_ocr = False
+
+        # Else condition is not used on purpose since we want to move the job to happen in
+        # sync fashion if job scheduling fails
+        if not use_async_to_ocr:
+            for kw_args in pages_kw_args:
+                ocr_image(**kw_args)
+
+    def _do_ocr(self, image_filepaths, cloud_storage_objects_kw_args):
+        """
+
+        :param image_filepaths: List or generator of page image paths
+        :param cloud_storage_objects_kw_args: Upload kw_args in the same order as image_filepaths
+        :return:
+        """
+        dispatched_pages = 0
+        self.enqueue_metrics = {"pages": 0, "tasks": 0, "seconds": 0.0}
+
         if image_filepaths:
-            # Generate cloud storage paths to allow upload and ocr
-            cloud_storage_object_paths = [
-                generate_cloud_storage_key(
-                    path=kw_args["path"],
-                    key=kw_args["key"],
-                    prefix=kw_args["prefix"],
-                    append_datetime=kw_args["append_datetime"],
+            batch_size = get_task_batch_size(
+                page_count=self.page_count - len(self.text_layer_pages)
+            )
+            logger.info(f"Dispatching OCR in batches of {batch_size} pages")
+
+            # The first task goes out once the first render chunk is done, so OCR of
+            # streamed pdfs starts while later chunks are still rendering
+            current_batch_size = batch_size
+            if settings.PDF_STREAM_CHUNK_SIZE and not isinstance(image_filepaths, list):
+                current_batch_size = min(batch_size, settings.PDF_STREAM_CHUNK_SIZE)
+
+            batch = []
+            for image, save_kw_args in zip(
+                image_filepaths, cloud_storage_objects_kw_args
+            ):
+                # Generate cloud storage path to allow upload and ocr, pages may
+                # still be rendering so this happens page by page
+                cloud_storage_object_path = generate_cloud_storage_key(
+                    path=save_kw_args["path"],
+                    key=save_kw_args["key"],
+                    prefix=save_kw_args["prefix"],
+                    append_datetime=save_kw_args["append_datetime"],
                 )
-                for kw_args in cloud_storage_objects_kw_args
-            ]
 
-            for index, image in enumerate(image_filepaths):
-                kw_args = {
-                    "imagepath": image,
-                    "preprocess": True,
-                    "ocr_config": None,
-                    "ocr_engine": "tesseract",
-                    "inputocr_guid": self.guid,
-                    "cloud_imagepath": cloud_storage_object_paths[index],
-                    "save_images_to_cloud": True,
-                    "save_to_cloud_kw_args": cloud_storage_objects_kw_args[index],
-                    "use_async_to_upload": settings.USE_ASYNC_FOR_SPEED,
-                }
-
-                use_async_to_ocr = settings.USE_ASYNC_FOR_SPEED
-
-                if use_async_to_ocr:
-                    try:
-                        from django_q.tasks import async_task
-
-                        logger.info("Adding async task to OCR image!!!")
-                        async_task(
-                            func="ocr.ocr_utils.ocr_image",
-                            group="OCR",
-                            **kw_args,
-                        )
-                        logger.info(
-                            "Async task to OCR image added!!!"
-                        )
-                    except Exception as exception:
-                        logger.error(
-                            "Error adding async task to upload image to cloud"
-                        )
-                        logger.error(exception)
-                        use_async_to_ocr = False
+                batch.append(
+                    {
+                        "imagepath": image,
+                        "image_checksum": lookup_file_hash(image),
+                        "preprocess": True,
+                        "ocr_config": None,
+                        "ocr_engine": settings.OCR_ENGINE,
+                        "inputocr_guid": self.guid,
+                        "cloud_imagepath": cloud_storage_object_path,
+                        "save_images_to_cloud": True,
+                        "save_to_cloud_kw_args": save_kw_args,
+                        "use_async_to_upload": settings.USE_ASYNC_FOR_SPEED,
+                        "preprocessing_profile": self.preprocessing_profile,
+                        # Pages rendered at their adaptive DPI are not rescaled
+                        "rescale": not self.page_dpis,
+                    }
+                )
+                dispatched_pages += 1
+
+                if len(batch) >= current_batch_size:
+                    self._dispatch_ocr_pages(batch)
+                    batch = []
+                    current_batch_size = batch_size
 
-                # Else condition is not used on purpose since we want to move the job to happen in
-                # sync fashion if job scheduling fails
-                if not use_async_to_ocr:
-                    ocr_image(**kw_args)
+            if batch:
+                self._dispatch_ocr_pages(batch)
+
+        self.enqueue_metrics["pages"] = dispatched_pages
+        logger.info(
+            f"Cloud Log: Enqueued {self.enqueue_metrics['tasks']} OCR tasks for "
+            f"{dispatched_pages} pages in {self.enqueue_metrics['seconds']:.3f}s"
+        )
 
         self.result_response = {"guid": self.guid}
-        self.page_count = len(image_filepaths)
+        self.page_count = dispatched_pages + len(self.text_layer_pages)
 
-    def save(self, *args, **kwargs):
+    def _enqueue_prepare(self):
         """
-        Override base save to add additional checks and actions
+        Adds a single task to the django-q cluster that prepares and fans out this input
 
-        :return:
+        :return: True if the task was added
         """
-        # Set default bucket name, will be overridden if different
-        self.bucket_name = settings.AWS_STORAGE_BUCKET_NAME
+        local_filepath = None
+        if self.file.name:
+            local_filepath = self.file.storage.local_filepath
 
-        if not self.guid:
-            self.guid = uuid.uuid4().hex
+        try:
+            from django_q.tasks import async_task
 
-        logger.info(f"Cloud Log: Input GUID - {self.guid}")
+            logger.info("Adding async task to prepare OCR input!!!")
+            async_task(
+                func="ocr.models.prepare_ocr_input",
+                group="PrepareOCR",
+                guid=self.guid,
+                local_filepath=local_filepath,
+            )
+            logger.info("Async task to prepare OCR input added!!!")
+        except Exception as exception:
+            logger.error("Error adding async task to prepare OCR input")
+            logger.error(exception)
+            return False
 
-        if self.cloud_storage_uri:
-            parsed_uri_dict = parse_url(self.cloud_storage_uri)
-            self.bucket_name = parsed_uri_dict["bucket"]
-        else:
-            self.cloud_storage_uri = self.file.url
+        return True
 
-        self.clean()
-
-        super(OCRInput, self).save()
+    def run_ocr(self, local_filepath: str = None):
+        """
+        Downloads, rasterizes and dispatches OCR of every page of a saved input
 
+        :param local_filepath: Local copy of an uploaded file, if already known
+        :return:
+        """
         logger.info("Starting pre-work for OCR...")
-        image_filepaths, local_filepath = self._prepare_for_ocr()
+        prepared_files = self._prepare_for_ocr(local_filepath=local_filepath)
+
+        if not prepared_files:
+            logger.info("Pre-work failed, input can not be OCRed")
+            return
 
-        cloud_storage_objects_kw_args = generate_save_image_kwargs(
-            images=image_filepaths,
+        image_filepaths, local_filepath = prepared_files
+
+        if self.duplicate_of:
+            logger.info(f"Cloud Log: Outputs copied from input {self.duplicate_of}")
+            self.result_response = {"guid": self.guid}
+            super(OCRInput, self).save()
+            return
+
+        if not isinstance(image_filepaths, list):
+            # Share the rendered pages between OCR dispatch and upload kw_args
+            image_filepaths, kw_args_filepaths = itertools.tee(image_filepaths)
+        else:
+            kw_args_filepaths = image_filepaths
+
+        cloud_storage_objects_kw_args = iter_save_image_kwargs(
+            images=kw_args_filepaths,
             pdf_path=local_filepath,
             prefix="media",
             append_datetime=True,
@@ -202,6 +438,8 @@ class OCRInput(models.Model):
         )
         super(OCRInput, self).save()
 
+        self._save_text_layer_outputs()
+
         logger.info("Starting OCR process now")
         self._do_ocr(image_filepaths, cloud_storage_objects_kw_args)
         logger.info("OCR process finished, saving model object again")
@@ -209,6 +447,50 @@ class OCRInput(models.Model):
 
         super(OCRInput, self).save()
 
+    def save(self, *args, **kwargs):
+        """
+        Override base save to add additional checks and actions. With ASYNC_OCR_INTAKE
+        only the input is saved here and the OCR pre-work runs on the django-q cluster
+
+        :return:
+        """
+        # Set default bucket name, will be overridden if different
+        self.bucket_name = settings.AWS_STORAGE_BUCKET_NAME
+
+        if not self.guid:
+            self.guid = uuid.uuid4().hex
+
+        logger.info(f"Cloud Log: Input GUID - {self.guid}")
+
+        if self.cloud_storage_uri:
+            parsed_uri_dict = parse_url(self.cloud_storage_uri)
+            self.bucket_name = parsed_uri_dict["bucket"]
+        else:
+            self.cloud_storage_uri = self.file.url
+
+        self.clean()
+        self.ocr_config_key = build_ocr_config_key(
+            ocr_config=self.ocr_config,
+            ocr_language=self.ocr_language,
+            preprocessing_profile=self.preprocessing_profile,
+        )
+
+        self.prepare_enqueued = False
+        if settings.ASYNC_OCR_INTAKE:
+            self.result_response = {"guid": self.guid}
+
+        super(OCRInput, self).save()
+
+        if settings.ASYNC_OCR_INTAKE:
+            self.prepare_enqueued = self._enqueue_prepare()
+            if self.prepare_enqueued:
+                return
+
+            # Fall back to blocking pre-work if the task could not be scheduled
+            self.result_response = None
+
+        self.run_ocr()
+
     def __str__(self):  # pragma: no cover
         """
 
@@ -222,13 +504,44 @@ class OCROutput(models.Model):
     Model to show OCR Output
     """
 
+    SOURCE_OCR = "ocr"
+    SOURCE_TEXT_LAYER = "text_layer"
+    SOURCE_CHOICES = [
+        (SOURCE_OCR, "OCR"),
+        (SOURCE_TEXT_LAYER, "PDF text layer"),
+    ]
+    PREPROCESSING_DECISION_CHOICES = [
+        (PREPROCESSING_FULL, "Preprocessed"),
+        (PREPROCESSING_SKIPPED, "Clean page, preprocessing skipped"),
+    ]
+
     guid = models.ForeignKey(OCRInput, on_delete=models.CASCADE)
     image_path = models.CharField(max_length=1000, blank=False, null=False)
     text = models.TextField(max_length=None, blank=True, null=False)
     checksum = models.CharField(max_length=255, blank=True, null=True)
+    result_key = models.CharField(max_length=64, blank=True, null=True)
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default=SOURCE_OCR)
+    preprocessing_decision = models.CharField(
+        max_length=20,
+        choices=PREPROCESSING_DECISION_CHOICES,
+        blank=True,
+        null=True,
+        help_text="Set when OCR_AUTO_SKIP_PREPROCESSING classified the page",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Dedup lookups filter by checksum and take the latest row
+            models.Index(
+                fields=["checksum", "-modified_at"], name="ocroutput_checksum_idx"
+            ),
+            models.Index(
+                fields=["result_key", "-modified_at"], name="ocroutput_result_key_idx"
+            ),
+        ]
+
     def save(self, *args, **kwargs):
         """
 
@@ -247,3 +560,30 @@ class OCROutput(models.Model):
         :return:
         """
         return f"{self.guid} || Imagepath: {self.image_path}"
+
+
+def prepare_ocr_input(guid: str, local_filepath: str = None):
+    """
+    django-q task that runs the OCR pre-work of an input saved with ASYNC_OCR_INTAKE
+
+    :param guid:
+    :param local_filepath: Local copy of an uploaded file on the intake host
+    :return:
+    """
+    ocr_input = OCRInput.objects.get(guid=guid)
+    logger.info(f"Preparing OCR input {guid}")
+    ocr_input.run_ocr(local_filepath=local_filepath)
+
+
+@receiver(post_delete, sender=OCROutput)
+def evict_deleted_output_from_result_cache(sender, instance, **kwargs):
+    """
+    Keeps deleted outputs, including cascades from OCRInput, out of the result cache
+
+    :param sender:
+    :param instance:
+    :return:
+    """
+    for cache_key in (instance.result_key, instance.checksum):
+        if cache_key:
+            get_dedup_cache().evict(cache_key)
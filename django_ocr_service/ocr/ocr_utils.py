@@ -1,22 +1,27 @@
 """
 Common OCR utils
 """
+import csv
 from datetime import datetime
+import hashlib
+import io
 import os
 import logging
+import shlex
+import subprocess
+import uuid
 import warnings
 
-import checksum
 import cv2
 from django.conf import settings
 import multiprocessing
 import numpy as np
-import pandas as pd
-from pandas.core.common import SettingWithCopyWarning
 from pathlib import Path
-from pdf2image import convert_from_path
+from PIL import Image
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PyPDF2 import PdfFileReader
-from pytesseract import image_to_data
+import pytesseract
+from pytesseract import image_to_data, TesseractError
 from s3urls import parse_url
 
 import ocr
@@ -25,39 +30,61 @@ from . import (
     is_cloud_storage,
     load_from_cloud_storage_and_save,
     preprocess_image_for_ocr,
+    upload_batch_to_cloud_storage,
     upload_to_cloud_storage,
 )
+from .archival import get_archive_filename, prepare_archival_upload
+from .dedup_cache import build_result_cache_key, get_dedup_cache
+from .file_sniffing import sniff_file
+from .hashing import lookup_file_hash, read_and_hash_file, write_and_hash_file
+from .image_preprocessing import pop_disk_writes
+from .layout_segmentation import find_text_regions, ocr_text_regions
+from .line_grouping import LINE_GROUPING_ENGINES, generate_text_from_word_arrays
+from .preprocessing_profiles import (
+    PREPROCESSING_PROFILES,
+    get_profile_signature,
+    get_profile_stages,
+    pop_preprocessing_decision,
+    run_preprocessing_profile,
+)
+from .tesseract_api import (
+    is_tesseract_api_available,
+    ocr_using_tesseract_api,
+    ocr_words_using_tesseract_api,
+)
+from .tesseract_tsv import (
+    OUTPUT_PARSERS,
+    generate_text_from_tesseract_words,
+    parse_tesseract_tsv,
+)
 
-warnings.simplefilter(action="ignore", category=SettingWithCopyWarning)
 logger = logging.getLogger(__name__)
 
+MAX_AUTO_TASK_BATCH_SIZE = 8
+
 
 def is_pdf(filepath: str):
     """
     Check if a file is pdf or not
     :return:
     """
-    try:
-        doc = PdfFileReader(open(filepath, "rb"))
-        logger.info(f"{filepath} is a pdf file.")
-        return doc.numPages > 0
-    except:
-        logger.info(f"{filepath} is a NOT a pdf file.")
+    with sniff_file(filepath) as sniffed_file:
+        if sniffed_file.is_pdf:
+            logger.info(f"{filepath} is a pdf file.")
+            return True
 
+    logger.info(f"{filepath} is a NOT a pdf file.")
     return False
 
 
 def is_image(filepath: str):
     """
-    Check if a file is pdf or not
+    Check if a file is image or not
     :return:
     """
-    try:
-        image_array = cv2.imread(filepath)
-        if image_array is not None:
+    with sniff_file(filepath) as sniffed_file:
+        if sniffed_file.is_image:
             return True
-    except:
-        pass
 
     logger.info(f"{filepath} is a NOT a image file.")
     return False
@@ -86,23 +113,23 @@ def download_locally_if_cloud_storage_path(filepath: str, save_dir: str):
     return local_path
 
 
-def generate_save_image_kwargs(
-    images: list,
+def iter_save_image_kwargs(
+    images,
     pdf_path: str,
     append_datetime: bool = True,
     prefix: str = "media",
     cloud_storage="s3",
 ):
     """
+    Lazy version of generate_save_image_kwargs that accepts any iterable of image
+    paths, including pages that are still being rendered
 
     :param images:
     :param pdf_path:
     :param prefix:
     :param cloud_storage:
-    :return:
+    :return: Generator of upload kw_args
     """
-    cloud_storage_objects_kw_args = []
-
     if not prefix:
         prefix = ""
 
@@ -112,21 +139,49 @@ def generate_save_image_kwargs(
 
     if cloud_storage == "s3":
         logger.info("Using S3 cloud storage backend")
+    else:
+        raise NotImplementedError("No other storage backend implemented except s3")
+
+    def kw_args_generator():
         # Save to S3 if save_images_to_cloud is True
         for image in images:
-            kw_args = {
+            # Keys carry the extension of the archive format the page is uploaded in
+            image_name = get_archive_filename(os.path.split(image)[-1])
+            yield {
                 "path": image,
                 "bucket": settings.AWS_STORAGE_BUCKET_NAME,
                 "prefix": prefix,
-                "key": f"{os.path.split(pdf_path)[-1]}/{os.path.split(image)[-1]}",
+                "key": f"{os.path.split(pdf_path)[-1]}/{image_name}",
                 "append_datetime": False,
             }
 
-            cloud_storage_objects_kw_args.append(kw_args)
-    else:
-        raise NotImplementedError("No other storage backend implemented except s3")
+    return kw_args_generator()
 
-    return cloud_storage_objects_kw_args
+
+def generate_save_image_kwargs(
+    images: list,
+    pdf_path: str,
+    append_datetime: bool = True,
+    prefix: str = "media",
+    cloud_storage="s3",
+):
+    """
+
+    :param images:
+    :param pdf_path:
+    :param prefix:
+    :param cloud_storage:
+    :return:
+    """
+    return list(
+        iter_save_image_kwargs(
+            images=images,
+            pdf_path=pdf_path,
+            append_datetime=append_datetime,
+            prefix=prefix,
+            cloud_storage=cloud_storage,
+        )
+    )
 
 
 def save_images(kw_args, use_async_to_upload: bool = False):
@@ -140,7 +195,41 @@ def save_images(kw_args, use_async_to_upload: bool = False):
     if not isinstance(kw_args, list):
         kw_args = [kw_args]
 
+    if use_async_to_upload and len(kw_args) > 1:
+        from django_q.tasks import async_task
+
+        logging.info(f"Uploading {len(kw_args)} images to cloud through one async task")
+        try:
+            async_task(
+                func="ocr.ocr_utils.save_images",
+                group="Upload",
+                kw_args=kw_args,
+                use_async_to_upload=False,
+            )
+            return [
+                generate_cloud_storage_key(
+                    path=kw_arg["path"],
+                    key=kw_arg["key"],
+                    prefix=kw_arg["prefix"],
+                    append_datetime=kw_arg["append_datetime"],
+                )
+                for kw_arg in kw_args
+            ]
+        except Exception as exception:
+            logger.error("Error adding background task to upload images to cloud")
+            logger.error(exception)
+            use_async_to_upload = False
+
     logging.info("Starting image upload")
+    if not use_async_to_upload and len(kw_args) > 1:
+        logging.info("Uploading images to cloud through a bounded thread pool")
+        cloud_storage_object_paths = upload_batch_to_cloud_storage(kw_args)
+        if not any(cloud_storage_object_paths):
+            logger.warning("Image upload failed")
+        elif not all(cloud_storage_object_paths):
+            logger.warning("Not all images got uploaded to cloud storage")
+        return cloud_storage_object_paths
+
     cloud_storage_object_paths = []
     for kw_arg in kw_args:
         if use_async_to_upload:
@@ -221,12 +310,279 @@ def pdf_to_image(
     return images
 
 
+def get_pdf_page_count(pdf_path: str):
+    """
+    Reads the page count from pdfinfo without rendering any page
+
+    :param pdf_path:
+    :return:
+    """
+    return int(pdfinfo_from_path(pdf_path)["Pages"])
+
+
+def chunk_page_ranges(pages, chunk_size: int):
+    """
+    Groups sorted 1-based page numbers into contiguous (first_page, last_page) ranges
+    of at most chunk_size pages
+
+    :param pages:
+    :param chunk_size:
+    :return:
+    """
+    page_ranges = []
+    for page in pages:
+        if (
+            page_ranges
+            and page == page_ranges[-1][1] + 1
+            and page - page_ranges[-1][0] < chunk_size
+        ):
+            page_ranges[-1][1] = page
+        else:
+            page_ranges.append([page, page])
+
+    return [tuple(page_range) for page_range in page_ranges]
+
+
+def split_page_range_by_dpi(
+    first_page: int, last_page: int, page_dpis: dict = None, dpi: int = 300
+):
+    """
+    Splits a page range into runs of consecutive pages rendered at the same DPI
+
+    :param first_page:
+    :param last_page:
+    :param page_dpis: Dictionary of page number to DPI
+    :param dpi: DPI of pages missing from page_dpis
+    :return: List of (first_page, last_page, dpi)
+    """
+    dpi_runs = []
+    for page in range(first_page, last_page + 1):
+        page_dpi = page_dpis.get(page, dpi) if page_dpis else dpi
+        if dpi_runs and dpi_runs[-1][2] == page_dpi:
+            dpi_runs[-1][1] = page
+        else:
+            dpi_runs.append([page, page, page_dpi])
+
+    return [tuple(dpi_run) for dpi_run in dpi_runs]
+
+
+def iter_pdf_to_image(
+    pdf_path: str,
+    output_folder: str = None,
+    dpi: int = 300,
+    fmt: str = "png",
+    chunk_size: int = None,
+    page_count: int = None,
+    pages: list = None,
+    page_dpis: dict = None,
+):
+    """
+    Renders a pdf in chunks of pages and yields each page path as soon as its chunk
+    is on disk, so OCR of early pages can start before the whole document is rendered
+
+    :param pdf_path:
+    :param output_folder:
+    :param dpi:
+    :param fmt:
+    :param chunk_size: Pages rendered per pdftoppm call, defaults to settings.PDF_STREAM_CHUNK_SIZE
+    :param page_count: Page count if already known
+    :param pages: 1-based page numbers to render, defaults to all pages
+    :param page_dpis: Render DPI per page number, pages missing from it use dpi
+    :return: Generator of image paths in page order
+    """
+    if not output_folder:
+        output_folder = settings.LOCAL_FILES_SAVE_DIR
+
+    if not chunk_size:
+        chunk_size = settings.PDF_STREAM_CHUNK_SIZE
+
+    if pages is None:
+        if not page_count:
+            page_count = get_pdf_page_count(pdf_path)
+        pages = range(1, page_count + 1)
+
+    Path(output_folder).mkdir(parents=True, exist_ok=True)
+    thread_count = min(chunk_size, multiprocessing.cpu_count())
+    logger.info(
+        f"Streaming {len(pages)} pages to {output_folder} in chunks of {chunk_size}"
+    )
+
+    for first_page, last_page in chunk_page_ranges(sorted(pages), chunk_size):
+        # One pdftoppm call per run of pages sharing a DPI
+        for run_first_page, run_last_page, run_dpi in split_page_range_by_dpi(
+            first_page, last_page, page_dpis=page_dpis, dpi=dpi
+        ):
+            images = convert_from_path(
+                pdf_path,
+                dpi=run_dpi,
+                output_folder=output_folder,
+                first_page=run_first_page,
+                last_page=run_last_page,
+                fmt=fmt,
+                paths_only=True,
+                thread_count=min(thread_count, run_last_page - run_first_page + 1),
+            )
+            logger.info(
+                f"Pages {run_first_page}-{run_last_page} stored at {output_folder} "
+                f"at {run_dpi} dpi"
+            )
+
+            if not isinstance(images, list):
+                images = [images]
+
+            for image in images:
+                yield image
+
+
+def iter_image_frames(
+    image_path: str, output_folder: str = None, fmt: str = "png", frames: list = None
+):
+    """
+    Saves each frame of a multi-frame image such as a multi-page tiff as its own page
+    image and yields the path as soon as it is written. Only the current frame is
+    decoded, so memory stays flat however many pages the input has
+
+    :param image_path:
+    :param output_folder:
+    :param fmt:
+    :param frames: 1-based frame numbers to save, defaults to all frames
+    :return: Generator of image paths in frame order
+    """
+    if not output_folder:
+        output_folder = settings.LOCAL_FILES_SAVE_DIR
+
+    Path(output_folder).mkdir(parents=True, exist_ok=True)
+    file_prefix = uuid.uuid4().hex
+
+    with Image.open(image_path) as image:
+        frame_count = getattr(image, "n_frames", 1)
+        if frames is None:
+            frames = range(1, frame_count + 1)
+
+        logger.info(
+            f"Streaming {len(frames)} frames of {image_path} to {output_folder}"
+        )
+        number_width = len(str(frame_count))
+
+        for frame_number in sorted(frames):
+            image.seek(frame_number - 1)
+            frame_path = os.path.join(
+                output_folder,
+                f"{file_prefix}-{frame_number:0{number_width}d}.{fmt}",
+            )
+            # Encode in memory so the frame is hashed without reading the file back
+            frame_buffer = io.BytesIO()
+            image.save(frame_buffer, format=fmt)
+            write_and_hash_file(frame_path, frame_buffer.getbuffer())
+            logger.info(f"Frame {frame_number} stored at {frame_path}")
+            yield frame_path
+
+
+def is_usable_text_layer(text: str, min_chars: int = None):
+    """
+    Check if text extracted from a pdf page is real text rather than an empty layer
+    or glyph ids from fonts without a unicode mapping
+
+    :param text:
+    :param min_chars: Minimum alphanumeric characters, defaults to settings.PDF_TEXT_LAYER_MIN_CHARS
+    :return:
+    """
+    if min_chars is None:
+        min_chars = settings.PDF_TEXT_LAYER_MIN_CHARS
+
+    if not text:
+        return False
+
+    visible_chars = [char for char in text if not char.isspace()]
+    alnum_count = len([char for char in visible_chars if char.isalnum()])
+
+    return alnum_count >= min_chars and alnum_count >= 0.6 * len(visible_chars)
+
+
+def extract_pdf_text_layer(
+    pdf_path: str, min_chars: int = None, pdf_reader: PdfFileReader = None
+):
+    """
+    Extracts embedded text for pages of a born-digital pdf
+
+    :param pdf_path:
+    :param min_chars:
+    :param pdf_reader: Already open reader of pdf_path, avoids parsing the file again
+    :return: Dictionary of 1-based page number to text for pages with a usable text layer
+    """
+    text_layer = {}
+    pdf_file = None
+    try:
+        if pdf_reader is None:
+            pdf_file = open(pdf_path, "rb")
+            pdf_reader = PdfFileReader(pdf_file)
+
+        for page_index in range(pdf_reader.numPages):
+            text = pdf_reader.getPage(page_index).extractText()
+            if is_usable_text_layer(text, min_chars=min_chars):
+                text_layer[page_index + 1] = text.strip()
+    except Exception as exception:
+        logger.error(f"Text layer extraction failed for {pdf_path} - {exception}")
+        return {}
+    finally:
+        if pdf_file is not None:
+            pdf_file.close()
+
+    logger.info(f"{len(text_layer)} pages of {pdf_path} have a usable text layer")
+    return text_layer
+
+
 def generate_text_from_ocr_output(
-    ocr_dataframe: pd.DataFrame, text_join_delimiter="\n", overlap=0.3
+    ocr_dataframe: "pandas.DataFrame",
+    text_join_delimiter="\n",
+    overlap=0.3,
+    line_grouping: str = None,
 ):
     """
     Reads OCR json output and generates ocr text from it
+
+    :param ocr_dataframe:
+    :param text_join_delimiter:
+    :param overlap:
+    :param line_grouping: sweep or legacy, defaults to settings.OCR_LINE_GROUPING
+    :return:
     """
+    if not line_grouping:
+        line_grouping = settings.OCR_LINE_GROUPING
+
+    if line_grouping == "sweep":
+        return generate_text_from_word_arrays(
+            top=ocr_dataframe["top"].to_numpy(),
+            height=ocr_dataframe["height"].to_numpy(),
+            left=ocr_dataframe["left"].to_numpy(),
+            texts=ocr_dataframe["text"].tolist(),
+            text_join_delimiter=text_join_delimiter,
+            overlap=overlap,
+        )
+    elif line_grouping == "legacy":
+        return generate_text_from_ocr_output_legacy(
+            ocr_dataframe=ocr_dataframe,
+            text_join_delimiter=text_join_delimiter,
+            overlap=overlap,
+        )
+    else:
+        raise NotImplementedError(
+            f"Line grouping engine {line_grouping} not implemented, use one of {LINE_GROUPING_ENGINES}"
+        )
+
+
+def generate_text_from_ocr_output_legacy(
+    ocr_dataframe: "pandas.DataFrame", text_join_delimiter="\n", overlap=0.3
+):
+    """
+    Reads OCR json output and generates ocr text from it by re-filtering the
+    dataframe for every word. Kept selectable to compare against the sweep engine
+    """
+    # pandas is imported lazily so workers using the tsv output parser never load it
+    from pandas.core.common import SettingWithCopyWarning
+
+    warnings.simplefilter(action="ignore", category=SettingWithCopyWarning)
+
     ocr_dataframe = ocr_dataframe[ocr_dataframe["height"] < ocr_dataframe["top"].max()]
     ocr_dataframe.loc[:, "bottom"] = (
         ocr_dataframe.loc[:, "top"] + ocr_dataframe.loc[:, "height"]
@@ -312,19 +668,65 @@ def build_tesseract_ocr_config(
     return ocr_config
 
 
-def get_obj_if_already_present(checksum):
+def build_ocr_config_key(
+    ocr_config: str = None,
+    ocr_language: str = None,
+    ocr_engine: str = None,
+    preprocessing_profile: str = None,
+):
     """
+    Digest of the settings that decide the OCR text of a document, inputs with the
+    same file checksum and key produce the same outputs. Preprocessing is keyed by
+    the same signature as the page result key
+
+    :param ocr_config: Defaults to build_tesseract_ocr_config()
+    :param ocr_language: Defaults to settings.OCR_LANGUAGE
+    :param ocr_engine: Defaults to settings.OCR_ENGINE
+    :param preprocessing_profile: Defaults to settings.OCR_PREPROCESSING_PROFILE
+    :return:
+    """
+    effective_config = [
+        ocr_engine or settings.OCR_ENGINE,
+        ocr_config or build_tesseract_ocr_config(),
+        ocr_language or settings.OCR_LANGUAGE or "",
+        f"text_layer={settings.USE_PDF_TEXT_LAYER}",
+        f"preprocessing={get_profile_signature(preprocessing_profile)}",
+    ]
+    if settings.OCR_LAYOUT_SEGMENTATION:
+        effective_config.append("layout_segmentation")
+    return hashlib.sha1("|".join(effective_config).encode("utf-8")).hexdigest()
+
 
-    :param checksum:
+def get_obj_if_already_present(checksum, result_key: str = None):
+    """
+    Latest OCROutput for a page, answered from the result cache when possible and
+    otherwise with a single indexed query
+
+    :param checksum: Page image checksum
+    :param result_key: Key from build_result_cache_key, only outputs created with the
+    same OCR configuration match when given
     :return:
     """
-    objs = ocr.models.OCROutput.objects.filter(checksum=checksum)
+    dedup_cache = get_dedup_cache()
+    cache_key = result_key or checksum
+    output_obj = dedup_cache.get(cache_key)
+
+    if output_obj is not None:
+        logger.info(f"Existing results found in result cache for checksum {checksum}")
+        return output_obj
+
+    if result_key:
+        output_objs = ocr.models.OCROutput.objects.filter(result_key=result_key)
+    else:
+        output_objs = ocr.models.OCROutput.objects.filter(checksum=checksum)
+    output_obj = output_objs.order_by("-modified_at").first()
 
-    if objs:
+    if output_obj is not None:
         logger.info(
             f"Existing results found in OCROutput model for file having checksum {checksum}"
         )
-        return objs.latest("modified_at")
+        dedup_cache.set(cache_key, output_obj)
+        return output_obj
 
     logger.info(
         f"No results found in OCROutput model for file having checksum {checksum}"
@@ -332,46 +734,229 @@ def get_obj_if_already_present(checksum):
     return None
 
 
-def load_image(imagepath, preprocess: bool = True):
+def load_image(
+    imagepath,
+    preprocess: bool = True,
+    preprocessing_profile: str = None,
+    image_bytes: bytes = None,
+    rescale: bool = True,
+):
     """
 
     :param preprocess:
+    :param preprocessing_profile: Defaults to settings.OCR_PREPROCESSING_PROFILE
+    :param image_bytes: Contents of imagepath if already read, decoded instead of
+    reading the file again
+    :param rescale: False for pdf pages rendered at the DPI select_page_dpis picked
     :return:
     """
+    source = imagepath
+    if image_bytes is not None:
+        source = io.BytesIO(image_bytes)
+        source.name = imagepath
+
     if preprocess:
         logger.info("Preprocessing image")
-        image = preprocess_image_for_ocr(imagepath)
+        profile_stages = get_profile_stages(preprocessing_profile)
+        if (
+            profile_stages == PREPROCESSING_PROFILES["default"]
+            and not settings.OCR_IN_MEMORY_PIPELINE
+            and not settings.OCR_AUTO_SKIP_PREPROCESSING
+        ):
+            # Stages only run in memory, the on disk path is kept for the default stages
+            image = preprocess_image_for_ocr(source, in_memory=False, rescale=rescale)
+        else:
+            image = run_preprocessing_profile(
+                source, profile=preprocessing_profile, rescale=rescale
+            )
     else:
         logger.info("Preprocessing is set to False, reading image")
-        image = cv2.imread(imagepath)
+        if image_bytes is not None:
+            image = cv2.imdecode(
+                np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR
+            )
+        else:
+            image = cv2.imread(imagepath)
         image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
     return image
 
 
-def ocr_using_tesseract_engine(image, ocr_config=None):
+def image_to_tsv_in_memory(image, ocr_config: str, lang: str = None):
+    """
+    Runs tesseract reading the image from stdin and writing TSV to stdout so neither
+    the page image nor the OCR result touches the disk
+
+    :param image: Image path or image array
+    :param ocr_config:
+    :param lang:
+    :return: TSV string including header
+    """
+    if isinstance(image, str):
+        input_name, input_bytes = image, None
+    else:
+        _, encoded_image = cv2.imencode(".png", image)
+        input_name, input_bytes = "stdin", encoded_image.tobytes()
+
+    command = [pytesseract.pytesseract.tesseract_cmd, input_name, "stdout"]
+    if lang:
+        command += ["-l", lang]
+    command += shlex.split(f"-c tessedit_create_tsv=1 {ocr_config.strip()}")
+    command.append("tsv")
+
+    process = subprocess.run(
+        command, input=input_bytes, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    if process.returncode:
+        raise TesseractError(
+            process.returncode, process.stderr.decode("utf-8", errors="ignore")
+        )
+
+    return process.stdout.decode("utf-8")
+
+
+def image_to_tsv(image, ocr_config: str, in_memory: bool = None):
+    """
+    Runs tesseract on an image and returns its TSV output
+
+    :param image: Image path or image array
+    :param ocr_config:
+    :param in_memory: Pipe image and output through tesseract stdin/stdout instead of
+    pytesseract temp files, defaults to settings.OCR_IN_MEMORY_PIPELINE
+    :return: TSV string including header
+    """
+    if in_memory is None:
+        in_memory = settings.OCR_IN_MEMORY_PIPELINE
+
+    if in_memory:
+        return image_to_tsv_in_memory(
+            image, ocr_config=ocr_config, lang=settings.OCR_LANGUAGE
+        )
+
+    return image_to_data(
+        image,
+        config=(ocr_config),
+        lang=settings.OCR_LANGUAGE,
+        output_type="string",
+    )
+
+
+def ocr_using_tesseract_engine(
+    image, ocr_config=None, output_parser: str = None, in_memory: bool = None
+):
     """
 
     :param image:
     :param ocr_config:
+    :param output_parser: tsv or dataframe, defaults to settings.OCR_OUTPUT_PARSER
+    :param in_memory: See image_to_tsv
     :return:
     """
     logger.info("Tesseract selected as OCR engine")
     if not ocr_config:
         ocr_config = build_tesseract_ocr_config()
 
-    ocr_language = settings.OCR_LANGUAGE
-    logger.info(f"OCR Config - {ocr_config}, OCR Language - {ocr_language}")
+    if not output_parser:
+        output_parser = settings.OCR_OUTPUT_PARSER
 
-    image_data = image_to_data(
-        image,
-        config=(ocr_config),
-        lang=ocr_language,
-        output_type="data.frame",
+    if output_parser not in OUTPUT_PARSERS:
+        raise NotImplementedError(
+            f"Output parser {output_parser} not implemented, use one of {OUTPUT_PARSERS}"
+        )
+
+    logger.info(f"OCR Config - {ocr_config}, OCR Language - {settings.OCR_LANGUAGE}")
+    tsv = image_to_tsv(image, ocr_config=ocr_config, in_memory=in_memory)
+
+    if output_parser == "tsv":
+        words = parse_tesseract_tsv(tsv)
+        return generate_text_from_tesseract_words(words=words)
+
+    import pandas as pd
+
+    image_data = pd.read_csv(io.StringIO(tsv), quoting=csv.QUOTE_NONE, sep="\t")
+    return generate_text_from_ocr_output(ocr_dataframe=image_data)
+
+
+def ocr_words_using_tesseract_engine(image, ocr_config=None, in_memory: bool = None):
+    """
+    Words of an image OCRed with the tesseract subprocess
+
+    :param image:
+    :param ocr_config:
+    :param in_memory: See image_to_tsv
+    :return: TesseractWords
+    """
+    if not ocr_config:
+        ocr_config = build_tesseract_ocr_config()
+
+    return parse_tesseract_tsv(
+        image_to_tsv(image, ocr_config=ocr_config, in_memory=in_memory)
     )
-    ocr_text = generate_text_from_ocr_output(ocr_dataframe=image_data)
 
-    return ocr_text
+
+def ocr_using_layout_regions(
+    image, ocr_config=None, ocr_engine: str = "tesseract", output_parser: str = None
+):
+    """
+    OCRs only the text regions of a page and stitches their words into lines
+
+    :param image: Page array, colour pages are segmented on their grayscale
+    :param ocr_config:
+    :param ocr_engine: tesseract or tesseract_api. tesseract_api OCRs one region at a
+    time since its API is shared by the process
+    :param output_parser: tsv or dataframe, defaults to settings.OCR_OUTPUT_PARSER.
+    Like the whole page engines, only tesseract groups dataframe words into lines
+    with settings.OCR_LINE_GROUPING
+    :return: OCR text, None if the page should be OCRed whole
+    """
+    if not output_parser:
+        output_parser = settings.OCR_OUTPUT_PARSER
+
+    if output_parser not in OUTPUT_PARSERS:
+        raise NotImplementedError(
+            f"Output parser {output_parser} not implemented, use one of {OUTPUT_PARSERS}"
+        )
+
+    max_workers = None
+    if ocr_engine == "tesseract":
+        ocr_words = ocr_words_using_tesseract_engine
+    elif ocr_engine == "tesseract_api":
+        ocr_words = ocr_words_using_tesseract_api
+        output_parser = "tsv"
+        # Crops would only queue on the lock of the shared API
+        max_workers = 1
+    else:
+        raise NotImplementedError(
+            "No other OCR engine except tesseract and tesseract_api is supported currently"
+        )
+
+    regions = find_text_regions(image)
+    if not regions:
+        return None
+
+    words = ocr_text_regions(
+        image,
+        regions=regions,
+        ocr_words=lambda crop: ocr_words(image=crop, ocr_config=ocr_config),
+        max_workers=max_workers,
+    )
+    if output_parser == "tsv":
+        return generate_text_from_tesseract_words(words=words)
+
+    import pandas as pd
+
+    return generate_text_from_ocr_output(
+        ocr_dataframe=pd.DataFrame(
+            {
+                "left": words.left,
+                "top": words.top,
+                "width": words.width,
+                "height": words.height,
+                "conf": words.conf,
+                "text": words.text,
+            }
+        )
+    )
 
 
 def ocr_image(
@@ -384,6 +969,10 @@ def ocr_image(
     save_images_to_cloud: bool = True,
     save_to_cloud_kw_args=None,
     use_async_to_upload: bool = True,
+    upload_queue: list = None,
+    image_checksum: str = None,
+    preprocessing_profile: str = None,
+    rescale: bool = True,
 ):
     """
 
@@ -395,6 +984,10 @@ def ocr_image(
     :param cloud_imagepath:
     :param save_images_to_cloud
     :param save_to_cloud_kw_args
+    :param upload_queue: Collects the upload kw_args instead of uploading when given
+    :param image_checksum: Checksum of the image if it was hashed while being written
+    :param preprocessing_profile: Defaults to settings.OCR_PREPROCESSING_PROFILE
+    :param rescale: False for pdf pages rendered at the DPI select_page_dpis picked
     :return:
     """
     if save_images_to_cloud and not save_to_cloud_kw_args:
@@ -403,39 +996,147 @@ def ocr_image(
         )
 
     ocr_text = None
+    preprocessing_decision = None
+    # Reset the per page count of bytes written to local disk
+    pop_disk_writes()
+
+    image_bytes = None
+    if not image_checksum:
+        image_checksum = lookup_file_hash(imagepath)
+    if not image_checksum:
+        # Pages not hashed while they were written, e.g. pdftoppm renders, are read
+        # once and decoded below from the same bytes
+        image_bytes, image_checksum = read_and_hash_file(imagepath)
+
+    # Results are only reused for the same page OCRed the same way
+    if not ocr_config:
+        ocr_config = build_tesseract_ocr_config()
+    result_key = build_result_cache_key(
+        checksum=image_checksum,
+        ocr_config=ocr_config,
+        ocr_language=settings.OCR_LANGUAGE,
+        preprocessing=get_profile_signature(
+            preprocessing_profile, preprocess=preprocess
+        )
+        + ("-layout" if settings.OCR_LAYOUT_SEGMENTATION else ""),
+    )
 
-    image_checksum = checksum.get_for_file(imagepath)
-
-    output_obj = get_obj_if_already_present(image_checksum)
+    output_obj = get_obj_if_already_present(image_checksum, result_key=result_key)
 
     if output_obj:
         cloud_imagepath = output_obj.image_path
         ocr_text = output_obj.text
+        preprocessing_decision = output_obj.preprocessing_decision
     else:
-        image = load_image(imagepath=imagepath, preprocess=preprocess)
+        image = load_image(
+            imagepath=imagepath,
+            preprocess=preprocess,
+            preprocessing_profile=preprocessing_profile,
+            image_bytes=image_bytes,
+            rescale=rescale,
+        )
+        preprocessing_decision = pop_preprocessing_decision()
+
+        if ocr_engine == "tesseract_api" and not is_tesseract_api_available():
+            logger.warning(
+                "tesserocr is not installed, falling back to tesseract subprocess engine"
+            )
+            ocr_engine = "tesseract"
+
+        if settings.OCR_LAYOUT_SEGMENTATION:
+            ocr_text = ocr_using_layout_regions(
+                image=image, ocr_config=ocr_config, ocr_engine=ocr_engine
+            )
 
-        if ocr_engine == "tesseract":
+        if ocr_text is not None:
+            logger.info(f"OCR results of text regions received for {imagepath}")
+        elif ocr_engine == "tesseract":
             logger.info("Tesseract selected as OCR engine")
             ocr_text = ocr_using_tesseract_engine(image=image, ocr_config=ocr_config)
             logger.info(f"OCR results received for {imagepath}")
+        elif ocr_engine == "tesseract_api":
+            logger.info("Persistent tesseract API selected as OCR engine")
+            ocr_text = ocr_using_tesseract_api(image=image, ocr_config=ocr_config)
+            logger.info(f"OCR results received for {imagepath}")
         else:
             raise NotImplementedError(
-                "No other OCR engine except tesseract is supported currently"
+                "No other OCR engine except tesseract and tesseract_api is supported currently"
             )
 
-        # If checksum is unique and save to cloud is True, upload image to cloud storage
+        logger.info(
+            f"{pop_disk_writes()} bytes written to local disk while OCRing {imagepath}"
+        )
+
+        # Only the uploaded copy is re-encoded, OCR above used the lossless page
         if save_images_to_cloud:
+            save_to_cloud_kw_args = prepare_archival_upload(save_to_cloud_kw_args)
+
+        # If checksum is unique and save to cloud is True, upload image to cloud storage
+        if save_images_to_cloud and upload_queue is not None:
+            upload_queue.append(save_to_cloud_kw_args)
+        elif save_images_to_cloud:
             save_images(save_to_cloud_kw_args, use_async_to_upload)
 
     if inputocr_guid and ocr_text:
         inputocr_instance = ocr.models.OCRInput.objects.get(guid=inputocr_guid)
         logger.info(f"Saving OCR output to DB for {imagepath}")
-        _ = ocr.models.OCROutput.objects.create(
+        output_obj = ocr.models.OCROutput.objects.create(
             guid=inputocr_instance,
             image_path=cloud_imagepath,
             text=ocr_text,
             checksum=image_checksum,
+            result_key=result_key,
+            preprocessing_decision=preprocessing_decision,
         )
+        get_dedup_cache().set(result_key, output_obj)
         logger.info(f"OCR output saved to DB for {imagepath}")
+        logger.info(f"OCR result cache - {get_dedup_cache().stats()}")
 
     return ocr_text
+
+
+def ocr_images(pages_kw_args: list, use_async_to_upload: bool = True):
+    """
+    OCRs a batch of pages in one task and uploads their images together afterwards
+
+    :param pages_kw_args: List of ocr_image kw_args, one per page
+    :param use_async_to_upload:
+    :return: List of OCR texts, None for pages that failed
+    """
+    logger.info(f"OCRing a batch of {len(pages_kw_args)} pages")
+    upload_queue = []
+    ocr_texts = []
+
+    for kw_args in pages_kw_args:
+        try:
+            ocr_texts.append(ocr_image(**kw_args, upload_queue=upload_queue))
+        except Exception as exception:
+            # One broken page must not drop the rest of the batch
+            logger.error(f"OCR failed for {kw_args.get('imagepath')}")
+            logger.error(exception)
+            ocr_texts.append(None)
+
+    if upload_queue:
+        save_images(upload_queue, use_async_to_upload)
+
+    return ocr_texts
+
+
+def get_task_batch_size(page_count: int, batch_size: int = None):
+    """
+    Number of pages OCRed per async task. 0 sizes batches so every cluster worker
+    still gets at least two tasks of the document
+
+    :param page_count: Pages to be dispatched
+    :param batch_size: Defaults to settings.OCR_TASK_BATCH_SIZE
+    :return:
+    """
+    if batch_size is None:
+        batch_size = settings.OCR_TASK_BATCH_SIZE
+
+    if batch_size:
+        return batch_size
+
+    worker_count = settings.Q_CLUSTER.get("workers") or multiprocessing.cpu_count()
+    batch_size = -(-page_count // (2 * worker_count))
+    return max(1, min(batch_size, MAX_AUTO_TASK_BATCH_SIZE))
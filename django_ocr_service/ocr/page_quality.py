@@ -0,0 +1,198 @@
+"""
+Decides from a thumbnail whether a page is already clean enough to OCR without
+remove_noise_and_smooth, e.g. 1-bit fax tiffs and black and white pdf renders, and
+keeps count of the CPU time that saves
+"""
+import logging
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+PREPROCESSING_FULL = "full"
+PREPROCESSING_SKIPPED = "skipped"
+
+# Longest side of the thumbnail the page is classified from
+THUMBNAIL_SIZE = 256
+# Pixels darker than DARK_LEVEL are ink, lighter than LIGHT_LEVEL are background
+DARK_LEVEL = 64
+LIGHT_LEVEL = 192
+# Share of pixels that have to be ink or background, anti-aliased text edges of
+# rendered pages make up the rest, a few percent on text dense pages
+MIN_BILEVEL_FRACTION = 0.9
+# Median absolute deviation of the background, 0 for rendered pages and a few grey
+# levels for scanned paper
+MAX_BACKGROUND_NOISE = 1.0
+
+
+class PreprocessingSkipStats:
+    """
+    Pages classified and skipped by this process, and the preprocessing time that
+    skipping saved, estimated from the time per pixel of the pages that were preprocessed
+    """
+
+    def __init__(self):
+        """ """
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+
+        :return:
+        """
+        self.pages_classified = 0
+        self.pages_skipped = 0
+        self.classifier_seconds = 0.0
+        self.preprocessed_pixels = 0
+        self.preprocessing_seconds = 0.0
+        self.skipped_pixels = 0
+
+    def record_classified(self, decision: str, seconds: float):
+        """
+
+        :param decision:
+        :param seconds:
+        :return:
+        """
+        with self._lock:
+            self.pages_classified += 1
+            self.pages_skipped += decision == PREPROCESSING_SKIPPED
+            self.classifier_seconds += seconds
+
+    def record_preprocessed(self, pixels: int, seconds: float):
+        """
+
+        :param pixels:
+        :param seconds:
+        :return:
+        """
+        with self._lock:
+            self.preprocessed_pixels += pixels
+            self.preprocessing_seconds += seconds
+
+    def record_skipped(self, pixels: int):
+        """
+
+        :param pixels:
+        :return:
+        """
+        with self._lock:
+            self.skipped_pixels += pixels
+
+    def as_dict(self):
+        """
+
+        :return:
+        """
+        with self._lock:
+            seconds_per_pixel = (
+                self.preprocessing_seconds / self.preprocessed_pixels
+                if self.preprocessed_pixels
+                else 0.0
+            )
+            return {
+                "pages_classified": self.pages_classified,
+                "pages_skipped": self.pages_skipped,
+                "classifier_seconds": self.classifier_seconds,
+                "seconds_saved": self.skipped_pixels * seconds_per_pixel
+                - self.classifier_seconds,
+            }
+
+
+_skip_stats = PreprocessingSkipStats()
+
+
+def get_preprocessing_skip_stats():
+    """
+    Aggregate classifier decisions and net CPU seconds saved by this process
+
+    :return:
+    """
+    return _skip_stats.as_dict()
+
+
+def get_thumbnail(image: Image.Image):
+    """
+    Grayscale thumbnail sampled with nearest neighbour, so the pixel values of the
+    page are kept instead of averaged into greys
+
+    :param image:
+    :return: Grayscale array
+    """
+    width, height = image.size
+    step = max(1, -(-max(width, height) // THUMBNAIL_SIZE))
+    thumbnail = image.resize(
+        (max(1, width // step), max(1, height // step)), Image.NEAREST
+    )
+    return np.asarray(thumbnail.convert("L"))
+
+
+def classify_page(image: Image.Image):
+    """
+    Classifies a page from its bit depth, the histogram of its thumbnail and the noise
+    of its background
+
+    :param image: PIL image of the page as loaded from disk
+    :return: Dictionary with the decision, PREPROCESSING_SKIPPED for clean pages, and
+    the measures it was taken from
+    """
+    start = time.perf_counter()
+    if image.mode == "1":
+        bilevel_fraction, background_noise = 1.0, 0.0
+    else:
+        thumbnail = get_thumbnail(image)
+        is_background = thumbnail >= LIGHT_LEVEL
+        bilevel_fraction = float(
+            np.count_nonzero(is_background | (thumbnail <= DARK_LEVEL)) / thumbnail.size
+        )
+        background = thumbnail[is_background]
+        if background.size:
+            background_noise = float(
+                np.median(np.abs(background - np.median(background)))
+            )
+        else:
+            background_noise = float("inf")
+
+    if (
+        bilevel_fraction >= MIN_BILEVEL_FRACTION
+        and background_noise <= MAX_BACKGROUND_NOISE
+    ):
+        decision = PREPROCESSING_SKIPPED
+    else:
+        decision = PREPROCESSING_FULL
+
+    seconds = time.perf_counter() - start
+    _skip_stats.record_classified(decision, seconds)
+    logger.info(
+        f"Page classified as {decision} - bilevel fraction {bilevel_fraction:.3f}, "
+        f"background noise {background_noise:.1f}, {seconds * 1000:.1f}ms"
+    )
+    return {
+        "decision": decision,
+        "bilevel_fraction": bilevel_fraction,
+        "background_noise": background_noise,
+    }
+
+
+def record_preprocessed(pixels: int, seconds: float):
+    """
+    Adds a preprocessed page to the time per pixel skipped pages are estimated with
+
+    :param pixels:
+    :param seconds:
+    :return:
+    """
+    _skip_stats.record_preprocessed(pixels, seconds)
+
+
+def record_skipped(pixels: int):
+    """
+
+    :param pixels:
+    :return:
+    """
+    _skip_stats.record_skipped(pixels)
@@ -0,0 +1,383 @@
+"""
+Registry of preprocessing stages composed into named profiles. Each OCRInput can pick
+a profile to trade OCR latency against accuracy, every stage run is timed
+"""
+import logging
+import threading
+import time
+
+import cv2
+from django.conf import settings
+import numpy as np
+from PIL import Image
+
+from .image_preprocessing import (
+    get_preprocessing_signature,
+    remove_noise_and_smooth_array,
+    scale_image,
+    to_gray_array,
+)
+from .page_quality import (
+    PREPROCESSING_SKIPPED,
+    classify_page,
+    get_preprocessing_skip_stats,
+    record_preprocessed,
+    record_skipped,
+)
+
+logger = logging.getLogger(__name__)
+
+# Stage name to function of the page image returning the processed page image
+PREPROCESSING_STAGES = {}
+# Stages that decide whether the remaining stages of a profile are skipped
+STOP_STAGES = set()
+# Stages OCR_AUTO_SKIP_PREPROCESSING skips on pages classified as clean
+CLEAN_PAGE_SKIPPED_STAGES = set()
+
+PREPROCESSING_PROFILES = {
+    # Same image as preprocess_image_for_ocr
+    "default": ["scale", "binarize"],
+    # Already bilevel pages, e.g. fax tiffs and clean renders, are OCRed as they are
+    "fast": ["skip_if_bilevel", "scale", "binarize"],
+    # Photos and skewed scans
+    "photo": ["scale", "denoise", "deskew", "crop_borders", "binarize"],
+    "none": ["skip"],
+}
+
+DENOISE_KERNEL_SIZE = 3
+# Skew angles searched by deskew, in degrees
+DESKEW_MAX_ANGLE = 5.0
+DESKEW_STEP = 0.25
+# Width deskew estimates the skew angle at
+DESKEW_SAMPLE_WIDTH = 800
+# Rows and columns with more ink than this are scanner borders, not content
+BORDER_INK_RATIO = 0.9
+CROP_MARGIN = 10
+
+# Stage timings and clean page decision of the last page preprocessed by the current thread
+_stage_timings = threading.local()
+
+
+def register_preprocessing_stage(
+    name: str, stops_pipeline: bool = False, skipped_on_clean_pages: bool = False
+):
+    """
+    Decorator adding a function to the stage registry. Stages take and return the page
+    image, stops_pipeline stages instead return True if the remaining stages of the
+    profile should be skipped
+
+    :param name:
+    :param stops_pipeline:
+    :param skipped_on_clean_pages: Skip the stage on pages classify_page finds clean
+    :return:
+    """
+
+    def decorator(func):
+        PREPROCESSING_STAGES[name] = func
+        for stages, add in (
+            (STOP_STAGES, stops_pipeline),
+            (CLEAN_PAGE_SKIPPED_STAGES, skipped_on_clean_pages),
+        ):
+            if add:
+                stages.add(name)
+            else:
+                stages.discard(name)
+        return func
+
+    return decorator
+
+
+def count_pixels(image):
+    """
+
+    :param image: PIL image or image array
+    :return:
+    """
+    if isinstance(image, np.ndarray):
+        return image.shape[0] * image.shape[1]
+    return image.size[0] * image.size[1]
+
+
+def get_profile_stages(profile: str = None):
+    """
+    Stages of a profile, profiles in settings.OCR_PREPROCESSING_PROFILES take
+    precedence over the built in ones
+
+    :param profile: Defaults to settings.OCR_PREPROCESSING_PROFILE
+    :return: List of stage names
+    """
+    if not profile:
+        profile = settings.OCR_PREPROCESSING_PROFILE
+
+    profiles = {**PREPROCESSING_PROFILES, **(settings.OCR_PREPROCESSING_PROFILES or {})}
+    if profile not in profiles:
+        raise NotImplementedError(
+            f"Preprocessing profile {profile} not implemented, use one of {sorted(profiles)}"
+        )
+
+    stages = list(profiles[profile])
+    unknown_stages = [stage for stage in stages if stage not in PREPROCESSING_STAGES]
+    if unknown_stages:
+        raise NotImplementedError(
+            f"Preprocessing stages {unknown_stages} of profile {profile} not implemented, "
+            f"use any of {sorted(PREPROCESSING_STAGES)}"
+        )
+
+    return stages
+
+
+def get_profile_signature(profile: str = None, preprocess: bool = True):
+    """
+    Preprocessing signature of a profile for the result cache key. The default stages
+    keep the signature of preprocess_image_for_ocr
+
+    :param profile:
+    :param preprocess:
+    :return:
+    """
+    signature = get_preprocessing_signature(preprocess)
+    if not preprocess:
+        return signature
+
+    stages = get_profile_stages(profile)
+    if stages == PREPROCESSING_PROFILES["default"]:
+        return signature
+    return f"{signature}-{'+'.join(stages)}"
+
+
+def run_preprocessing_profile(
+    file_path: str, profile: str = None, rescale: bool = True
+):
+    """
+    Runs the stages of a profile over a page image in memory
+
+    :param file_path: Path or binary file object of the page image
+    :param profile: Defaults to settings.OCR_PREPROCESSING_PROFILE
+    :param rescale: False skips the scale stage for pages rendered at the DPI
+    select_page_dpis picked
+    :return: Grayscale image array
+    """
+    if not profile:
+        profile = settings.OCR_PREPROCESSING_PROFILE
+
+    stages = get_profile_stages(profile)
+    timings = []
+    image = Image.open(file_path)
+
+    decision = None
+    if settings.OCR_AUTO_SKIP_PREPROCESSING and any(
+        stage in CLEAN_PAGE_SKIPPED_STAGES for stage in stages
+    ):
+        # Decode first so the classifier time only counts the classification
+        image.load()
+        decision = classify_page(image)["decision"]
+
+    for stage in stages:
+        if stage == "scale" and not rescale:
+            continue
+
+        if stage in CLEAN_PAGE_SKIPPED_STAGES and decision == PREPROCESSING_SKIPPED:
+            record_skipped(count_pixels(image))
+            continue
+
+        pixels = count_pixels(image)
+        start = time.perf_counter()
+        if stage in STOP_STAGES:
+            stop = PREPROCESSING_STAGES[stage](image)
+        else:
+            image = PREPROCESSING_STAGES[stage](image)
+            stop = False
+        seconds = time.perf_counter() - start
+        timings.append((stage, seconds))
+
+        if stage in CLEAN_PAGE_SKIPPED_STAGES:
+            record_preprocessed(pixels, seconds)
+
+        if stop:
+            logger.info(f"Stage {stage} skipped the remaining preprocessing stages")
+            break
+
+    image = to_gray_array(image)
+    _stage_timings.timings = timings
+    _stage_timings.decision = decision
+    logger.info(
+        f"Cloud Log: Preprocessed {getattr(file_path, 'name', file_path)} with "
+        f"profile {profile} - "
+        + ", ".join(f"{stage} {seconds * 1000:.1f}ms" for stage, seconds in timings)
+    )
+    if decision:
+        logger.info(
+            f"Cloud Log: Preprocessing skip stats - {get_preprocessing_skip_stats()}"
+        )
+    return image
+
+
+def pop_stage_timings():
+    """
+    Returns the (stage, seconds) timings of the last page preprocessed by the current
+    thread and resets them
+
+    :return:
+    """
+    timings = getattr(_stage_timings, "timings", [])
+    _stage_timings.timings = []
+    return timings
+
+
+def pop_preprocessing_decision():
+    """
+    Returns PREPROCESSING_FULL or PREPROCESSING_SKIPPED for the last page preprocessed
+    by the current thread, None if it was not classified, and resets it
+
+    :return:
+    """
+    decision = getattr(_stage_timings, "decision", None)
+    _stage_timings.decision = None
+    return decision
+
+
+@register_preprocessing_stage("skip", stops_pipeline=True)
+def skip(image):
+    """
+    Skips every following stage
+
+    :param image:
+    :return:
+    """
+    return True
+
+
+@register_preprocessing_stage("skip_if_bilevel", stops_pipeline=True)
+def is_bilevel_image(image):
+    """
+    True if every pixel of the page is black or white
+
+    :param image: PIL image or grayscale array
+    :return:
+    """
+    if not isinstance(image, np.ndarray) and image.mode == "1":
+        return True
+
+    gray = to_gray_array(image)
+    return not np.count_nonzero((gray != 0) & (gray != 255))
+
+
+@register_preprocessing_stage("scale")
+def scale(image):
+    """
+    Upscales the page to IMAGE_SIZE, or to the target x-height with OCR_ADAPTIVE_DPI
+
+    :param image: PIL image or grayscale array
+    :return:
+    """
+    if isinstance(image, np.ndarray):
+        return np.asarray(scale_image(Image.fromarray(image)))
+    return scale_image(image)
+
+
+@register_preprocessing_stage("denoise")
+def denoise(image):
+    """
+    Median filter removing salt and pepper noise of photos and low quality scans
+
+    :param image:
+    :return:
+    """
+    return cv2.medianBlur(to_gray_array(image), DENOISE_KERNEL_SIZE)
+
+
+def estimate_skew_angle(gray: np.ndarray):
+    """
+    Rotation in degrees that makes text lines horizontal, found as the angle whose
+    row profile of ink is the most peaked on a downscaled copy of the page
+
+    :param gray: Grayscale image array
+    :return:
+    """
+    sample_scale = min(1.0, DESKEW_SAMPLE_WIDTH / gray.shape[1])
+    if sample_scale < 1.0:
+        gray = cv2.resize(
+            gray, None, fx=sample_scale, fy=sample_scale, interpolation=cv2.INTER_AREA
+        )
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    height, width = ink.shape
+
+    # Smallest angles first so an unskewed page keeps angle 0 on ties
+    angles = np.arange(
+        -DESKEW_MAX_ANGLE, DESKEW_MAX_ANGLE + DESKEW_STEP / 2, DESKEW_STEP
+    )
+    best_angle, best_score = 0.0, -1.0
+    for angle in sorted(angles, key=abs):
+        rotation = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+        rotated = cv2.warpAffine(
+            ink, rotation, (width, height), flags=cv2.INTER_NEAREST
+        )
+        score = float(np.var(rotated.sum(axis=1, dtype=np.int64)))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+
+    return best_angle
+
+
+@register_preprocessing_stage("deskew")
+def deskew(image):
+    """
+    Rotates skewed pages so text lines are horizontal
+
+    :param image:
+    :return:
+    """
+    gray = to_gray_array(image)
+    angle = estimate_skew_angle(gray)
+    if abs(angle) < DESKEW_STEP / 2:
+        return gray
+
+    logger.info(f"Deskewing page by {angle:.2f} degrees")
+    height, width = gray.shape
+    rotation = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(
+        gray,
+        rotation,
+        (width, height),
+        flags=cv2.INTER_LINEAR,
+        borderMode=cv2.BORDER_CONSTANT,
+        borderValue=255,
+    )
+
+
+@register_preprocessing_stage("crop_borders")
+def crop_borders(image):
+    """
+    Crops the page to its content, dropping blank margins and dark scanner borders
+
+    :param image:
+    :return:
+    """
+    gray = to_gray_array(image)
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+
+    height, width = ink.shape
+    ink[np.count_nonzero(ink, axis=1) > BORDER_INK_RATIO * width, :] = 0
+    ink[:, np.count_nonzero(ink, axis=0) > BORDER_INK_RATIO * height] = 0
+
+    content = cv2.findNonZero(ink)
+    if content is None:
+        return gray
+
+    x, y, content_width, content_height = cv2.boundingRect(content)
+    top, left = max(0, y - CROP_MARGIN), max(0, x - CROP_MARGIN)
+    bottom = min(height, y + content_height + CROP_MARGIN)
+    right = min(width, x + content_width + CROP_MARGIN)
+    return np.ascontiguousarray(gray[top:bottom, left:right])
+
+
+@register_preprocessing_stage("binarize", skipped_on_clean_pages=True)
+def binarize(image):
+    """
+    Adaptive and fixed threshold of remove_noise_and_smooth
+
+    :param image:
+    :return:
+    """
+    gray = to_gray_array(image)
+    return remove_noise_and_smooth_array(gray, in_place=gray.flags.writeable)
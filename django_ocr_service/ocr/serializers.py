@@ -1,8 +1,29 @@
 from rest_framework import serializers
 from .models import OCRInput
+from .preprocessing_profiles import get_profile_stages
 
 
 class OCRInputSerializer(serializers.ModelSerializer):
     class Meta:
         model = OCRInput
-        fields = ["cloud_storage_uri", "file", "ocr_config", "ocr_language"]
+        fields = [
+            "cloud_storage_uri",
+            "file",
+            "ocr_config",
+            "ocr_language",
+            "preprocessing_profile",
+        ]
+
+    def validate_preprocessing_profile(self, value):
+        """
+        Rejects profiles that are neither built in nor in OCR_PREPROCESSING_PROFILES
+
+        :param value:
+        :return:
+        """
+        if value:
+            try:
+                get_profile_stages(value)
+            except NotImplementedError as exception:
+                raise serializers.ValidationError(str(exception))
+        return value
@@ -1,37 +1,149 @@
 """
 Storage utils
 """
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 import logging
 import os
+import re
+import threading
+import time
 
-from django.core.files.base import ContentFile
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from django.conf import settings
 from s3urls import parse_url
 
-from django_ocr_service.custom_storage import CloudMediaStorage
+from django_ocr_service.custom_storage import PooledCloudMediaStorage
+from .hashing import (
+    HASH_CHUNK_SIZE,
+    HashingWriter,
+    OrderedPartHasher,
+    remember_file_hash,
+)
 
 logger = logging.getLogger(__name__)
 
+# Storages keyed by bucket and location, shared by all helpers of a process
+_cloud_storages = {}
+_cloud_storages_lock = threading.Lock()
+_cloud_storages_pid = None
+_cloud_storage_counts = {"created": 0, "reused": 0}
+
+# DeleteObjects accepts at most 1000 keys per request
+MAX_DELETE_BATCH_SIZE = 1000
+DELETE_BATCH_WORKERS = 4
+
+
+def build_s3_client_config():
+    """
+    Botocore config of pooled storages, mirrors the django-storages default config
+    with a connection pool sized for concurrent transfers of a worker
+    :return:
+    """
+    config_kwargs = {
+        "s3": {"addressing_style": getattr(settings, "AWS_S3_ADDRESSING_STYLE", None)},
+        "signature_version": getattr(settings, "AWS_S3_SIGNATURE_VERSION", None),
+        "proxies": getattr(settings, "AWS_S3_PROXIES", None),
+        "max_pool_connections": settings.OCR_S3_MAX_POOL_CONNECTIONS,
+    }
+    # Older botocore releases do not support tcp keepalive
+    if "tcp_keepalive" in Config.OPTION_DEFAULTS:
+        config_kwargs["tcp_keepalive"] = True
+
+    return Config(**config_kwargs)
+
 
 def instantiate_custom_cloud_stroage(
     bucket: str = None, clear_default_location: bool = True
 ):
     """
-    Simple instantiates cloud_storage and retun instance object
+    Returns the process wide cloud storage of the bucket, created on first use so
+    sessions and HTTP connections are reused across calls
+
+    :param bucket: Bucket Name, defaults to settings.AWS_STORAGE_BUCKET_NAME
+    :param clear_default_location: Use the top dir of the bucket as location
     :return:
     """
-    cloud_storage = CloudMediaStorage()
+    global _cloud_storages_pid
+
+    if not bucket:
+        bucket = settings.AWS_STORAGE_BUCKET_NAME
+    cache_key = (bucket, clear_default_location)
+
+    with _cloud_storages_lock:
+        # boto3 sessions are not fork safe, forked workers build their own storages
+        if _cloud_storages_pid != os.getpid():
+            _cloud_storages.clear()
+            _cloud_storages_pid = os.getpid()
+
+        cloud_storage = _cloud_storages.get(cache_key)
+        if cloud_storage is None:
+            storage_kwargs = {"bucket_name": bucket}
+            # Set location to top dir so we can get the full location from generate_cloud_storage_key method
+            if clear_default_location:
+                storage_kwargs["location"] = ""
+
+            cloud_storage = PooledCloudMediaStorage(**storage_kwargs)
+            # config is not an init setting, it is read when the first connection is made
+            cloud_storage.config = build_s3_client_config()
+            _cloud_storages[cache_key] = cloud_storage
+            _cloud_storage_counts["created"] += 1
+            logger.info(f"Created pooled cloud storage for {cache_key}")
+        else:
+            _cloud_storage_counts["reused"] += 1
 
-    # Set location to top dir so we can get the full location from generate_cloud_storage_key method
-    if clear_default_location:
-        cloud_storage.location = ""
+    return cloud_storage
 
-    # Change bucket name if it comes as part of input else use settings
-    if bucket:
-        cloud_storage.bucket._name = bucket
 
-    return cloud_storage
+def get_cloud_storage_stats():
+    """
+    Storages created and reused by this process, and HTTP connections opened and
+    requests sent through the live connection pools of those storages
+    :return:
+    """
+    with _cloud_storages_lock:
+        cloud_storages = list(_cloud_storages.values())
+        stats = {
+            "storages_created": _cloud_storage_counts["created"],
+            "storages_reused": _cloud_storage_counts["reused"],
+        }
+
+    connections_opened = 0
+    requests = 0
+    for cloud_storage in cloud_storages:
+        with cloud_storage._thread_connections_lock:
+            connections = list(cloud_storage.thread_connections)
+        for connection in connections:
+            pool_manager = connection.meta.client._endpoint.http_session._manager
+            for pool_key in pool_manager.pools.keys():
+                pool = pool_manager.pools.get(pool_key)
+                if pool is not None:
+                    connections_opened += pool.num_connections
+                    requests += pool.num_requests
+
+    stats["connections_opened"] = connections_opened
+    stats["connections_reused"] = max(requests - connections_opened, 0)
+    return stats
+
+
+def log_cloud_storage_stats():
+    """
+    Logs the storage and connection reuse of this process after a batch of transfers
+    :return:
+    """
+    logger.info(f"Cloud Log: Cloud storage connections - {get_cloud_storage_stats()}")
+
+
+def clear_cloud_storages():
+    """
+    Drops the pooled storages of this process and resets the counters
+    :return:
+    """
+    with _cloud_storages_lock:
+        _cloud_storages.clear()
+        _cloud_storage_counts["created"] = 0
+        _cloud_storage_counts["reused"] = 0
 
 
 def generate_cloud_storage_key(
@@ -64,6 +176,113 @@ def generate_cloud_storage_key(
     return key
 
 
+class TransferProgress:
+    """
+    Thread safe byte counter of an upload or download, logs every 10 percent and passes
+    progress to an optional callback
+    """
+
+    def __init__(self, description: str, total_bytes: int, progress_callback=None):
+        """
+
+        :param description: Logged with the progress, e.g. Downloaded s3 object key
+        :param total_bytes:
+        :param progress_callback: Called with bytes downloaded so far and total bytes
+        """
+        self.description = description
+        self.total_bytes = total_bytes
+        self.progress_callback = progress_callback
+        self.bytes_done = 0
+        self._logged_step = 0
+        self._lock = threading.Lock()
+
+    def update(self, nbytes: int):
+        """
+
+        :param nbytes: Bytes written since the last update
+        :return:
+        """
+        with self._lock:
+            self.bytes_done += nbytes
+            bytes_done = self.bytes_done
+            step = bytes_done * 10 // self.total_bytes if self.total_bytes else 10
+            log_progress = step > self._logged_step
+            if log_progress:
+                self._logged_step = step
+
+        if log_progress:
+            logger.info(f"{self.description}: {bytes_done}/{self.total_bytes} bytes")
+        if self.progress_callback:
+            self.progress_callback(bytes_done, self.total_bytes)
+
+
+def stream_upload_to_cloud_storage(
+    path: str,
+    key: str,
+    bucket: str = None,
+    multipart_threshold: int = None,
+    part_size: int = None,
+    concurrency: int = None,
+    progress_callback=None,
+):
+    """
+    Uploads a local file straight from its file handle without reading it into memory.
+    Files above the multipart threshold are uploaded as parallel multipart parts
+
+    :param path: Local filepath
+    :param key: Object path, used as is
+    :param bucket: Bucket Name
+    :param multipart_threshold: Bytes above which multipart upload is used, defaults to
+    settings.OCR_UPLOAD_MULTIPART_THRESHOLD
+    :param part_size: Bytes per part, defaults to settings.OCR_UPLOAD_PART_SIZE
+    :param concurrency: Parallel part uploads, defaults to settings.OCR_UPLOAD_CONCURRENCY
+    :param progress_callback: Called with bytes uploaded so far and total bytes
+    :return: Dictionary of bytes, seconds and throughput in MB/s
+    """
+    if not multipart_threshold:
+        multipart_threshold = settings.OCR_UPLOAD_MULTIPART_THRESHOLD
+    if not part_size:
+        part_size = settings.OCR_UPLOAD_PART_SIZE
+    if not concurrency:
+        concurrency = settings.OCR_UPLOAD_CONCURRENCY
+
+    cloud_storage = instantiate_custom_cloud_stroage(
+        bucket=bucket, clear_default_location=True
+    )
+    name = cloud_storage._normalize_name(cloud_storage._clean_name(key))
+    transfer_config = TransferConfig(
+        multipart_threshold=multipart_threshold,
+        multipart_chunksize=part_size,
+        max_concurrency=concurrency,
+        use_threads=concurrency > 1,
+    )
+
+    total_bytes = os.path.getsize(path)
+    progress = TransferProgress(
+        f"Uploaded file {path} to {key}", total_bytes, progress_callback
+    )
+
+    start = time.perf_counter()
+    with open(path, "rb") as infile:
+        cloud_storage.client.upload_fileobj(
+            infile,
+            cloud_storage.bucket_name,
+            name,
+            ExtraArgs=cloud_storage._get_write_parameters(name),
+            Config=transfer_config,
+            Callback=progress.update,
+        )
+
+    seconds = time.perf_counter() - start
+    throughput = total_bytes / (1024 * 1024) / seconds if seconds else 0.0
+    logger.info(
+        f"Uploaded file {path} of {total_bytes} bytes to {key} in {seconds:.2f}s "
+        f"({throughput:.1f} MB/s)"
+    )
+
+    return {"bytes": total_bytes, "seconds": seconds, "throughput": throughput}
+
+
 def upload_to_cloud_storage(
     path: str,
     bucket: str = None,
@@ -91,8 +310,7 @@ def upload_to_cloud_storage(
 
     try:
         logger.info(f"Attempting to upload file {path} to {key}")
-        with open(path, "rb") as infile:
-            _ = cloud_storage.save(key, ContentFile(infile.read()))
+        stream_upload_to_cloud_storage(path=path, key=key, bucket=bucket)
         logger.info(f"Successfully uploaded file {path} to {key}")
     except Exception as exception:
         logger.error(exception)
@@ -100,6 +318,57 @@ def upload_to_cloud_storage(
     return cloud_storage.url(name=key)
 
 
+def upload_batch_to_cloud_storage(kw_args: list, max_workers: int = None):
+    """
+    Uploads every file of a document, e.g. the kw_args of generate_save_image_kwargs,
+    concurrently on a bounded thread pool sharing one pooled client
+
+    :param kw_args: List of upload_to_cloud_storage kw_args
+    :param max_workers: Parallel uploads, defaults to settings.OCR_UPLOAD_BATCH_WORKERS
+    :return: Keys in the order of kw_args, None for files that failed to upload
+    """
+    if not max_workers:
+        max_workers = settings.OCR_UPLOAD_BATCH_WORKERS
+
+    if not kw_args:
+        return []
+
+    def upload(kw_arg):
+        key = kw_arg.get("key")
+        try:
+            key = generate_cloud_storage_key(
+                path=kw_arg["path"],
+                key=key,
+                prefix=kw_arg.get("prefix"),
+                append_datetime=kw_arg.get("append_datetime", True),
+            )
+            # Files are uploaded in parallel already, parts of each file are not
+            stream_upload_to_cloud_storage(
+                path=kw_arg["path"],
+                key=key,
+                bucket=kw_arg.get("bucket"),
+                concurrency=1,
+            )
+        except Exception as exception:
+            logger.error(f"Upload of {kw_arg['path']} to {key} failed")
+            logger.error(exception)
+            return None
+        return key
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(kw_args))) as executor:
+        keys = list(executor.map(upload, kw_args))
+
+    failed_count = keys.count(None)
+    logger.info(
+        f"Cloud Log: Uploaded {len(keys) - failed_count} of {len(keys)} files in "
+        f"{time.perf_counter() - start:.2f}s with {failed_count} failures"
+    )
+    log_cloud_storage_stats()
+
+    return keys
+
+
 def generate_cloud_object_url(
     key: str,
     bucket: str = None,
@@ -114,6 +383,129 @@ def generate_cloud_object_url(
     return cloud_storage.url(name=key)
 
 
+def _write_stream(body, write, progress: TransferProgress):
+    """
+    Copies a streaming body in chunks
+
+    :param body: botocore StreamingBody
+    :param write: Called with each chunk
+    :param progress:
+    :return: Bytes copied
+    """
+    nbytes = 0
+    for chunk in iter(lambda: body.read(HASH_CHUNK_SIZE), b""):
+        write(chunk)
+        nbytes += len(chunk)
+        progress.update(len(chunk))
+    return nbytes
+
+
+def download_from_cloud_storage(
+    key: str,
+    save_path: str,
+    bucket: str = None,
+    part_size: int = None,
+    concurrency: int = None,
+    progress_callback=None,
+):
+    """
+    Streams an object straight to disk without holding it in memory. Objects larger
+    than part_size are fetched as parallel ranged GETs, each written at its offset
+
+    :param key: Object path
+    :param save_path: Local filepath to write to
+    :param bucket: Bucket Name
+    :param part_size: Bytes per ranged GET, defaults to settings.OCR_DOWNLOAD_PART_SIZE
+    :param concurrency: Parallel ranged GETs, defaults to settings.OCR_DOWNLOAD_CONCURRENCY
+    :param progress_callback: Called with bytes downloaded so far and total bytes
+    :return: Dictionary of bytes, parts, seconds, throughput in MB/s and checksum
+    """
+    if not part_size:
+        part_size = settings.OCR_DOWNLOAD_PART_SIZE
+    if not concurrency:
+        concurrency = settings.OCR_DOWNLOAD_CONCURRENCY
+
+    cloud_storage = instantiate_custom_cloud_stroage(
+        bucket=bucket, clear_default_location=True
+    )
+    client = cloud_storage.client
+    object_kwargs = {
+        "Bucket": cloud_storage.bucket.name,
+        "Key": cloud_storage._normalize_name(cloud_storage._clean_name(key)),
+    }
+
+    start = time.perf_counter()
+    total_bytes = client.head_object(**object_kwargs)["ContentLength"]
+    progress = TransferProgress(
+        f"Downloaded s3 object {key}", total_bytes, progress_callback
+    )
+    checksum = None
+
+    try:
+        # Opened for reading too, ranged parts are hashed back from the page cache
+        with open(save_path, "w+b") as savefile:
+            if concurrency <= 1 or total_bytes <= part_size:
+                # Hash while streaming so the input is not read again for its checksum
+                hashing_writer = HashingWriter(savefile)
+                body = client.get_object(**object_kwargs)["Body"]
+                _write_stream(body, hashing_writer.write, progress)
+                checksum = hashing_writer.hexdigest()
+                part_count = 1
+            else:
+                byte_ranges = [
+                    (first, min(first + part_size, total_bytes) - 1)
+                    for first in range(0, total_bytes, part_size)
+                ]
+                part_count = len(byte_ranges)
+                savefile.truncate(total_bytes)
+                fileno = savefile.fileno()
+                part_hasher = OrderedPartHasher(fileno, byte_ranges)
+
+                def download_part(part_index):
+                    first, last = byte_ranges[part_index]
+                    offset = [first]
+
+                    def write_at_offset(chunk):
+                        os.pwrite(fileno, chunk, offset[0])
+                        offset[0] += len(chunk)
+
+                    body = client.get_object(
+                        Range=f"bytes={first}-{last}", **object_kwargs
+                    )["Body"]
+                    nbytes = _write_stream(body, write_at_offset, progress)
+                    if nbytes != last - first + 1:
+                        raise IOError(
+                            f"Part {first}-{last} of {key} returned {nbytes} bytes"
+                        )
+                    part_hasher.part_done(part_index)
+
+                with ThreadPoolExecutor(
+                    max_workers=min(concurrency, part_count)
+                ) as executor:
+                    list(executor.map(download_part, range(part_count)))
+                checksum = part_hasher.hexdigest()
+    except Exception:
+        if os.path.exists(save_path):
+            os.remove(save_path)
+        raise
+
+    seconds = time.perf_counter() - start
+    throughput = total_bytes / (1024 * 1024) / seconds if seconds else 0.0
+    logger.info(
+        f"Downloaded s3 object {key} of {total_bytes} bytes in {part_count} parts in "
+        f"{seconds:.2f}s ({throughput:.1f} MB/s)"
+    )
+    log_cloud_storage_stats()
+
+    return {
+        "bytes": total_bytes,
+        "parts": part_count,
+        "seconds": seconds,
+        "throughput": throughput,
+        "checksum": checksum,
+    }
+
+
 def load_from_cloud_storage_and_save(
     key: str, bucket: str = None, local_save_dir: str = "/tmp"
 ):
@@ -128,14 +520,12 @@ def load_from_cloud_storage_and_save(
     obj_name = os.path.split(key)[-1]
     save_path = os.path.join(local_save_dir, obj_name)
 
-    cloud_storage = instantiate_custom_cloud_stroage(
-        bucket=bucket, clear_default_location=True
-    )
     try:
-        with cloud_storage.open(key) as openfile:
-            with open(save_path, "wb") as savefile:
-                savefile.write(openfile.read())
-
+        download_stats = download_from_cloud_storage(
+            key=key, save_path=save_path, bucket=bucket
+        )
+        if download_stats["checksum"]:
+            remember_file_hash(save_path, download_stats["checksum"])
         logger.info(f"Downloaded s3 object {key} and saved to {save_path}")
     except Exception as exception:
         logger.error(exception)
@@ -144,19 +534,94 @@ def load_from_cloud_storage_and_save(
     return save_path
 
 
-def delete_objects_from_cloud_storage(keys, bucket: str = None):
+def bulk_delete_objects_from_cloud_storage(
+    keys, bucket: str = None, batch_size: int = None, max_workers: int = None
+):
+    """
+    Deletes keys with DeleteObjects requests of up to 1000 keys, running the batches
+    concurrently on the pooled client
+
+    :param keys: Object paths
+    :param bucket: Bucket Name
+    :param batch_size: Keys per DeleteObjects request, at most MAX_DELETE_BATCH_SIZE
+    :param max_workers: Parallel DeleteObjects requests
+    :return: Dictionary of deleted count and failed keys mapped to their error
+    """
+    if not batch_size:
+        batch_size = MAX_DELETE_BATCH_SIZE
+    if not max_workers:
+        max_workers = DELETE_BATCH_WORKERS
+    batch_size = min(batch_size, MAX_DELETE_BATCH_SIZE)
+
+    if isinstance(keys, str):
+        keys = [keys]
+    keys = list(keys)
+
+    if not keys:
+        return {"deleted": 0, "failed": {}}
+
+    cloud_storage = instantiate_custom_cloud_stroage(
+        bucket=bucket, clear_default_location=True
+    )
+    client = cloud_storage.client
+    batches = [
+        keys[index : index + batch_size] for index in range(0, len(keys), batch_size)
+    ]
+
+    def delete_batch(batch_keys):
+        try:
+            response = client.delete_objects(
+                Bucket=cloud_storage.bucket_name,
+                Delete={
+                    "Objects": [{"Key": obj_key} for obj_key in batch_keys],
+                    # Only errors are returned, the response stays small
+                    "Quiet": True,
+                },
+            )
+        except Exception as exception:
+            logger.error(exception)
+            return {obj_key: str(exception) for obj_key in batch_keys}
+
+        return {
+            error["Key"]: f"{error.get('Code')} - {error.get('Message')}"
+            for error in response.get("Errors", [])
+        }
+
+    start = time.perf_counter()
+    failed = {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+        for batch_failed in executor.map(delete_batch, batches):
+            failed.update(batch_failed)
+
+    deleted_count = len(keys) - len(failed)
+    logger.info(
+        f"Cloud Log: Deleted {deleted_count} of {len(keys)} s3 objects from bucket "
+        f"{cloud_storage.bucket_name} in {len(batches)} batches in "
+        f"{time.perf_counter() - start:.2f}s"
+    )
+    log_cloud_storage_stats()
+    for obj_key, error in failed.items():
+        logger.error(f"Deleting s3 object {obj_key} failed - {error}")
+
+    return {"deleted": deleted_count, "failed": failed}
+
+
+def delete_objects_from_cloud_storage(keys, bucket: str = None, bulk: bool = True):
     """
 
     :param obj: Object path
     :param bucket: Bucket Name
-    :param local_save_dir: Local directory to save file
+    :param bulk: Delete with batched DeleteObjects requests instead of one by one
 
-    :return: Local filepath of object
+    :return: Count of deleted objects
     """
     logger.info("Deleting objects from cloud storage")
     if not isinstance(keys, list):
         keys = [keys]
 
+    if bulk:
+        return bulk_delete_objects_from_cloud_storage(keys, bucket=bucket)["deleted"]
+
     cloud_storage = instantiate_custom_cloud_stroage(
         bucket=bucket, clear_default_location=True
     )
@@ -175,6 +640,46 @@ def delete_objects_from_cloud_storage(keys, bucket: str = None):
     return delete_count
 
 
+def expire_old_images_from_cloud_storage(
+    days: int = None, bucket: str = None, prefix: str = "media"
+):
+    """
+    Retention job deleting page images older than days from the bucket. Only keys laid
+    out by generate_save_image_kwargs, prefix/<datetime>/<input>/<image>, are expired
+    so input files are kept
+
+    :param days: Defaults to settings.DELETE_OLD_CLOUD_IMAGES_DAYS
+    :param bucket: Bucket Name
+    :param prefix: Prefix the page images were saved under
+    :return: Dictionary of deleted count and failed keys mapped to their error
+    """
+    if days is None:
+        days = settings.DELETE_OLD_CLOUD_IMAGES_DAYS
+
+    cloud_storage = instantiate_custom_cloud_stroage(
+        bucket=bucket, clear_default_location=True
+    )
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    image_key_pattern = re.compile(
+        rf"^{re.escape(prefix)}/\d{{4}}(-\d{{2}}){{5}}/[^/]+/[^/]+$"
+    )
+
+    expired_keys = []
+    paginator = cloud_storage.client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(
+        Bucket=cloud_storage.bucket_name, Prefix=f"{prefix}/"
+    ):
+        for obj in page.get("Contents", []):
+            if obj["LastModified"] < cutoff and image_key_pattern.match(obj["Key"]):
+                expired_keys.append(obj["Key"])
+
+    logger.info(
+        f"Expiring {len(expired_keys)} page images older than {days} days from bucket "
+        f"{cloud_storage.bucket_name}"
+    )
+    return bulk_delete_objects_from_cloud_storage(expired_keys, bucket=bucket)
+
+
 def is_cloud_storage(url: str, storage_name: str = "s3"):
     """
 
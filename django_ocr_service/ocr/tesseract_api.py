@@ -0,0 +1,150 @@
+"""
+In-process Tesseract engine that keeps one initialised tesserocr API per worker process
+so the traineddata model is loaded once instead of once per page
+"""
+import logging
+import re
+import threading
+
+from django.conf import settings
+from PIL import Image
+
+from .tesseract_tsv import (
+    TSV_COLUMNS,
+    generate_text_from_tesseract_words,
+    parse_tesseract_tsv,
+)
+
+try:
+    import tesserocr
+except ImportError:  # pragma: no cover
+    tesserocr = None
+
+logger = logging.getLogger(__name__)
+
+_api_cache = {}
+_api_lock = threading.Lock()
+
+
+def is_tesseract_api_available():
+    """
+    Check if tesserocr bindings could be imported
+    :return:
+    """
+    return tesserocr is not None
+
+
+def parse_tesseract_ocr_config(ocr_config: str):
+    """
+    Extracts oem, psm and tessdata dir from a tesseract command line config string
+
+    :param ocr_config: Config as generated by build_tesseract_ocr_config
+    :return: Dictionary with oem, psm and tessdata_dir keys
+    """
+    parsed_config = {"oem": None, "psm": None, "tessdata_dir": None}
+
+    if not ocr_config:
+        return parsed_config
+
+    oem = re.search(r"--oem\s+(\d+)", ocr_config)
+    psm = re.search(r"--psm\s+(\d+)", ocr_config)
+    tessdata_dir = re.search(r"--tessdata-dir\s+(\S+)", ocr_config)
+
+    if oem:
+        parsed_config["oem"] = int(oem.group(1))
+    if psm:
+        parsed_config["psm"] = int(psm.group(1))
+    if tessdata_dir:
+        parsed_config["tessdata_dir"] = tessdata_dir.group(1)
+
+    return parsed_config
+
+
+def get_tesseract_api(
+    lang: str = None, oem: int = None, psm: int = None, tessdata_dir: str = None
+):
+    """
+    Returns the process wide tesserocr API for the given configuration,
+    initialising it on first use
+
+    :param lang:
+    :param oem:
+    :param psm:
+    :param tessdata_dir:
+    :return:
+    """
+    if not is_tesseract_api_available():
+        raise ImportError("tesserocr is not installed")
+
+    if not lang:
+        lang = "eng"
+
+    # Only pass values the bindings understand, CLI only values fall back to defaults
+    if oem not in tuple(range(tesserocr.OEM.DEFAULT + 1)):
+        oem = tesserocr.OEM.DEFAULT
+    if psm is None or psm >= tesserocr.PSM.COUNT:
+        psm = tesserocr.PSM.AUTO
+
+    cache_key = (lang, oem, psm, tessdata_dir)
+    api = _api_cache.get(cache_key)
+
+    if api is None:
+        logger.info(f"Initialising tesserocr API for {cache_key}")
+        api_kwargs = {"lang": lang, "oem": oem, "psm": psm}
+        if tessdata_dir:
+            api_kwargs["path"] = tessdata_dir
+        api = tesserocr.PyTessBaseAPI(**api_kwargs)
+        _api_cache[cache_key] = api
+    else:
+        logger.info(f"Reusing tesserocr API for {cache_key}")
+
+    return api
+
+
+def end_tesseract_apis():
+    """
+    Releases all initialised APIs of this process
+    :return:
+    """
+    with _api_lock:
+        for api in _api_cache.values():
+            api.End()
+        _api_cache.clear()
+
+
+def ocr_using_tesseract_api(image, ocr_config: str = None):
+    """
+    OCRs an image path or grayscale array with the persistent tesserocr API
+
+    :param image:
+    :param ocr_config:
+    :return:
+    """
+    words = ocr_words_using_tesseract_api(image=image, ocr_config=ocr_config)
+    return generate_text_from_tesseract_words(words=words)
+
+
+def ocr_words_using_tesseract_api(image, ocr_config: str = None):
+    """
+    Words of an image path or grayscale array, OCRed with the persistent tesserocr API
+
+    :param image:
+    :param ocr_config:
+    :return: TesseractWords
+    """
+    parsed_config = parse_tesseract_ocr_config(ocr_config)
+    if not parsed_config["tessdata_dir"]:
+        parsed_config["tessdata_dir"] = settings.OCR_TESSDATA_DIR
+
+    if isinstance(image, str):
+        pil_image = Image.open(image)
+    else:
+        pil_image = Image.fromarray(image)
+
+    with _api_lock:
+        api = get_tesseract_api(lang=settings.OCR_LANGUAGE, **parsed_config)
+        api.SetImage(pil_image)
+        tsv_rows = api.GetTSVText(0)
+        api.Clear()
+
+    return parse_tesseract_tsv("\t".join(TSV_COLUMNS) + "\n" + tsv_rows)
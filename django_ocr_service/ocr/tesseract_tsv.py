@@ -0,0 +1,125 @@
+"""
+Parses Tesseract TSV output into compact column arrays without building a pandas DataFrame
+"""
+import logging
+
+import numpy as np
+
+from .line_grouping import generate_text_from_word_arrays
+
+logger = logging.getLogger(__name__)
+
+TSV_COLUMNS = (
+    "level",
+    "page_num",
+    "block_num",
+    "par_num",
+    "line_num",
+    "word_num",
+    "left",
+    "top",
+    "width",
+    "height",
+    "conf",
+    "text",
+)
+OUTPUT_PARSERS = ("tsv", "dataframe")
+
+
+class TesseractWords:
+    """
+    Column arrays of the geometry, confidence and text of Tesseract TSV rows
+    """
+
+    __slots__ = ("left", "top", "width", "height", "conf", "text")
+
+    def __init__(self, left, top, width, height, conf, text):
+        """
+
+        :param left:
+        :param top:
+        :param width:
+        :param height:
+        :param conf:
+        :param text:
+        """
+        self.left = left
+        self.top = top
+        self.width = width
+        self.height = height
+        self.conf = conf
+        self.text = text
+
+    def __len__(self):
+        """
+
+        :return:
+        """
+        return len(self.text)
+
+
+def parse_tesseract_tsv(tsv: str):
+    """
+    Parses the TSV string returned by pytesseract.image_to_data
+
+    :param tsv: TSV output including the header row
+    :return: TesseractWords
+    """
+    rows = tsv.splitlines()
+
+    if not rows:
+        return TesseractWords(
+            *[np.empty(0, dtype=np.int32) for _ in range(4)],
+            conf=np.empty(0, dtype=np.float32),
+            text=[],
+        )
+
+    header = rows[0].split("\t")
+    left_index = header.index("left")
+    top_index = header.index("top")
+    width_index = header.index("width")
+    height_index = header.index("height")
+    conf_index = header.index("conf")
+    text_index = header.index("text")
+
+    left, top, width, height, conf, text = [], [], [], [], [], []
+    for row in rows[1:]:
+        if not row:
+            continue
+        fields = row.split("\t")
+        left.append(int(fields[left_index]))
+        top.append(int(fields[top_index]))
+        width.append(int(fields[width_index]))
+        height.append(int(fields[height_index]))
+        conf.append(float(fields[conf_index]))
+        text.append(fields[text_index] if len(fields) > text_index else "")
+
+    return TesseractWords(
+        left=np.array(left, dtype=np.int32),
+        top=np.array(top, dtype=np.int32),
+        width=np.array(width, dtype=np.int32),
+        height=np.array(height, dtype=np.int32),
+        conf=np.array(conf, dtype=np.float32),
+        text=text,
+    )
+
+
+def generate_text_from_tesseract_words(
+    words: TesseractWords, text_join_delimiter="\n", overlap=0.3
+):
+    """
+    Generates OCR text from parsed TSV output using the sweep line grouping engine
+
+    :param words:
+    :param text_join_delimiter:
+    :param overlap:
+    :return:
+    """
+    return generate_text_from_word_arrays(
+        top=words.top,
+        height=words.height,
+        left=words.left,
+        texts=words.text,
+        text_join_delimiter=text_join_delimiter,
+        overlap=overlap,
+    )
@@ -3,7 +3,10 @@ Utils to enable testing without code duplication
 """
 import os
 
+import cv2
 from django.conf import settings
+import numpy as np
+from PIL import Image
 from django.contrib.auth.models import User
 from django.test import Client
 from rest_framework.test import APIClient
@@ -20,8 +23,64 @@ password = "12345"
 TEST_DIR = os.path.dirname(os.path.abspath(__file__))
 TESTDATA_DIR = os.path.join(TEST_DIR, "testdata")
 TESTFILE_PDF_PATH = os.path.join(TESTDATA_DIR, "sample-test-pdf.pdf")
+TESTFILE_TEXT_LAYER_PDF_PATH = os.path.join(TESTDATA_DIR, "sample-text-layer-pdf.pdf")
 TESTFILE_IMAGE_PATH = os.path.join(TESTDATA_DIR, "test-image.png")
 TEST_DATAFRAME = os.path.join(TESTDATA_DIR, "ocr_dataframe.pickle")
+TEST_TSV = os.path.join(TESTDATA_DIR, "ocr_output.tsv")
+
+
+def create_multi_page_tiff(filepath, frame_count=3):
+    """
+    Writes a multi-page tiff repeating the test image
+
+    :param filepath:
+    :param frame_count:
+    :return:
+    """
+    with Image.open(TESTFILE_IMAGE_PATH) as image:
+        frames = [image.convert("L") for _ in range(frame_count)]
+    frames[0].save(filepath, save_all=True, append_images=frames[1:])
+    return filepath
+
+
+def create_text_page(
+    height: int = 600,
+    width: int = 800,
+    text: str = "the quick brown fox jumps over the lazy dog",
+    left: int = 60,
+    font_scale: float = 0.8,
+    line_spacing: int = 40,
+    top_margin: int = 80,
+    bottom_margin: int = 80,
+    anti_aliased: bool = False,
+):
+    """
+    White grayscale page with lines of black text
+
+    :param height:
+    :param width:
+    :param text: Text of every line
+    :param left: Start of the lines
+    :param font_scale: OpenCV font scale
+    :param line_spacing: Distance between baselines
+    :param top_margin: Baseline of the first line
+    :param bottom_margin: Lines end above height minus this
+    :param anti_aliased: Draw text with grey edges like rendered pdf pages
+    :return: Grayscale image array
+    """
+    page = np.full((height, width), 255, dtype=np.uint8)
+    for top in range(top_margin, height - bottom_margin, line_spacing):
+        cv2.putText(
+            page,
+            text,
+            (left, top),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            font_scale,
+            0,
+            2,
+            cv2.LINE_AA if anti_aliased else cv2.LINE_8,
+        )
+    return page
 
 
 def create_user_login_generate_token():
@@ -82,4 +141,4 @@ class UploadDeleteTestFile:
             prefix="test_data",
             append_datetime=False,
         )
-        return self.cloud_upload_path
\ No newline at end of file
+        return self.cloud_upload_path
@@ -0,0 +1,202 @@
+"""
+Tests for adaptive render resolution
+"""
+import numpy as np
+from PIL import Image
+from PyPDF2 import PdfFileReader, PdfFileWriter
+import pytest
+
+from ocr.adaptive_resolution import (
+    MAX_RENDER_DPI,
+    MIN_RENDER_DPI,
+    estimate_x_height,
+    get_text_scale_factor,
+    select_page_dpis,
+    select_render_dpi,
+)
+from ocr.image_preprocessing import (
+    get_preprocessing_signature,
+    get_size_of_scaled_image,
+    scale_image,
+)
+from ocr.ocr_utils import build_ocr_config_key
+from ocr.preprocessing_profiles import pop_stage_timings, run_preprocessing_profile
+from .help_testutils import TESTFILE_PDF_PATH, create_text_page
+
+
+def make_text_image(font_scale: float):
+    """
+    Page of 1800x1400 filled with lines of text of the given OpenCV font scale
+
+    :param font_scale:
+    :return: Grayscale image array
+    """
+    line_height = int(60 * font_scale)
+    return create_text_page(
+        height=1400,
+        width=1800,
+        left=20,
+        font_scale=font_scale,
+        line_spacing=line_height,
+        top_margin=line_height,
+        bottom_margin=line_height,
+    )
+
+
+@pytest.mark.parametrize(
+    "page_size, dpi",
+    [
+        ((8.27, 11.69), 300),
+        ((8.5, 11), 300),
+        ((3.15, 8.0), 300),
+        ((11.69, 16.54), 218),
+        ((33.1, 46.8), MIN_RENDER_DPI),
+    ],
+)
+def test_select_render_dpi(page_size, dpi):
+    """
+    A4, letter and smaller pages render at 300 dpi, larger formats at a lower DPI
+
+    :return:
+    """
+    assert select_render_dpi(*page_size, target_x_height=20) == dpi
+
+
+def test_select_render_dpi_clamped():
+    """
+
+    :return:
+    """
+    assert select_render_dpi(8.27, 11.69, target_x_height=200) == MAX_RENDER_DPI
+
+
+def test_select_page_dpis(tmp_path):
+    """
+
+    :return:
+    """
+    pdf_path = str(tmp_path / "mixed-sizes.pdf")
+    with open(TESTFILE_PDF_PATH, "rb") as source_file:
+        reader = PdfFileReader(source_file)
+        writer = PdfFileWriter()
+        writer.addPage(reader.getPage(0))
+        large_page = reader.getPage(1)
+        large_page.scaleBy(4)
+        writer.addPage(large_page)
+        with open(pdf_path, "wb") as output_file:
+            writer.write(output_file)
+
+    with open(pdf_path, "rb") as pdf_file:
+        page_dpis = select_page_dpis(
+            PdfFileReader(pdf_file), [1, 2], target_x_height=20
+        )
+
+    assert page_dpis == {1: 300, 2: MIN_RENDER_DPI}
+
+
+def test_estimate_x_height_grows_with_text():
+    """
+
+    :return:
+    """
+    x_heights = [estimate_x_height(make_text_image(scale)) for scale in (0.5, 1, 2)]
+    assert x_heights[0] < x_heights[1] < x_heights[2]
+
+
+def test_estimate_x_height_blank_image():
+    """
+
+    :return:
+    """
+    blank = np.full((500, 500), 255, dtype=np.uint8)
+    assert estimate_x_height(blank) is None and get_text_scale_factor(blank) == 1.0
+
+
+def test_get_text_scale_factor():
+    """
+    Text close to the target is left alone, small text is scaled up
+
+    :return:
+    """
+    image = make_text_image(1)
+    x_height = estimate_x_height(image)
+
+    assert (
+        get_text_scale_factor(image, target_x_height=round(x_height)) == 1.0
+        and get_text_scale_factor(image, target_x_height=round(3 * x_height)) > 2
+    )
+
+
+def test_adaptive_dpi_settings(settings):
+    """
+
+    :return:
+    """
+    image = Image.fromarray(make_text_image(1))
+    settings.OCR_ADAPTIVE_DPI = False
+    fixed_signature = get_preprocessing_signature()
+
+    settings.OCR_ADAPTIVE_DPI = True
+    settings.OCR_TARGET_X_HEIGHT = round(estimate_x_height(np.asarray(image)))
+
+    assert (
+        get_size_of_scaled_image(image) == image.size
+        and get_preprocessing_signature() != fixed_signature
+        and get_preprocessing_signature(preprocess=False) == "none"
+    )
+
+
+def test_adaptive_dpi_document_key(settings):
+    """
+    Documents OCRed at a fixed DPI or another target x-height are not reused
+
+    :return:
+    """
+    settings.OCR_ADAPTIVE_DPI = False
+    fixed_key = build_ocr_config_key()
+
+    settings.OCR_ADAPTIVE_DPI = True
+    adaptive_key = build_ocr_config_key()
+    settings.OCR_TARGET_X_HEIGHT += 4
+
+    assert len({fixed_key, adaptive_key, build_ocr_config_key()}) == 3
+
+
+def test_adaptive_dpi_rendered_pages_not_rescaled(settings, monkeypatch, tmp_path):
+    """
+    Pages rendered at their adaptive DPI skip the x-height estimate and the resize
+
+    :return:
+    """
+    image = Image.fromarray(make_text_image(1))
+    path = str(tmp_path / "page.png")
+    image.save(path)
+    settings.OCR_ADAPTIVE_DPI = True
+    settings.OCR_IN_MEMORY_PIPELINE = True
+    settings.OCR_TARGET_X_HEIGHT = round(3 * estimate_x_height(np.asarray(image)))
+    assert get_size_of_scaled_image(image) != image.size
+
+    def fail(gray):
+        raise AssertionError("x-height estimated for a page rendered at its DPI")
+
+    monkeypatch.setattr("ocr.image_preprocessing.get_text_scale_factor", fail)
+    pop_stage_timings()
+    preprocessed = run_preprocessing_profile(path, profile="default", rescale=False)
+    assert (
+        get_size_of_scaled_image(image, rescale=False) == image.size
+        and scale_image(image, rescale=False) is image
+        and preprocessed.shape == np.asarray(image).shape
+        and [stage for stage, _ in pop_stage_timings()] == ["binarize"]
+    )
+
+
+def test_scale_image_keeps_pages_at_target(settings):
+    """
+    Pages whose text already has the target x-height are not copied
+
+    :return:
+    """
+    image = Image.fromarray(make_text_image(1))
+    settings.OCR_ADAPTIVE_DPI = True
+    settings.OCR_TARGET_X_HEIGHT = round(estimate_x_height(np.asarray(image)))
+    assert scale_image(image) is image
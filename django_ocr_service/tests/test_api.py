@@ -180,6 +180,58 @@ class TestPostOCR:
             and response.data["guid"] == ocrinput_objs.guid
         )
 
+    def test_post_ocr_async_intake(self, settings, monkeypatch):
+        """
+        Intake mode must return before any pre-work, whatever the size of the input
+
+        :return:
+        """
+        settings.ASYNC_OCR_INTAKE = True
+        settings.USE_ASYNC_FOR_SPEED = False
+        enqueued_tasks = []
+        monkeypatch.setattr(
+            "django_q.tasks.async_task",
+            lambda func, **kwargs: enqueued_tasks.append((func, kwargs)),
+        )
+
+        def fail_prepare(*args, **kwargs):
+            raise AssertionError("Pre-work ran inside the request")
+
+        monkeypatch.setattr(OCRInput, "_prepare_for_ocr", fail_prepare)
+
+        self.django_client.force_authenticate(user=self.user)
+        token_response = self.django_client.get(
+            "/api/get-token/", content_type="application/json"
+        )
+        token = token_response.data["token"]
+        self.django_client.credentials(HTTP_AUTHORIZATION="Token " + token)
+
+        response = self.django_client.post(
+            "/api/ocr/", data={"cloud_storage_uri": self.uploaded_filepath}
+        )
+        ocrinput_obj = OCRInput.objects.get(guid=response.data["guid"])
+        getocr_response = self.django_client.get(
+            "/api/get-ocr/",
+            {"guid": response.data["guid"]},
+        )
+
+        assert (
+            response.status_code == 202
+            and ocrinput_obj.page_count == 0
+            and enqueued_tasks
+            == [
+                (
+                    "ocr.models.prepare_ocr_input",
+                    {
+                        "group": "PrepareOCR",
+                        "guid": ocrinput_obj.guid,
+                        "local_filepath": None,
+                    },
+                )
+            ]
+            and getocr_response.status_code == 204
+        )
+
 
 class TestGetOCR:
     """ """
@@ -0,0 +1,110 @@
+"""
+Tests for archival encoding of page images
+"""
+import os
+import shutil
+
+from PIL import Image
+import pytest
+
+from ocr.archival import (
+    encode_archival_image,
+    get_archive_filename,
+    prepare_archival_upload,
+)
+from ocr.ocr_utils import generate_save_image_kwargs
+from .help_testutils import TESTFILE_IMAGE_PATH, TESTFILE_PDF_PATH
+
+
+@pytest.fixture
+def page_image(tmp_path):
+    """
+    Copy of the test image so encoded files are written to a temporary directory
+    :return:
+    """
+    image_path = str(tmp_path / "page-1.png")
+    shutil.copy(TESTFILE_IMAGE_PATH, image_path)
+    return image_path
+
+
+def test_encode_archival_image_tiff_g4(page_image):
+    """
+
+    :return:
+    """
+    archived_path = encode_archival_image(page_image, archive_format="tiff_g4")
+
+    with Image.open(archived_path) as archived_image, Image.open(page_image) as image:
+        assert (
+            archived_path.endswith("page-1.tiff")
+            and archived_image.mode == "1"
+            and archived_image.info["compression"] == "group4"
+            and archived_image.size == image.size
+            and os.path.getsize(archived_path) < os.path.getsize(page_image)
+        )
+
+
+@pytest.mark.parametrize(
+    "archive_format, image_format", [("webp", "WEBP"), ("jpeg", "JPEG")]
+)
+def test_encode_archival_image_lossy(page_image, archive_format, image_format):
+    """
+
+    :return:
+    """
+    low_quality_path = encode_archival_image(
+        page_image,
+        archive_format=archive_format,
+        quality=20,
+        output_path=page_image.replace(".png", f"-low.{archive_format}"),
+    )
+    archived_path = encode_archival_image(
+        page_image, archive_format=archive_format, quality=90
+    )
+
+    with Image.open(archived_path) as archived_image:
+        assert archived_image.format == image_format and os.path.getsize(
+            low_quality_path
+        ) < os.path.getsize(archived_path)
+
+
+def test_encode_archival_image_unknown_format(page_image):
+    """
+
+    :return:
+    """
+    with pytest.raises(NotImplementedError):
+        encode_archival_image(page_image, archive_format="jbig2")
+
+
+def test_archive_format_setting(settings, page_image):
+    """
+
+    :return:
+    """
+    settings.OCR_ARCHIVE_FORMAT = "webp"
+    kw_args = generate_save_image_kwargs(
+        images=[page_image], pdf_path=TESTFILE_PDF_PATH, append_datetime=False
+    )
+    archived_kw_args = prepare_archival_upload(kw_args[0])
+
+    assert (
+        kw_args[0]["key"] == "sample-test-pdf.pdf/page-1.webp"
+        and kw_args[0]["path"] == page_image
+        and archived_kw_args["path"] == page_image.replace(".png", ".webp")
+        and os.path.isfile(archived_kw_args["path"])
+    )
+
+
+def test_archive_format_png_keeps_page(settings, page_image):
+    """
+
+    :return:
+    """
+    settings.OCR_ARCHIVE_FORMAT = "png"
+    kw_args = {"path": page_image, "key": "input.pdf/page-1.png"}
+
+    assert (
+        get_archive_filename(TESTFILE_PDF_PATH) == TESTFILE_PDF_PATH
+        and prepare_archival_upload(kw_args) is kw_args
+    )
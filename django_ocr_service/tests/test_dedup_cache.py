@@ -0,0 +1,142 @@
+"""
+Tests for the checksum dedup cache
+"""
+import time
+
+from django.core.cache import caches
+import pytest
+
+from ocr.dedup_cache import (
+    ChecksumCache,
+    DjangoResultCache,
+    build_result_cache_key,
+    get_dedup_cache,
+)
+
+
+def test_checksum_cache_hits_and_misses():
+    """
+
+    :return:
+    """
+    cache = ChecksumCache(max_size=2)
+    cache.set("a", "output a")
+    assert (
+        cache.get("a") == "output a"
+        and cache.get("b") is None
+        and cache.stats()["hits"] == 1
+        and cache.stats()["misses"] == 1
+        and cache.stats()["hit_rate"] == 0.5
+    )
+
+
+def test_checksum_cache_evicts_least_recently_used():
+    """
+
+    :return:
+    """
+    cache = ChecksumCache(max_size=2)
+    cache.set("a", "output a")
+    cache.set("b", "output b")
+    cache.get("a")
+    cache.set("c", "output c")
+    assert (
+        len(cache) == 2
+        and cache.get("b") is None
+        and cache.get("a") == "output a"
+        and cache.get("c") == "output c"
+        and cache.stats()["evictions"] == 1
+    )
+
+
+def test_checksum_cache_evict_and_clear():
+    """
+
+    :return:
+    """
+    cache = ChecksumCache(max_size=2)
+    cache.set("a", "output a")
+    cache.evict("a")
+    cache.evict("missing")
+    assert cache.get("a") is None
+    cache.clear()
+    assert cache.stats()["misses"] == 0 and not len(cache)
+
+
+def test_checksum_cache_disabled():
+    """
+
+    :return:
+    """
+    cache = ChecksumCache(max_size=0)
+    cache.set("a", "output a")
+    assert cache.get("a") is None and not len(cache)
+
+
+def test_checksum_cache_ttl(monkeypatch):
+    """
+
+    :return:
+    """
+    cache = ChecksumCache(max_size=2, ttl=10)
+    cache.set("a", "output a")
+    assert cache.get("a") == "output a"
+
+    now = time.monotonic()
+    monkeypatch.setattr("ocr.dedup_cache.time.monotonic", lambda: now + 11)
+    assert cache.get("a") is None and cache.stats()["evictions"] == 1
+
+
+def test_django_result_cache():
+    """
+
+    :return:
+    """
+    cache = DjangoResultCache(alias="default", ttl=60)
+    cache.set("a", "output a")
+    assert (
+        cache.get("a") == "output a"
+        and caches["default"].get("ocr_result:a") == "output a"
+    )
+    cache.evict("a")
+    assert (
+        cache.get("a") is None
+        and cache.stats()["hits"] == 1
+        and cache.stats()["misses"] == 1
+    )
+
+
+def test_build_result_cache_key():
+    """
+
+    :return:
+    """
+    key = build_result_cache_key("checksum", "tsv --oem 11", "eng", "v1-1800-180")
+    assert (
+        key
+        == build_result_cache_key("checksum", " tsv  --oem 11 ", "eng", "v1-1800-180")
+        and key
+        != build_result_cache_key("checksum", "tsv --oem 11", "deu", "v1-1800-180")
+        and key
+        != build_result_cache_key("checksum", "tsv --oem 1", "eng", "v1-1800-180")
+        and key != build_result_cache_key("checksum", "tsv --oem 11", "eng", "none")
+        and key != build_result_cache_key("other", "tsv --oem 11", "eng", "v1-1800-180")
+    )
+
+
+def test_get_dedup_cache_follows_settings(settings):
+    """
+
+    :return:
+    """
+    settings.OCR_RESULT_CACHE_BACKEND = "memory"
+    settings.OCR_DEDUP_CACHE_SIZE = 5
+    cache = get_dedup_cache()
+    assert cache.max_size == 5 and get_dedup_cache() is cache
+
+    settings.OCR_RESULT_CACHE_BACKEND = "django"
+    assert isinstance(get_dedup_cache(), DjangoResultCache)
+
+    settings.OCR_RESULT_CACHE_BACKEND = "redis"
+    with pytest.raises(NotImplementedError):
+        get_dedup_cache()
@@ -0,0 +1,111 @@
+"""
+Tests for magic byte sniffing of input files
+"""
+import os
+import tempfile
+
+from PIL import Image
+
+from ocr.file_sniffing import (
+    sniff_file,
+    sniff_file_type,
+)
+from .help_testutils import (
+    TESTFILE_IMAGE_PATH,
+    TESTFILE_PDF_PATH,
+    TESTFILE_TEXT_LAYER_PDF_PATH,
+)
+
+
+def test_sniff_file_type_signatures():
+    """
+
+    :return:
+    """
+    assert (
+        sniff_file_type(b"%PDF-1.4\n") == "pdf"
+        and sniff_file_type(b"\x89PNG\r\n\x1a\n0000") == "png"
+        and sniff_file_type(b"\xff\xd8\xff\xe0") == "jpeg"
+        and sniff_file_type(b"II*\x00") == "tiff"
+        and sniff_file_type(b"MM\x00*") == "tiff"
+        and sniff_file_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "webp"
+        and sniff_file_type(b"hello world") is None
+    )
+
+
+def test_sniff_file_pdf():
+    """
+
+    :return:
+    """
+    with sniff_file(TESTFILE_PDF_PATH) as sniffed_file:
+        assert (
+            sniffed_file.is_pdf
+            and not sniffed_file.is_image
+            and sniffed_file.page_count == 2
+            and sniffed_file.pdf_reader is not None
+        )
+
+
+def test_sniff_file_text_layer_pdf():
+    """
+
+    :return:
+    """
+    with sniff_file(TESTFILE_TEXT_LAYER_PDF_PATH) as sniffed_file:
+        assert sniffed_file.is_pdf and sniffed_file.page_count == 1
+
+
+def test_sniff_file_image():
+    """
+
+    :return:
+    """
+    with sniff_file(TESTFILE_IMAGE_PATH) as sniffed_file:
+        assert (
+            sniffed_file.is_image
+            and not sniffed_file.is_pdf
+            and sniffed_file.file_type == "png"
+            and sniffed_file.page_count == 1
+        )
+
+
+def test_sniff_file_multi_frame_tiff():
+    """
+
+    :return:
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tiff_path = os.path.join(tmp_dir, "frames.tiff")
+        frames = [Image.new("L", (32, 32), color) for color in (0, 128, 255)]
+        frames[0].save(tiff_path, save_all=True, append_images=frames[1:])
+
+        with sniff_file(tiff_path) as sniffed_file:
+            assert sniffed_file.is_image and sniffed_file.page_count == 3
+
+
+def test_sniff_file_invalid():
+    """
+
+    :return:
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        broken_pdf_path = os.path.join(tmp_dir, "broken.pdf")
+        with open(broken_pdf_path, "wb") as broken_pdf:
+            broken_pdf.write(b"%PDF-1.4\nnot really a pdf")
+
+        with sniff_file(broken_pdf_path) as sniffed_file:
+            assert not sniffed_file.is_pdf and not sniffed_file.is_image
+
+        with sniff_file(os.path.join(tmp_dir, "missing.pdf")) as sniffed_file:
+            assert sniffed_file.file_type is None and not sniffed_file.is_pdf
+
+
+def test_sniff_file_closes_handle():
+    """
+
+    :return:
+    """
+    with sniff_file(TESTFILE_PDF_PATH) as sniffed_file:
+        assert not sniffed_file._file.closed
+    assert sniffed_file._file is None
@@ -0,0 +1,163 @@
+"""
+Tests for content hashing
+"""
+import hashlib
+import io
+import os
+
+import pytest
+
+from ocr.hashing import (
+    HashingWriter,
+    OrderedPartHasher,
+    get_file_checksum,
+    hash_file,
+    lookup_file_hash,
+    new_hasher,
+    read_and_hash_file,
+    remember_file_hash,
+    write_and_hash_file,
+)
+from ocr.ocr_utils import iter_image_frames
+from ocr.storage_utils import load_from_cloud_storage_and_save
+from .help_testutils import (
+    TESTFILE_PDF_PATH,
+    UploadDeleteTestFile,
+    create_multi_page_tiff,
+)
+
+
+def test_hash_file_matches_hashlib():
+    """
+
+    :return:
+    """
+    with open(TESTFILE_PDF_PATH, "rb") as pdf_file:
+        content = pdf_file.read()
+
+    assert (
+        hash_file(TESTFILE_PDF_PATH, chunk_size=1000)
+        == hashlib.blake2b(content, digest_size=32).hexdigest()
+        and hash_file(TESTFILE_PDF_PATH, algorithm="md5")
+        == hashlib.md5(content).hexdigest()
+    )
+
+
+def test_read_and_hash_file():
+    """
+
+    :return:
+    """
+    data, digest = read_and_hash_file(TESTFILE_PDF_PATH)
+    with open(TESTFILE_PDF_PATH, "rb") as pdf_file:
+        assert data == pdf_file.read() and digest == hash_file(TESTFILE_PDF_PATH)
+
+
+def test_new_hasher_unknown_algorithm():
+    """
+
+    :return:
+    """
+    with pytest.raises(NotImplementedError):
+        new_hasher("crc32")
+
+
+def test_remembered_hash_invalidated_on_change(tmp_path):
+    """
+
+    :return:
+    """
+    filepath = str(tmp_path / "page.png")
+    digest = write_and_hash_file(filepath, b"page bytes")
+    assert lookup_file_hash(filepath) == digest
+    assert lookup_file_hash(filepath, algorithm="md5") is None
+
+    with open(filepath, "ab") as page_file:
+        page_file.write(b" changed")
+    assert lookup_file_hash(filepath) is None
+    assert get_file_checksum(filepath) == hash_file(filepath)
+
+
+def test_get_file_checksum_uses_remembered_hash(tmp_path):
+    """
+
+    :return:
+    """
+    filepath = str(tmp_path / "input.pdf")
+    with open(filepath, "wb") as input_file:
+        input_file.write(b"input bytes")
+    remember_file_hash(filepath, "remembered")
+
+    assert get_file_checksum(filepath) == "remembered"
+
+
+def test_hashing_writer():
+    """
+
+    :return:
+    """
+    buffer = io.BytesIO()
+    writer = HashingWriter(buffer)
+    writer.write(b"first ")
+    writer.write(b"second")
+
+    assert (
+        buffer.getvalue() == b"first second"
+        and writer.nbytes == 12
+        and writer.hexdigest()
+        == hashlib.blake2b(b"first second", digest_size=32).hexdigest()
+    )
+
+
+def test_image_frames_hashed_while_written(tmp_path):
+    """
+
+    :return:
+    """
+    tiff_path = create_multi_page_tiff(str(tmp_path / "pages.tiff"), frame_count=2)
+    frames = list(iter_image_frames(tiff_path, output_folder=str(tmp_path)))
+
+    assert len(frames) == 2 and all(
+        os.path.exists(frame) and lookup_file_hash(frame) == hash_file(frame)
+        for frame in frames
+    )
+
+
+def test_ordered_part_hasher(tmp_path):
+    """
+    Parts completing out of order hash to the digest of the whole file
+
+    :return:
+    """
+    content = os.urandom(10 * 1000)
+    byte_ranges = [(first, first + 999) for first in range(0, len(content), 1000)]
+    filepath = str(tmp_path / "parts.bin")
+
+    with open(filepath, "w+b") as part_file:
+        part_file.write(content)
+        part_file.flush()
+        part_hasher = OrderedPartHasher(part_file.fileno(), byte_ranges)
+        for part_index in [3, 1, 0, 2, 9, 5, 4, 8, 6, 7]:
+            part_hasher.part_done(part_index)
+
+    assert part_hasher.hexdigest() == hash_file(filepath)
+
+
+def test_download_hashed_while_streaming(tmp_path):
+    """
+
+    :return:
+    """
+    upload_delete = UploadDeleteTestFile()
+    upload_delete.upload_test_file_to_cloud_storage()
+    save_path = load_from_cloud_storage_and_save(
+        key="test_data/sample-test-pdf.pdf",
+        bucket=upload_delete.bucket,
+        local_save_dir=str(tmp_path),
+    )
+
+    assert (
+        save_path
+        and lookup_file_hash(save_path) == hash_file(TESTFILE_PDF_PATH)
+        and get_file_checksum(save_path) == hash_file(save_path)
+    )
@@ -4,15 +4,21 @@ Tests for image preprocessing
 import cv2
 from django.conf import settings
 import math
+import os
 import numpy as np
 from PIL import Image
 import pytest
 
 from ocr.image_preprocessing import (
     get_size_of_scaled_image,
+    load_scaled_gray_image,
+    pop_disk_writes,
     set_image_dpi,
     image_smoothening,
     remove_noise_and_smooth,
+    remove_noise_and_smooth_array,
+    remove_noise_and_smooth_fused,
+    remove_noise_and_smooth_legacy,
     preprocess_image_for_ocr,
 )
 
@@ -89,3 +95,117 @@ class TestImagePreprocessing:
             return_image.shape == (600, 1800)
             and return_image.mean() == 217.01633333333334
         )
+
+    def test_load_scaled_gray_image(self):
+        """
+
+        :return:
+        """
+        filepath = set_image_dpi(TESTFILE_IMAGE_PATH)
+        disk_image = cv2.imread(filepath, 0)
+        os.remove(filepath)
+        assert np.array_equal(load_scaled_gray_image(TESTFILE_IMAGE_PATH), disk_image)
+
+    def test_remove_noise_and_smooth_array(self):
+        """
+
+        :return:
+        """
+        img = cv2.imread(TESTFILE_IMAGE_PATH, 0)
+        assert np.array_equal(
+            remove_noise_and_smooth_array(img),
+            remove_noise_and_smooth(TESTFILE_IMAGE_PATH),
+        )
+
+    def test_preprocess_image_for_ocr_in_memory_writes_nothing(self):
+        """
+
+        :return:
+        """
+        pop_disk_writes()
+        files_before = set(os.listdir(settings.LOCAL_FILES_SAVE_DIR))
+        in_memory_image = preprocess_image_for_ocr(TESTFILE_IMAGE_PATH, in_memory=True)
+        bytes_written = pop_disk_writes()
+        files_after = set(os.listdir(settings.LOCAL_FILES_SAVE_DIR))
+        disk_image = preprocess_image_for_ocr(TESTFILE_IMAGE_PATH, in_memory=False)
+        assert (
+            bytes_written == 0
+            and files_before == files_after
+            and np.array_equal(in_memory_image, disk_image)
+        )
+
+    def test_preprocess_image_for_ocr_on_disk_removes_temp_file(self):
+        """
+
+        :return:
+        """
+        pop_disk_writes()
+        files_before = set(os.listdir(settings.LOCAL_FILES_SAVE_DIR))
+        _ = preprocess_image_for_ocr(TESTFILE_IMAGE_PATH, in_memory=False)
+        files_after = set(os.listdir(settings.LOCAL_FILES_SAVE_DIR))
+        assert pop_disk_writes() > 0 and files_before == files_after
+
+
+def make_test_images():
+    """
+    Test image, its scaled page and images with edge case histograms
+
+    :return:
+    """
+    rng = np.random.default_rng(0)
+    return {
+        "test_image": cv2.imread(TESTFILE_IMAGE_PATH, 0),
+        "scaled_page": load_scaled_gray_image(TESTFILE_IMAGE_PATH),
+        "noise": rng.integers(0, 256, size=(301, 257), dtype=np.uint8),
+        "white": np.full((64, 64), 255, dtype=np.uint8),
+        "black": np.zeros((64, 64), dtype=np.uint8),
+    }
+
+
+@pytest.mark.parametrize("binary_threshold", [0, 180, 255])
+@pytest.mark.parametrize("image_name", list(make_test_images()))
+def test_remove_noise_and_smooth_fused_matches_legacy(
+    settings, image_name, binary_threshold
+):
+    """
+
+    :return:
+    """
+    settings.BINARY_THRESHOLD = binary_threshold
+    img = make_test_images()[image_name]
+    legacy_image = remove_noise_and_smooth_legacy(img)
+
+    in_place_image = img.copy()
+    fused_in_place = remove_noise_and_smooth_fused(in_place_image, out=in_place_image)
+    assert (
+        np.array_equal(remove_noise_and_smooth_fused(img), legacy_image)
+        and fused_in_place is in_place_image
+        and np.array_equal(fused_in_place, legacy_image)
+    )
+
+
+def test_remove_noise_and_smooth_fused_leaves_input():
+    """
+    Output is a new array unless asked to overwrite the input, the scratch buffer is
+    reused across pages of the same size
+
+    :return:
+    """
+    img = cv2.imread(TESTFILE_IMAGE_PATH, 0)
+    img_before = img.copy()
+    first_page = remove_noise_and_smooth_fused(img)
+    second_page = remove_noise_and_smooth_fused(img)
+    assert (
+        np.array_equal(img, img_before)
+        and first_page is not second_page
+        and np.array_equal(first_page, second_page)
+    )
+
+
+def test_remove_noise_and_smooth_array_unknown_kernel():
+    """
+
+    :return:
+    """
+    with pytest.raises(NotImplementedError):
+        remove_noise_and_smooth_array(cv2.imread(TESTFILE_IMAGE_PATH, 0), kernel="gpu")
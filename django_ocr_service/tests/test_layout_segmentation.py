@@ -0,0 +1,196 @@
+"""
+Tests for the text region segmentation of pages
+"""
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from ocr.layout_segmentation import (
+    find_text_regions,
+    merge_overlapping_regions,
+    ocr_text_regions,
+)
+from ocr import ocr_utils
+from ocr.ocr_utils import build_ocr_config_key, ocr_using_layout_regions
+from ocr.tesseract_tsv import TSV_COLUMNS, TesseractWords, parse_tesseract_tsv
+
+from .help_testutils import create_text_page
+
+
+def make_sparse_page():
+    """
+    Letter with a heading, a photo and a paragraph at the bottom
+
+    :return:
+    """
+    page = create_text_page(
+        height=1100,
+        width=850,
+        text="the quick brown fox jumps",
+        top_margin=850,
+        bottom_margin=100,
+    )
+    cv2.putText(page, "Invoice 42", (60, 100), cv2.FONT_HERSHEY_SIMPLEX, 1.2, 0, 2)
+    page[200:450, 450:750] = 40
+    return page
+
+
+def test_find_text_regions():
+    """
+    The heading and the paragraph are found in reading order, the photo is dropped
+
+    :return:
+    """
+    regions = find_text_regions(make_sparse_page())
+
+    assert len(regions) == 2
+    (heading_left, heading_top, _, heading_height), paragraph = regions
+    assert heading_top < 100 < heading_top + heading_height and heading_left < 60
+    assert paragraph[1] < 830 and paragraph[1] + paragraph[3] > 970
+    assert sum(width * height for _, _, width, height in regions) < 0.25 * 1100 * 850
+    for left, top, width, height in regions:
+        assert not (
+            left < 750 and 450 < left + width and top < 450 and 200 < top + height
+        )
+
+
+@pytest.mark.parametrize(
+    "page",
+    [
+        np.full((600, 800), 255, dtype=np.uint8),
+        create_text_page(width=620, top_margin=40, bottom_margin=0),
+    ],
+)
+def test_find_text_regions_falls_back_to_whole_page(page):
+    """
+    Blank pages and pages filled with text are OCRed whole
+
+    :return:
+    """
+    assert find_text_regions(page) is None
+
+
+@pytest.mark.parametrize("conversion", [cv2.COLOR_GRAY2BGR, cv2.COLOR_GRAY2BGRA])
+def test_find_text_regions_colour_page(conversion):
+    """
+    Pages read in colour when preprocessing is off are segmented like grayscale ones
+
+    :return:
+    """
+    page = make_sparse_page()
+    assert find_text_regions(cv2.cvtColor(page, conversion)) == find_text_regions(page)
+
+
+def test_find_text_regions_scales_with_text_size():
+    """
+    Words of large text are still joined into one block
+
+    :return:
+    """
+    page = np.full((1200, 1600), 255, dtype=np.uint8)
+    page[300:900, 400:1200] = cv2.resize(
+        make_sparse_page()[820:1010, 40:500], (800, 600)
+    )
+    assert len(find_text_regions(page)) == 1
+
+
+def test_merge_overlapping_regions():
+    """
+
+    :return:
+    """
+    assert sorted(
+        merge_overlapping_regions([(0, 0, 10, 10), (100, 100, 5, 5), (5, 5, 10, 10)])
+    ) == [(0, 0, 15, 15), (100, 100, 5, 5)]
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_ocr_text_regions(max_workers):
+    """
+    Words of each crop are moved to page coordinates
+
+    :return:
+    """
+    image = np.zeros((100, 200), dtype=np.uint8)
+    regions = [(10, 5, 50, 20), (120, 60, 40, 30)]
+
+    def ocr_words(crop):
+        return TesseractWords(
+            left=np.array([0, 20], dtype=np.int32),
+            top=np.array([2, 2], dtype=np.int32),
+            width=np.array([15, 15], dtype=np.int32),
+            height=np.array([10, 10], dtype=np.int32),
+            conf=np.array([90, 90], dtype=np.float32),
+            text=[f"{crop.shape[1]}a", f"{crop.shape[1]}b"],
+        )
+
+    words = ocr_text_regions(image, regions, ocr_words, max_workers=max_workers)
+    assert (
+        words.left.tolist() == [10, 30, 120, 140]
+        and words.top.tolist() == [7, 7, 62, 62]
+        and words.text == ["50a", "50b", "40a", "40b"]
+    )
+
+
+def test_ocr_using_layout_regions_unknown_engine():
+    """
+
+    :return:
+    """
+    with pytest.raises(NotImplementedError):
+        ocr_using_layout_regions(make_sparse_page(), ocr_engine="unknown")
+
+
+@pytest.mark.parametrize("output_parser", ["tsv", "dataframe"])
+def test_ocr_using_layout_regions_output_parser(monkeypatch, output_parser):
+    """
+    Region words give the same text whichever output parser groups them into lines
+
+    :return:
+    """
+    header = "\t".join(TSV_COLUMNS)
+
+    def image_to_tsv(image, ocr_config, in_memory=None):
+        return f"{header}\n5\t1\t1\t1\t1\t1\t4\t4\t30\t12\t95\t{image.shape[0]}\n"
+
+    monkeypatch.setattr(ocr_utils, "image_to_tsv", image_to_tsv)
+    text = ocr_using_layout_regions(
+        cv2.cvtColor(make_sparse_page(), cv2.COLOR_GRAY2BGR),
+        ocr_config="--psm 6",
+        output_parser=output_parser,
+    )
+    assert text.split() == [
+        str(height) for _, _, _, height in find_text_regions(make_sparse_page())
+    ]
+
+
+def test_ocr_using_layout_regions_tesseract_api_serial(monkeypatch):
+    """
+    Crops OCRed by the process wide tesserocr API are not sent to a thread pool
+
+    :return:
+    """
+    threads = set()
+
+    def ocr_words_using_tesseract_api(image, ocr_config=None):
+        threads.add(threading.get_ident())
+        return parse_tesseract_tsv("")
+
+    monkeypatch.setattr(
+        ocr_utils, "ocr_words_using_tesseract_api", ocr_words_using_tesseract_api
+    )
+    ocr_using_layout_regions(make_sparse_page(), ocr_engine="tesseract_api")
+    assert threads == {threading.get_ident()}
+
+
+def test_layout_segmentation_config_key(settings):
+    """
+
+    :return:
+    """
+    settings.OCR_LAYOUT_SEGMENTATION = False
+    config_key = build_ocr_config_key()
+    settings.OCR_LAYOUT_SEGMENTATION = True
+    assert build_ocr_config_key() != config_key
@@ -0,0 +1,98 @@
+"""
+Tests for the sweep line grouping engine
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from ocr.line_grouping import (
+    generate_text_from_word_arrays,
+    group_words_into_lines,
+)
+from ocr.ocr_utils import (
+    generate_text_from_ocr_output,
+    generate_text_from_ocr_output_legacy,
+)
+from .help_testutils import TEST_DATAFRAME
+
+
+def make_word_table(word_count, seed):
+    """
+    Random word table shaped like pytesseract data.frame output
+
+    :param word_count:
+    :param seed:
+    :return:
+    """
+    rng = np.random.default_rng(seed)
+    line_number = rng.integers(0, max(1, word_count // 10), word_count)
+    words = np.array(["lorem", "ipsum", "", " ", "dolor", np.nan], dtype=object)
+    return pd.DataFrame(
+        {
+            "top": line_number * 40 + rng.integers(-8, 9, word_count) + 50,
+            "height": rng.integers(15, 35, word_count),
+            "left": rng.integers(0, 2000, word_count),
+            "text": words[rng.integers(0, len(words), word_count)],
+        }
+    )
+
+
+def test_group_words_into_lines():
+    """
+
+    :return:
+    """
+    lines = group_words_into_lines(
+        top=[10, 12, 60, 11],
+        height=[20, 20, 20, 20],
+        left=[50, 10, 0, 100],
+        texts=["b", "a", "c", "d"],
+    )
+    assert [list(line) for line in lines] == [[1, 0, 3], [2]]
+
+
+def test_group_words_into_lines_empty():
+    """
+
+    :return:
+    """
+    assert group_words_into_lines(top=[], height=[], left=[], texts=[]) == []
+
+
+def test_generate_text_from_word_arrays_matches_legacy_on_testdata():
+    """
+
+    :return:
+    """
+    dataframe = pd.read_pickle(TEST_DATAFRAME)
+    assert generate_text_from_ocr_output(
+        dataframe, line_grouping="sweep"
+    ) == generate_text_from_ocr_output_legacy(dataframe)
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("overlap", [0.0, 0.3, 0.7])
+def test_generate_text_from_word_arrays_matches_legacy(seed, overlap):
+    """
+
+    :return:
+    """
+    dataframe = make_word_table(word_count=300, seed=seed)
+    text = generate_text_from_word_arrays(
+        top=dataframe["top"],
+        height=dataframe["height"],
+        left=dataframe["left"],
+        texts=dataframe["text"],
+        overlap=overlap,
+    )
+    assert text == generate_text_from_ocr_output_legacy(dataframe, overlap=overlap)
+
+
+def test_generate_text_from_ocr_output_unknown_engine():
+    """
+
+    :return:
+    """
+    dataframe = pd.read_pickle(TEST_DATAFRAME)
+    with pytest.raises(NotImplementedError):
+        generate_text_from_ocr_output(dataframe, line_grouping="unknown")
@@ -4,16 +4,19 @@ Test OCR model
 import os.path
 import uuid
 
-import checksum
 from django.core.exceptions import ValidationError
 from django.core.files import File
 from django.core.files.uploadedfile import InMemoryUploadedFile
 import pytest
 
-from ocr.models import OCRInput, OCROutput
+from ocr import build_ocr_config_key
+from ocr.hashing import get_file_checksum
+from ocr.models import OCRInput, OCROutput, prepare_ocr_input
 from .help_testutils import (
+    create_multi_page_tiff,
     TESTFILE_PDF_PATH,
     TESTFILE_IMAGE_PATH,
+    TESTFILE_TEXT_LAYER_PDF_PATH,
 )
 
 pytestmark = pytest.mark.django_db(transaction=True)
@@ -52,9 +55,8 @@ class TestOCRInputOutputModel:
         )
         ocr_input_object.save()
         input_obj = OCRInput.objects.get(guid=self.guid)
-        assert (
-            input_obj.guid == self.guid
-            and input_obj.checksum == checksum.get_for_file(TESTFILE_PDF_PATH)
+        assert input_obj.guid == self.guid and input_obj.checksum == get_file_checksum(
+            TESTFILE_PDF_PATH
         )
 
     def test_create_model_object_upload_image(self):
@@ -81,9 +83,193 @@ class TestOCRInputOutputModel:
         ocr_input_object.save()
         input_obj = OCRInput.objects.get(guid=self.guid)
 
+        assert input_obj.guid == self.guid and input_obj.checksum == get_file_checksum(
+            TESTFILE_IMAGE_PATH
+        )
+
+    @pytest.mark.parametrize("chunk_size", [0, 1])
+    def test_create_model_object_streaming_pdf(self, settings, chunk_size):
+        """
+
+        :return:
+        """
+        settings.USE_ASYNC_FOR_SPEED = False
+        settings.PDF_STREAM_CHUNK_SIZE = chunk_size
+        ocr_input_object = OCRInput(
+            file=self.upload_file,
+            guid=self.guid,
+        )
+        ocr_input_object.save()
+        input_obj = OCRInput.objects.get(guid=self.guid)
+        assert (
+            input_obj.page_count == 2
+            and OCROutput.objects.filter(guid=input_obj).count() == 2
+        )
+
+    def test_create_model_object_text_layer_pdf(self, settings):
+        """
+
+        :return:
+        """
+        settings.USE_ASYNC_FOR_SPEED = False
+        data = File(open(TESTFILE_TEXT_LAYER_PDF_PATH, "rb"))
+        upload_file = InMemoryUploadedFile(
+            name=os.path.split(TESTFILE_TEXT_LAYER_PDF_PATH)[-1],
+            file=data,
+            content_type="multipart/form-data",
+            size=500,
+            field_name=None,
+            charset=None,
+        )
+        ocr_input_object = OCRInput(file=upload_file, guid=self.guid)
+        ocr_input_object.save()
+        input_obj = OCRInput.objects.get(guid=self.guid)
+        output_objs = OCROutput.objects.filter(guid=input_obj)
+        assert (
+            input_obj.page_count == 1
+            and len(output_objs) == 1
+            and output_objs[0].source == OCROutput.SOURCE_TEXT_LAYER
+            and "Invoice number" in output_objs[0].text
+        )
+
+    def test_create_model_object_multi_page_tiff(self, settings, tmp_path):
+        """
+
+        :return:
+        """
+        settings.USE_ASYNC_FOR_SPEED = False
+        tiff_path = create_multi_page_tiff(str(tmp_path / "multi-page.tiff"))
+        upload_file = InMemoryUploadedFile(
+            name="multi-page.tiff",
+            file=File(open(tiff_path, "rb")),
+            content_type="image/tiff",
+            size=500,
+            field_name=None,
+            charset=None,
+        )
+        ocr_input_object = OCRInput(file=upload_file, guid=self.guid)
+        ocr_input_object.save()
+        input_obj = OCRInput.objects.get(guid=self.guid)
+        assert (
+            input_obj.page_count == 3
+            and OCROutput.objects.filter(guid=input_obj).count() == 3
+        )
+
+    def test_create_model_object_async_intake(self, settings, monkeypatch):
+        """
+
+        :return:
+        """
+        settings.ASYNC_OCR_INTAKE = True
+        settings.USE_ASYNC_FOR_SPEED = False
+        enqueued_tasks = []
+        monkeypatch.setattr(
+            "django_q.tasks.async_task",
+            lambda func, group, **kwargs: enqueued_tasks.append(kwargs),
+        )
+        ocr_input_object = OCRInput(file=self.upload_file, guid=self.guid)
+        ocr_input_object.save()
+        input_obj = OCRInput.objects.get(guid=self.guid)
+        assert (
+            ocr_input_object.prepare_enqueued
+            and input_obj.page_count == 0
+            and not OCROutput.objects.filter(guid=input_obj).exists()
+        )
+
+        prepare_ocr_input(**enqueued_tasks[0])
+        input_obj = OCRInput.objects.get(guid=self.guid)
+        assert (
+            input_obj.page_count == 2
+            and OCROutput.objects.filter(guid=input_obj).count() == 2
+            and input_obj.checksum == get_file_checksum(TESTFILE_PDF_PATH)
+        )
+
+    def test_create_model_object_batched_dispatch(self, settings, monkeypatch):
+        """
+
+        :return:
+        """
+        settings.USE_ASYNC_FOR_SPEED = True
+        settings.OCR_TASK_BATCH_SIZE = 2
+        enqueued_tasks = []
+        monkeypatch.setattr(
+            "django_q.tasks.async_task",
+            lambda func, **kwargs: enqueued_tasks.append((func, kwargs)),
+        )
+        ocr_input_object = OCRInput(file=self.upload_file, guid=self.guid)
+        ocr_input_object.save()
+        ocr_tasks = [
+            kwargs
+            for func, kwargs in enqueued_tasks
+            if func == "ocr.ocr_utils.ocr_images"
+        ]
+        assert (
+            len(ocr_tasks) == 1
+            and len(ocr_tasks[0]["pages_kw_args"]) == 2
+            and ocr_input_object.enqueue_metrics["tasks"] == 1
+            and ocr_input_object.enqueue_metrics["pages"] == 2
+        )
+
+    def test_create_model_object_streamed_first_batch(self, settings, monkeypatch):
+        """
+        The first task of a streamed pdf only waits for the first render chunk
+
+        :return:
+        """
+        settings.USE_ASYNC_FOR_SPEED = True
+        settings.OCR_TASK_BATCH_SIZE = 2
+        settings.PDF_STREAM_CHUNK_SIZE = 1
+        enqueued_tasks = []
+        monkeypatch.setattr(
+            "django_q.tasks.async_task",
+            lambda func, **kwargs: enqueued_tasks.append((func, kwargs)),
+        )
+        ocr_input_object = OCRInput(file=self.upload_file, guid=self.guid)
+        ocr_input_object.save()
+        ocr_tasks = [
+            func
+            for func, _ in enqueued_tasks
+            if func in ("ocr.ocr_utils.ocr_image", "ocr.ocr_utils.ocr_images")
+        ]
+        assert ocr_tasks == ["ocr.ocr_utils.ocr_image", "ocr.ocr_utils.ocr_image"]
+
+    def test_create_model_object_document_dedup(self, settings):
+        """
+
+        :return:
+        """
+        settings.USE_ASYNC_FOR_SPEED = False
+        settings.USE_DOCUMENT_DEDUP = True
+        OCRInput.objects.bulk_create(
+            [
+                OCRInput(
+                    guid="completed_input",
+                    bucket_name=settings.AWS_STORAGE_BUCKET_NAME,
+                    checksum=get_file_checksum(TESTFILE_PDF_PATH),
+                    ocr_config_key=build_ocr_config_key(),
+                    page_count=2,
+                )
+            ]
+        )
+        completed_input = OCRInput.objects.get(guid="completed_input")
+        for page_number in range(1, 3):
+            OCROutput.objects.create(
+                guid=completed_input,
+                image_path=f"page-{page_number}.png",
+                text=f"text of page {page_number}",
+                checksum=f"page-{page_number}",
+            )
+
+        ocr_input_object = OCRInput(file=self.upload_file, guid=self.guid)
+        ocr_input_object.save()
+        input_obj = OCRInput.objects.get(guid=self.guid)
+        output_texts = sorted(
+            OCROutput.objects.filter(guid=input_obj).values_list("text", flat=True)
+        )
         assert (
-            input_obj.guid == self.guid
-            and input_obj.checksum == checksum.get_for_file(TESTFILE_IMAGE_PATH)
+            ocr_input_object.duplicate_of == "completed_input"
+            and input_obj.page_count == 2
+            and output_texts == ["text of page 1", "text of page 2"]
         )
 
     def test_clean_method_raise_validation_error(self):
@@ -4,7 +4,6 @@ This module contains atomic tests for each method (where possible)
 """
 import os
 
-import checksum
 import numpy as np
 from django.conf import settings
 from django.core.files import File
@@ -14,30 +13,48 @@ import pdf2image
 from PIL import Image
 import pytest
 
+from ocr.dedup_cache import build_result_cache_key, get_dedup_cache
+from ocr.hashing import get_file_checksum
+from ocr.image_preprocessing import get_preprocessing_signature
 from ocr.models import (
     OCRInput,
     OCROutput,
 )
 from ocr.ocr_utils import (
+    build_ocr_config_key,
     build_tesseract_ocr_config,
+    chunk_page_ranges,
+    extract_pdf_text_layer,
     generate_save_image_kwargs,
     generate_text_from_ocr_output,
+    generate_text_from_ocr_output_legacy,
     get_obj_if_already_present,
+    get_pdf_page_count,
+    get_task_batch_size,
+    image_to_tsv_in_memory,
     is_pdf,
     is_image,
+    is_usable_text_layer,
+    iter_image_frames,
+    iter_pdf_to_image,
+    iter_save_image_kwargs,
     load_image,
     ocr_image,
+    ocr_images,
     ocr_using_tesseract_engine,
     pdf_to_image,
     save_images,
+    split_page_range_by_dpi,
 )
 from ocr.storage_utils import (
     generate_cloud_storage_key,
     object_exists_in_cloud_storage,
 )
 from .help_testutils import (
+    create_multi_page_tiff,
     TESTFILE_IMAGE_PATH,
     TESTFILE_PDF_PATH,
+    TESTFILE_TEXT_LAYER_PDF_PATH,
     TEST_DATAFRAME,
     TEST_DIR,
     UploadDeleteTestFile,
@@ -125,6 +142,172 @@ def test_pdf_to_image_specific_dir():
     )
 
 
+def test_get_pdf_page_count():
+    """
+
+    :return:
+    """
+    assert get_pdf_page_count(TESTFILE_PDF_PATH) == 2
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5])
+def test_iter_pdf_to_image(chunk_size):
+    """
+
+    :return:
+    """
+    image_generator = iter_pdf_to_image(
+        pdf_path=TESTFILE_PDF_PATH, chunk_size=chunk_size
+    )
+    first_image = next(image_generator)
+    local_image_fps = [first_image] + list(image_generator)
+
+    assert (
+        len(local_image_fps) == 2
+        and all(os.path.isfile(impath) for impath in local_image_fps)
+        and os.path.split(local_image_fps[0])[0] == settings.LOCAL_FILES_SAVE_DIR
+    )
+
+
+def test_iter_pdf_to_image_selected_pages():
+    """
+
+    :return:
+    """
+    local_image_fps = list(
+        iter_pdf_to_image(pdf_path=TESTFILE_PDF_PATH, chunk_size=4, pages=[2])
+    )
+    assert len(local_image_fps) == 1
+
+
+def test_iter_image_frames(tmp_path):
+    """
+
+    :return:
+    """
+    tiff_path = create_multi_page_tiff(str(tmp_path / "multi-page.tiff"))
+    image_generator = iter_image_frames(
+        image_path=tiff_path, output_folder=str(tmp_path / "frames")
+    )
+    first_image = next(image_generator)
+    local_image_fps = [first_image] + list(image_generator)
+
+    assert (
+        len(local_image_fps) == 3
+        and all(os.path.isfile(impath) for impath in local_image_fps)
+        and len(set(local_image_fps)) == 3
+        and all(Image.open(impath).size for impath in local_image_fps)
+    )
+
+
+def test_iter_image_frames_selected_frames(tmp_path):
+    """
+
+    :return:
+    """
+    tiff_path = create_multi_page_tiff(str(tmp_path / "multi-page.tiff"))
+    local_image_fps = list(
+        iter_image_frames(
+            image_path=tiff_path, output_folder=str(tmp_path), frames=[3, 1]
+        )
+    )
+    assert len(local_image_fps) == 2 and local_image_fps[0].endswith("-1.png")
+
+
+@pytest.mark.parametrize(
+    "pages, chunk_size, output",
+    [
+        ([1, 2, 3, 4, 5], 2, [(1, 2), (3, 4), (5, 5)]),
+        ([1, 2, 4, 5, 9], 4, [(1, 2), (4, 5), (9, 9)]),
+        ([], 4, []),
+    ],
+)
+def test_chunk_page_ranges(pages, chunk_size, output):
+    """
+
+    :return:
+    """
+    assert chunk_page_ranges(pages, chunk_size) == output
+
+
+@pytest.mark.parametrize(
+    "page_dpis, output",
+    [
+        (None, [(1, 4, 300)]),
+        ({1: 300, 2: 300, 3: 150, 4: 300}, [(1, 2, 300), (3, 3, 150), (4, 4, 300)]),
+        ({3: 212}, [(1, 2, 300), (3, 3, 212), (4, 4, 300)]),
+    ],
+)
+def test_split_page_range_by_dpi(page_dpis, output):
+    """
+
+    :return:
+    """
+    assert split_page_range_by_dpi(1, 4, page_dpis=page_dpis, dpi=300) == output
+
+
+@pytest.mark.parametrize(
+    "text, output",
+    [
+        ("Invoice number 2021-0042 total amount due", True),
+        ("   \n ", False),
+        ("Too short", False),
+        ("\x01\x02\x03\x04\x05\x06 \x07 \x08\t\n\x05\x06\n" * 5 + "abc", False),
+    ],
+)
+def test_is_usable_text_layer(text, output):
+    """
+
+    :return:
+    """
+    assert is_usable_text_layer(text, min_chars=20) == output
+
+
+def test_extract_pdf_text_layer():
+    """
+
+    :return:
+    """
+    text_layer = extract_pdf_text_layer(TESTFILE_TEXT_LAYER_PDF_PATH)
+    assert list(text_layer) == [1] and "Invoice number 2021-0042" in text_layer[1]
+
+
+def test_extract_pdf_text_layer_scanned_pdf():
+    """
+
+    :return:
+    """
+    assert extract_pdf_text_layer(TESTFILE_PDF_PATH) == {}
+
+
+def test_extract_pdf_text_layer_not_pdf():
+    """
+
+    :return:
+    """
+    assert extract_pdf_text_layer(TESTFILE_IMAGE_PATH) == {}
+
+
+def test_iter_save_image_kwargs():
+    """
+
+    :return:
+    """
+    images = [TESTFILE_IMAGE_PATH, TESTFILE_PDF_PATH]
+    out = iter_save_image_kwargs(
+        images=iter(images),
+        pdf_path=TESTFILE_PDF_PATH,
+        append_datetime=False,
+        prefix="media",
+    )
+    assert not isinstance(out, list) and list(out) == generate_save_image_kwargs(
+        images=images,
+        pdf_path=TESTFILE_PDF_PATH,
+        append_datetime=False,
+        prefix="media",
+    )
+
+
 def test_generate_save_image_kwargs():
     """
 
@@ -331,12 +514,18 @@ def test_ocr_image_when_object_already_present():
         file=upload_file,
         guid=guid,
     )
-    checksum_image_file = checksum.get_for_file(TESTFILE_IMAGE_PATH)
+    checksum_image_file = get_file_checksum(TESTFILE_IMAGE_PATH)
 
     _ = OCROutput.objects.create(
         guid=input_obj,
         image_path=TESTFILE_IMAGE_PATH,
         checksum=checksum_image_file,
+        result_key=build_result_cache_key(
+            checksum=checksum_image_file,
+            ocr_config=build_tesseract_ocr_config(),
+            ocr_language=settings.OCR_LANGUAGE,
+            preprocessing=get_preprocessing_signature(preprocess=False),
+        ),
         text="blah blah",
     )
 
@@ -349,6 +538,39 @@ def test_ocr_image_when_object_already_present():
     assert text == "blah blah"
 
 
+@pytest.mark.django_db(transaction=True)
+def test_ocr_image_ignores_results_of_other_config(settings):
+    """
+
+    :return:
+    """
+    settings.OCR_LANGUAGE = "eng"
+    OCRInput.objects.bulk_create(
+        [OCRInput(guid="other_config", bucket_name=settings.AWS_STORAGE_BUCKET_NAME)]
+    )
+    checksum_image_file = get_file_checksum(TESTFILE_IMAGE_PATH)
+    _ = OCROutput.objects.create(
+        guid=OCRInput.objects.get(guid="other_config"),
+        image_path=TESTFILE_IMAGE_PATH,
+        checksum=checksum_image_file,
+        result_key=build_result_cache_key(
+            checksum=checksum_image_file,
+            ocr_config=build_tesseract_ocr_config(),
+            ocr_language="deu",
+            preprocessing=get_preprocessing_signature(preprocess=False),
+        ),
+        text="blah blah",
+    )
+
+    text = ocr_image(
+        imagepath=TESTFILE_IMAGE_PATH,
+        preprocess=False,
+        save_images_to_cloud=False,
+    )
+
+    assert text != "blah blah"
+
+
 def test_generate_text_from_ocr_output():
     """
 
@@ -359,6 +581,16 @@ def test_generate_text_from_ocr_output():
     assert isinstance(text, str)
 
 
+def test_generate_text_from_ocr_output_legacy():
+    """
+
+    :return:
+    """
+    dataframe = pd.read_pickle(TEST_DATAFRAME)
+    text = generate_text_from_ocr_output(dataframe, line_grouping="legacy")
+    assert text == generate_text_from_ocr_output_legacy(dataframe)
+
+
 def test_load_image_preprocess():
     """
 
@@ -386,6 +618,28 @@ def test_load_image_no_preprocess():
     )
 
 
+@pytest.mark.parametrize("preprocess", [True, False])
+@pytest.mark.parametrize("in_memory", [True, False])
+def test_load_image_from_bytes(settings, preprocess, in_memory):
+    """
+    Pages read once for hashing decode to the same image as when read from disk
+
+    :return:
+    """
+    settings.OCR_IN_MEMORY_PIPELINE = in_memory
+    with open(TESTFILE_IMAGE_PATH, "rb") as image_file:
+        image_bytes = image_file.read()
+
+    assert np.array_equal(
+        load_image(
+            imagepath=TESTFILE_IMAGE_PATH,
+            preprocess=preprocess,
+            image_bytes=image_bytes,
+        ),
+        load_image(imagepath=TESTFILE_IMAGE_PATH, preprocess=preprocess),
+    )
+
+
 def test_ocr_using_tesseract_engine():
     """
 
@@ -394,6 +648,28 @@ def test_ocr_using_tesseract_engine():
     assert isinstance(ocr_using_tesseract_engine(TESTFILE_IMAGE_PATH), str)
 
 
+@pytest.mark.parametrize("output_parser", ["tsv", "dataframe"])
+def test_ocr_using_tesseract_engine_in_memory(output_parser):
+    """
+
+    :return:
+    """
+    image = load_image(imagepath=TESTFILE_IMAGE_PATH, preprocess=True)
+    assert ocr_using_tesseract_engine(
+        image, output_parser=output_parser, in_memory=True
+    ) == ocr_using_tesseract_engine(image, output_parser=output_parser, in_memory=False)
+
+
+def test_image_to_tsv_in_memory():
+    """
+
+    :return:
+    """
+    image = load_image(imagepath=TESTFILE_IMAGE_PATH, preprocess=False)
+    tsv = image_to_tsv_in_memory(image, ocr_config=build_tesseract_ocr_config())
+    assert tsv.startswith("level\tpage_num")
+
+
 @pytest.mark.django_db(transaction=True)
 def test_get_obj_if_already_present():
     """
@@ -418,7 +694,7 @@ def test_get_obj_if_already_present():
         file=upload_file,
         guid=guid,
     )
-    checksum_image_file = checksum.get_for_file(TESTFILE_IMAGE_PATH)
+    checksum_image_file = get_file_checksum(TESTFILE_IMAGE_PATH)
 
     out_before_adding = get_obj_if_already_present(checksum_image_file)
 
@@ -432,3 +708,130 @@ def test_get_obj_if_already_present():
     out_after_adding = get_obj_if_already_present(checksum_image_file)
 
     assert not out_before_adding and out_after_adding == output_obj
+
+
+def test_build_ocr_config_key():
+    """
+
+    :return:
+    """
+    default_key = build_ocr_config_key()
+    assert (
+        default_key == build_ocr_config_key(ocr_config=build_tesseract_ocr_config())
+        and default_key != build_ocr_config_key(ocr_language="deu")
+        and default_key != build_ocr_config_key(ocr_config="tsv --oem 1 --psm 6")
+        and len(default_key) == 40
+    )
+
+
+@pytest.mark.parametrize(
+    "setting,value", [("IMAGE_SIZE", 2400), ("BINARY_THRESHOLD", 150)]
+)
+def test_build_ocr_config_key_preprocessing_settings(settings, setting, value):
+    """
+    Documents are only deduplicated when their pages would get the same result key
+
+    :return:
+    """
+    default_key = build_ocr_config_key()
+    setattr(settings, setting, value)
+    assert build_ocr_config_key() != default_key
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_obj_if_already_present_cached(django_assert_num_queries):
+    """
+
+    :return:
+    """
+    data = File(open(TESTFILE_PDF_PATH, "rb"))
+    upload_file = InMemoryUploadedFile(
+        name=os.path.split(TESTFILE_PDF_PATH)[-1],
+        file=data,
+        content_type="multipart/form-data",
+        size=500,
+        field_name=None,
+        charset=None,
+    )
+    input_obj = OCRInput.objects.create(
+        file=upload_file,
+        guid="test_get_obj_if_already_present_cached",
+    )
+    output_obj = OCROutput.objects.create(
+        guid=input_obj,
+        image_path=TESTFILE_IMAGE_PATH,
+        checksum="cached-checksum",
+        text="blah blah",
+    )
+    get_dedup_cache().clear()
+
+    with django_assert_num_queries(1):
+        out_from_db = get_obj_if_already_present("cached-checksum")
+    with django_assert_num_queries(0):
+        out_from_cache = get_obj_if_already_present("cached-checksum")
+
+    stats = get_dedup_cache().stats()
+    output_obj.delete()
+
+    assert (
+        out_from_db == output_obj
+        and out_from_cache == output_obj
+        and stats["hits"] == 1
+        and stats["misses"] == 1
+        and get_obj_if_already_present("cached-checksum") is None
+    )
+
+
+@pytest.mark.parametrize(
+    "page_count, batch_size, output",
+    [
+        (300, 5, 5),
+        (2, 0, 1),
+        (24, 0, 3),
+        (300, 0, 8),
+    ],
+)
+def test_get_task_batch_size(settings, page_count, batch_size, output):
+    """
+
+    :return:
+    """
+    settings.Q_CLUSTER = {**settings.Q_CLUSTER, "workers": 4}
+    assert get_task_batch_size(page_count=page_count, batch_size=batch_size) == output
+
+
+def test_ocr_images_failed_page():
+    """
+
+    :return:
+    """
+    pages_kw_args = [
+        {"imagepath": "/not/a/page.png", "save_images_to_cloud": False},
+    ]
+    assert ocr_images(pages_kw_args, use_async_to_upload=False) == [None]
+
+
+def test_save_images_batch_async(monkeypatch):
+    """
+
+    :return:
+    """
+    enqueued_tasks = []
+    monkeypatch.setattr(
+        "django_q.tasks.async_task",
+        lambda func, **kwargs: enqueued_tasks.append((func, kwargs)),
+    )
+    kw_args = generate_save_image_kwargs(
+        images=[TESTFILE_IMAGE_PATH, TESTFILE_PDF_PATH],
+        pdf_path=TESTFILE_PDF_PATH,
+        append_datetime=False,
+        prefix="test_data",
+        cloud_storage="s3",
+    )
+    cloud_paths = save_images(kw_args=kw_args, use_async_to_upload=True)
+    assert (
+        len(enqueued_tasks) == 1
+        and enqueued_tasks[0][0] == "ocr.ocr_utils.save_images"
+        and enqueued_tasks[0][1]["kw_args"] == kw_args
+        and len(cloud_paths) == 2
+    )
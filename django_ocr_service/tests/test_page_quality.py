@@ -0,0 +1,128 @@
+"""
+Tests for the clean page classifier and automatic skip of preprocessing
+"""
+import numpy as np
+from PIL import Image
+import pytest
+
+from ocr.image_preprocessing import get_preprocessing_signature, load_scaled_gray_image
+from ocr.ocr_utils import build_ocr_config_key
+from ocr.page_quality import (
+    PREPROCESSING_FULL,
+    PREPROCESSING_SKIPPED,
+    classify_page,
+    get_preprocessing_skip_stats,
+)
+from ocr.preprocessing_profiles import (
+    pop_preprocessing_decision,
+    pop_stage_timings,
+    run_preprocessing_profile,
+)
+
+from .help_testutils import create_text_page
+
+
+def make_rendered_page():
+    """
+    Black text with anti-aliased edges on a white page, like pdf_to_image output
+
+    :return:
+    """
+    return create_text_page(
+        height=1100,
+        width=850,
+        line_spacing=45,
+        top_margin=100,
+        bottom_margin=100,
+        anti_aliased=True,
+    )
+
+
+def make_scanned_page():
+    """
+    Rendered page on grey paper with sensor noise
+
+    :return:
+    """
+    rng = np.random.default_rng(0)
+    page = make_rendered_page().astype(np.float64) * 0.9 + rng.normal(0, 6, (1100, 850))
+    return np.clip(page, 0, 255).astype(np.uint8)
+
+
+@pytest.mark.parametrize(
+    "image, decision",
+    [
+        (Image.fromarray(make_rendered_page()), PREPROCESSING_SKIPPED),
+        (Image.fromarray(make_rendered_page()).convert("1"), PREPROCESSING_SKIPPED),
+        (Image.fromarray(make_rendered_page()).convert("RGB"), PREPROCESSING_SKIPPED),
+        (Image.fromarray(make_scanned_page()), PREPROCESSING_FULL),
+        (
+            Image.fromarray(np.tile(np.arange(256, dtype=np.uint8), (300, 1))),
+            PREPROCESSING_FULL,
+        ),
+        (Image.fromarray(np.zeros((300, 300), dtype=np.uint8)), PREPROCESSING_FULL),
+    ],
+)
+def test_classify_page(image, decision):
+    """
+
+    :return:
+    """
+    assert classify_page(image)["decision"] == decision
+
+
+@pytest.mark.parametrize(
+    "make_page, decision",
+    [
+        (make_rendered_page, PREPROCESSING_SKIPPED),
+        (make_scanned_page, PREPROCESSING_FULL),
+    ],
+)
+def test_auto_skip_preprocessing(settings, tmp_path, make_page, decision):
+    """
+    Clean pages are only scaled, other pages are preprocessed as before
+
+    :return:
+    """
+    path = str(tmp_path / "page.png")
+    Image.fromarray(make_page()).save(path)
+    settings.OCR_AUTO_SKIP_PREPROCESSING = False
+    preprocessed_image = run_preprocessing_profile(path, profile="default")
+    assert pop_preprocessing_decision() is None
+
+    settings.OCR_AUTO_SKIP_PREPROCESSING = True
+    stats_before = get_preprocessing_skip_stats()
+    image = run_preprocessing_profile(path, profile="default")
+    stats_after = get_preprocessing_skip_stats()
+    stages = [stage for stage, _ in pop_stage_timings()]
+
+    assert (
+        pop_preprocessing_decision() == decision
+        and stats_after["pages_classified"] == stats_before["pages_classified"] + 1
+    )
+    if decision == PREPROCESSING_SKIPPED:
+        assert (
+            stages == ["scale"]
+            and np.array_equal(image, load_scaled_gray_image(path))
+            and stats_after["pages_skipped"] == stats_before["pages_skipped"] + 1
+            and stats_after["seconds_saved"] > stats_before["seconds_saved"]
+        )
+    else:
+        assert stages == ["scale", "binarize"] and np.array_equal(
+            image, preprocessed_image
+        )
+
+
+def test_auto_skip_preprocessing_signature(settings):
+    """
+
+    :return:
+    """
+    settings.OCR_AUTO_SKIP_PREPROCESSING = False
+    signature = get_preprocessing_signature()
+    config_key = build_ocr_config_key()
+    settings.OCR_AUTO_SKIP_PREPROCESSING = True
+    assert (
+        get_preprocessing_signature() != signature
+        and build_ocr_config_key() != config_key
+    )
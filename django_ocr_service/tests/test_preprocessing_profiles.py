@@ -0,0 +1,191 @@
+"""
+Tests for the preprocessing stage registry and profiles
+"""
+import cv2
+import numpy as np
+from PIL import Image
+import pytest
+
+from ocr.image_preprocessing import preprocess_image_for_ocr
+from ocr.ocr_utils import build_ocr_config_key, load_image
+from ocr.preprocessing_profiles import (
+    PREPROCESSING_STAGES,
+    crop_borders,
+    estimate_skew_angle,
+    get_profile_signature,
+    get_profile_stages,
+    is_bilevel_image,
+    pop_stage_timings,
+    register_preprocessing_stage,
+    run_preprocessing_profile,
+)
+from ocr.serializers import OCRInputSerializer
+
+from .help_testutils import TESTFILE_IMAGE_PATH, create_text_page
+
+
+def test_default_profile_matches_preprocess_image_for_ocr():
+    """
+
+    :return:
+    """
+    pop_stage_timings()
+    image = run_preprocessing_profile(TESTFILE_IMAGE_PATH, profile="default")
+    assert np.array_equal(
+        image, preprocess_image_for_ocr(TESTFILE_IMAGE_PATH, in_memory=True)
+    ) and [stage for stage, _ in pop_stage_timings()] == ["scale", "binarize"]
+
+
+def test_fast_profile_skips_bilevel_pages(tmp_path):
+    """
+
+    :return:
+    """
+    gray_path = str(tmp_path / "gray.png")
+    bilevel_path = str(tmp_path / "bilevel.png")
+    page = create_text_page()
+    Image.fromarray(cv2.GaussianBlur(page, (3, 3), 0)).save(gray_path)
+    Image.fromarray(page).convert("1").save(bilevel_path)
+
+    bilevel_image = run_preprocessing_profile(bilevel_path, profile="fast")
+    bilevel_stages = [stage for stage, _ in pop_stage_timings()]
+    run_preprocessing_profile(gray_path, profile="fast")
+    gray_stages = [stage for stage, _ in pop_stage_timings()]
+
+    assert (
+        bilevel_stages == ["skip_if_bilevel"]
+        and np.array_equal(bilevel_image, page)
+        and gray_stages == ["skip_if_bilevel", "scale", "binarize"]
+    )
+
+
+def test_is_bilevel_image():
+    """
+
+    :return:
+    """
+    page = create_text_page()
+    assert is_bilevel_image(page) and not is_bilevel_image(
+        cv2.GaussianBlur(page, (3, 3), 0)
+    )
+
+
+def test_none_profile_loads_page():
+    """
+
+    :return:
+    """
+    assert np.array_equal(
+        run_preprocessing_profile(TESTFILE_IMAGE_PATH, profile="none"),
+        load_image(TESTFILE_IMAGE_PATH, preprocess=False),
+    )
+
+
+@pytest.mark.parametrize("skew", [-3.0, 0.0, 2.0])
+def test_estimate_skew_angle(skew):
+    """
+
+    :return:
+    """
+    page = create_text_page()
+    rotation = cv2.getRotationMatrix2D((400, 300), skew, 1.0)
+    skewed_page = cv2.warpAffine(page, rotation, (800, 600), borderValue=255)
+    assert estimate_skew_angle(skewed_page) == pytest.approx(-skew, abs=0.5)
+
+
+def test_crop_borders():
+    """
+    Blank margins and a dark scanner border are cropped away
+
+    :return:
+    """
+    page = np.full((1000, 1200), 255, dtype=np.uint8)
+    page[200:800, 200:1000] = create_text_page()
+    page[:, :15] = 0
+
+    cropped = crop_borders(page)
+    assert cropped.shape[0] < 600 and cropped.shape[1] < 800 and cropped.min() == 0
+
+
+def test_photo_profile(tmp_path):
+    """
+
+    :return:
+    """
+    path = str(tmp_path / "photo.png")
+    Image.fromarray(create_text_page()).save(path)
+    image = run_preprocessing_profile(path, profile="photo")
+    assert image.dtype == np.uint8 and set(np.unique(image)) <= {0, 255}
+    assert [stage for stage, _ in pop_stage_timings()] == [
+        "scale",
+        "denoise",
+        "deskew",
+        "crop_borders",
+        "binarize",
+    ]
+
+
+def test_custom_profile_and_stage(settings):
+    """
+
+    :return:
+    """
+
+    @register_preprocessing_stage("invert")
+    def invert(image):
+        return 255 - np.asarray(image.convert("L"))
+
+    settings.OCR_PREPROCESSING_PROFILES = {"inverted": ["invert"]}
+    try:
+        image = run_preprocessing_profile(TESTFILE_IMAGE_PATH, profile="inverted")
+        assert np.array_equal(
+            image, 255 - load_image(TESTFILE_IMAGE_PATH, preprocess=False)
+        )
+    finally:
+        PREPROCESSING_STAGES.pop("invert")
+
+
+@pytest.mark.parametrize("profiles", [{}, {"broken": ["scale", "sharpen"]}])
+def test_unknown_profile_or_stage(settings, profiles):
+    """
+
+    :return:
+    """
+    settings.OCR_PREPROCESSING_PROFILES = profiles
+    with pytest.raises(NotImplementedError):
+        get_profile_stages("broken")
+
+
+def test_profile_signature_and_config_key():
+    """
+    Default stages keep the cache keys of earlier versions
+
+    :return:
+    """
+    assert (
+        get_profile_signature("default") == get_profile_signature()
+        and get_profile_signature("fast") != get_profile_signature("default")
+        and get_profile_signature("photo", preprocess=False) == "none"
+        and build_ocr_config_key(preprocessing_profile="default")
+        == build_ocr_config_key()
+        and build_ocr_config_key(preprocessing_profile="photo")
+        != build_ocr_config_key()
+    )
+
+
+def test_serializer_validates_preprocessing_profile():
+    """
+
+    :return:
+    """
+    assert (
+        OCRInputSerializer(
+            data={"cloud_storage_uri": "some string", "preprocessing_profile": "fast"}
+        ).is_valid()
+        and not OCRInputSerializer(
+            data={
+                "cloud_storage_uri": "some string",
+                "preprocessing_profile": "unknown",
+            }
+        ).is_valid()
+    )
@@ -0,0 +1,369 @@
+"""
+Tests for storage utils against a moto S3 stand-in
+"""
+import os
+
+import boto3
+from django.conf import settings
+from django.core.files.base import ContentFile
+import pytest
+
+from django_ocr_service.custom_storage import CloudMediaHybridStorage
+
+from ocr.hashing import hash_bytes, lookup_file_hash
+from ocr.storage_utils import (
+    bulk_delete_objects_from_cloud_storage,
+    clear_cloud_storages,
+    delete_objects_from_cloud_storage,
+    download_from_cloud_storage,
+    expire_old_images_from_cloud_storage,
+    get_cloud_storage_stats,
+    instantiate_custom_cloud_stroage,
+    load_from_cloud_storage_and_save,
+    stream_upload_to_cloud_storage,
+    upload_batch_to_cloud_storage,
+    upload_to_cloud_storage,
+)
+
+moto = pytest.importorskip("moto")
+
+MOTO_BUCKET = "moto-test-bucket"
+OBJECT_KEY = "test_data/large-input.pdf"
+
+
+@pytest.fixture
+def s3_object():
+    """
+    Bucket with one object of a little over three parts of 64 KiB
+    :return:
+    """
+    content = os.urandom(3 * 64 * 1024 + 123)
+    with moto.mock_s3():
+        client = boto3.client("s3", region_name=settings.AWS_REGION)
+        client.create_bucket(Bucket=MOTO_BUCKET)
+        client.put_object(Bucket=MOTO_BUCKET, Key=OBJECT_KEY, Body=content)
+        yield content
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_download_from_cloud_storage(s3_object, tmp_path, concurrency):
+    """
+
+    :return:
+    """
+    save_path = str(tmp_path / "large-input.pdf")
+    progress = []
+    download_stats = download_from_cloud_storage(
+        key=OBJECT_KEY,
+        save_path=save_path,
+        bucket=MOTO_BUCKET,
+        part_size=64 * 1024,
+        concurrency=concurrency,
+        progress_callback=lambda done, total: progress.append((done, total)),
+    )
+
+    with open(save_path, "rb") as saved_file:
+        assert saved_file.read() == s3_object
+
+    assert (
+        download_stats["bytes"] == len(s3_object)
+        and download_stats["parts"] == (1 if concurrency == 1 else 4)
+        and progress[-1] == (len(s3_object), len(s3_object))
+        and download_stats["checksum"] == hash_bytes(s3_object)
+    )
+
+
+def test_download_from_cloud_storage_missing_object(s3_object, tmp_path):
+    """
+
+    :return:
+    """
+    save_path = str(tmp_path / "missing.pdf")
+    with pytest.raises(Exception):
+        download_from_cloud_storage(
+            key="test_data/missing.pdf", save_path=save_path, bucket=MOTO_BUCKET
+        )
+    assert not os.path.exists(save_path)
+
+
+def test_load_from_cloud_storage_and_save(s3_object, tmp_path):
+    """
+
+    :return:
+    """
+    save_path = load_from_cloud_storage_and_save(
+        key=OBJECT_KEY, bucket=MOTO_BUCKET, local_save_dir=str(tmp_path)
+    )
+
+    assert save_path == str(tmp_path / "large-input.pdf") and lookup_file_hash(
+        save_path
+    ) == hash_bytes(s3_object)
+
+
+def test_instantiate_custom_cloud_stroage_pooled():
+    """
+
+    :return:
+    """
+    clear_cloud_storages()
+    cloud_storage = instantiate_custom_cloud_stroage(bucket=MOTO_BUCKET)
+    other_bucket_storage = instantiate_custom_cloud_stroage(bucket="other-bucket")
+
+    assert (
+        instantiate_custom_cloud_stroage(bucket=MOTO_BUCKET) is cloud_storage
+        and other_bucket_storage is not cloud_storage
+        and cloud_storage.bucket.name == MOTO_BUCKET
+        and cloud_storage.location == ""
+        and instantiate_custom_cloud_stroage(clear_default_location=False).location
+        == "media"
+    )
+
+    stats = get_cloud_storage_stats()
+    assert stats["storages_created"] == 3 and stats["storages_reused"] == 1
+
+
+def test_cloud_storage_stats_count_connections(s3_object, tmp_path, caplog):
+    """
+
+    :return:
+    """
+    clear_cloud_storages()
+    for _ in range(3):
+        load_from_cloud_storage_and_save(
+            key=OBJECT_KEY, bucket=MOTO_BUCKET, local_save_dir=str(tmp_path)
+        )
+
+    stats = get_cloud_storage_stats()
+    assert (
+        stats["storages_created"] == 1
+        and stats["storages_reused"] == 2
+        and stats["connections_opened"] >= 0
+        and stats["connections_reused"] >= 0
+        and "Cloud Log: Cloud storage connections - " in caplog.text
+    )
+
+
+@pytest.mark.parametrize("file_size", [1024, 11 * 1024 * 1024])
+def test_stream_upload_to_cloud_storage(s3_object, tmp_path, file_size):
+    """
+    Small files are a single PUT, larger ones are uploaded in three 5 MiB parts
+
+    :return:
+    """
+    path = str(tmp_path / "page.png")
+    content = os.urandom(file_size)
+    with open(path, "wb") as upload_file:
+        upload_file.write(content)
+
+    progress = []
+    upload_stats = stream_upload_to_cloud_storage(
+        path=path,
+        key="test_data/page.png",
+        bucket=MOTO_BUCKET,
+        multipart_threshold=5 * 1024 * 1024,
+        part_size=5 * 1024 * 1024,
+        concurrency=3,
+        progress_callback=lambda done, total: progress.append((done, total)),
+    )
+
+    uploaded = boto3.client("s3", region_name=settings.AWS_REGION).get_object(
+        Bucket=MOTO_BUCKET, Key="test_data/page.png"
+    )
+    assert (
+        uploaded["Body"].read() == content
+        and uploaded["ContentType"] == "image/png"
+        and upload_stats["bytes"] == file_size
+        and progress[-1] == (file_size, file_size)
+    )
+    if file_size > 5 * 1024 * 1024:
+        assert uploaded["ETag"].strip('"').endswith("-3")
+
+
+def test_upload_to_cloud_storage(s3_object, tmp_path):
+    """
+
+    :return:
+    """
+    os.makedirs(tmp_path / "upload")
+    path = str(tmp_path / "upload" / "input.pdf")
+    with open(path, "wb") as upload_file:
+        upload_file.write(s3_object)
+
+    url = upload_to_cloud_storage(
+        path=path, bucket=MOTO_BUCKET, prefix="test_data", append_datetime=False
+    )
+    save_path = load_from_cloud_storage_and_save(
+        key="test_data/input.pdf",
+        bucket=MOTO_BUCKET,
+        local_save_dir=str(tmp_path),
+    )
+
+    with open(save_path, "rb") as saved_file:
+        assert "test_data/input.pdf" in url and saved_file.read() == s3_object
+
+
+@pytest.mark.parametrize("bucket", [MOTO_BUCKET, "missing-bucket"])
+def test_hybrid_storage_blocking_upload(s3_object, settings, bucket):
+    """
+    Failed blocking uploads of an input file reach the caller
+
+    :return:
+    """
+    settings.USE_ASYNC_FOR_SPEED = False
+    storage = CloudMediaHybridStorage(bucket_name=bucket)
+    if bucket == MOTO_BUCKET:
+        name = storage.save("input_files/input.pdf", ContentFile(s3_object))
+        client = boto3.client("s3", region_name=settings.AWS_REGION)
+        assert client.head_object(Bucket=bucket, Key=storage._normalize_name(name))[
+            "ContentLength"
+        ] == len(s3_object)
+    else:
+        with pytest.raises(Exception):
+            storage.save("input_files/input.pdf", ContentFile(s3_object))
+
+
+def test_upload_batch_to_cloud_storage(s3_object, tmp_path):
+    """
+    Keys come back in input order and a missing file only fails its own upload
+
+    :return:
+    """
+    kw_args = []
+    for page_number in range(5):
+        path = str(tmp_path / f"page-{page_number}.png")
+        with open(path, "wb") as page_file:
+            page_file.write(f"page {page_number}".encode())
+        kw_args.append(
+            {
+                "path": path,
+                "bucket": MOTO_BUCKET,
+                "prefix": "test_data",
+                "key": f"document.pdf/page-{page_number}.png",
+                "append_datetime": False,
+            }
+        )
+    kw_args[2]["path"] = str(tmp_path / "missing.png")
+
+    keys = upload_batch_to_cloud_storage(kw_args, max_workers=3)
+
+    client = boto3.client("s3", region_name=settings.AWS_REGION)
+    assert keys == [
+        "test_data/document.pdf/page-0.png",
+        "test_data/document.pdf/page-1.png",
+        None,
+        "test_data/document.pdf/page-3.png",
+        "test_data/document.pdf/page-4.png",
+    ] and all(
+        client.get_object(Bucket=MOTO_BUCKET, Key=key)["Body"].read()
+        == f"page {page_number}".encode()
+        for page_number, key in enumerate(keys)
+        if key
+    )
+
+
+def put_objects(keys):
+    """
+
+    :param keys:
+    :return:
+    """
+    client = boto3.client("s3", region_name=settings.AWS_REGION)
+    for obj_key in keys:
+        client.put_object(Bucket=MOTO_BUCKET, Key=obj_key, Body=b"page")
+    return client
+
+
+def list_keys(client):
+    """
+
+    :param client:
+    :return:
+    """
+    response = client.list_objects_v2(Bucket=MOTO_BUCKET)
+    return sorted(obj["Key"] for obj in response.get("Contents", []))
+
+
+def test_bulk_delete_objects_from_cloud_storage(s3_object):
+    """
+
+    :return:
+    """
+    keys = [f"test_data/bulk/page-{page_number}.png" for page_number in range(25)]
+    client = put_objects(keys)
+
+    result = bulk_delete_objects_from_cloud_storage(
+        keys, bucket=MOTO_BUCKET, batch_size=10, max_workers=3
+    )
+
+    assert result == {"deleted": 25, "failed": {}} and list_keys(client) == [OBJECT_KEY]
+
+
+def test_bulk_delete_objects_reports_failed_keys(s3_object, monkeypatch):
+    """
+
+    :return:
+    """
+    client = instantiate_custom_cloud_stroage(bucket=MOTO_BUCKET).client
+    monkeypatch.setattr(
+        client,
+        "delete_objects",
+        lambda Bucket, Delete: {
+            "Errors": [
+                {
+                    "Key": Delete["Objects"][0]["Key"],
+                    "Code": "AccessDenied",
+                    "Message": "Denied",
+                }
+            ]
+        },
+    )
+
+    result = bulk_delete_objects_from_cloud_storage(
+        ["a.png", "b.png", "c.png"], bucket=MOTO_BUCKET, batch_size=2
+    )
+
+    assert result == {
+        "deleted": 1,
+        "failed": {"a.png": "AccessDenied - Denied", "c.png": "AccessDenied - Denied"},
+    }
+
+
+def test_delete_objects_from_cloud_storage(s3_object):
+    """
+
+    :return:
+    """
+    client = put_objects(["test_data/one.png", "test_data/two.png"])
+
+    assert (
+        delete_objects_from_cloud_storage("test_data/one.png", bucket=MOTO_BUCKET) == 1
+        and delete_objects_from_cloud_storage(
+            ["test_data/two.png"], bucket=MOTO_BUCKET, bulk=False
+        )
+        == 1
+        and list_keys(client) == [OBJECT_KEY]
+    )
+
+
+def test_expire_old_images_from_cloud_storage(s3_object):
+    """
+    Only page images are expired, input files are kept
+
+    :return:
+    """
+    image_keys = [
+        "media/2021-06-01-10-00-00/input.pdf/page-1.png",
+        "media/2021-06-01-10-00-00/input.pdf/page-2.png",
+    ]
+    kept_keys = ["media/input_files/input.pdf", "media/notes/input.pdf/readme.txt"]
+    client = put_objects(image_keys + kept_keys)
+
+    assert expire_old_images_from_cloud_storage(days=1, bucket=MOTO_BUCKET) == {
+        "deleted": 0,
+        "failed": {},
+    }
+    assert expire_old_images_from_cloud_storage(days=0, bucket=MOTO_BUCKET) == {
+        "deleted": 2,
+        "failed": {},
+    }
+    assert list_keys(client) == sorted(kept_keys + [OBJECT_KEY])
@@ -0,0 +1,74 @@
+"""
+Tests for the persistent in-process tesseract engine
+"""
+import pytest
+
+from ocr.ocr_utils import ocr_image
+from ocr.tesseract_api import (
+    end_tesseract_apis,
+    get_tesseract_api,
+    ocr_using_tesseract_api,
+    parse_tesseract_ocr_config,
+)
+from .help_testutils import TESTFILE_IMAGE_PATH
+
+
+def test_parse_tesseract_ocr_config():
+    """
+
+    :return:
+    """
+    assert parse_tesseract_ocr_config(
+        "tsv --oem 1 --psm 4 --tessdata-dir /usr/share/tessdata"
+    ) == {"oem": 1, "psm": 4, "tessdata_dir": "/usr/share/tessdata"}
+
+
+def test_parse_tesseract_ocr_config_empty():
+    """
+
+    :return:
+    """
+    assert parse_tesseract_ocr_config(None) == {
+        "oem": None,
+        "psm": None,
+        "tessdata_dir": None,
+    }
+
+
+def test_get_tesseract_api_is_reused():
+    """
+
+    :return:
+    """
+    pytest.importorskip("tesserocr")
+    first_api = get_tesseract_api(lang="eng", psm=3)
+    second_api = get_tesseract_api(lang="eng", psm=3)
+    end_tesseract_apis()
+    assert first_api is second_api
+
+
+def test_ocr_using_tesseract_api():
+    """
+
+    :return:
+    """
+    pytest.importorskip("tesserocr")
+    text = ocr_using_tesseract_api(TESTFILE_IMAGE_PATH, ocr_config="tsv --oem 11")
+    end_tesseract_apis()
+    assert isinstance(text, str)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_ocr_image_tesseract_api_falls_back(monkeypatch):
+    """
+
+    :return:
+    """
+    monkeypatch.setattr("ocr.ocr_utils.is_tesseract_api_available", lambda: False)
+    out = ocr_image(
+        imagepath=TESTFILE_IMAGE_PATH,
+        preprocess=False,
+        ocr_engine="tesseract_api",
+        save_images_to_cloud=False,
+    )
+    assert isinstance(out, str)
@@ -0,0 +1,74 @@
+"""
+Tests for parsing Tesseract TSV output without pandas
+"""
+import numpy as np
+import pandas as pd
+
+from ocr.ocr_utils import (
+    generate_text_from_ocr_output,
+    ocr_using_tesseract_engine,
+)
+from ocr.tesseract_tsv import (
+    generate_text_from_tesseract_words,
+    parse_tesseract_tsv,
+)
+from .help_testutils import (
+    TEST_DATAFRAME,
+    TEST_TSV,
+    TESTFILE_IMAGE_PATH,
+)
+
+
+def read_test_tsv():
+    """
+
+    :return:
+    """
+    with open(TEST_TSV, "r") as tsv_file:
+        return tsv_file.read()
+
+
+def test_parse_tesseract_tsv():
+    """
+
+    :return:
+    """
+    words = parse_tesseract_tsv(read_test_tsv())
+    dataframe = pd.read_pickle(TEST_DATAFRAME)
+    assert (
+        len(words) == len(dataframe)
+        and np.array_equal(words.top, dataframe["top"].to_numpy())
+        and np.array_equal(words.left, dataframe["left"].to_numpy())
+        and words.text == dataframe["text"].fillna("").tolist()
+    )
+
+
+def test_parse_tesseract_tsv_empty():
+    """
+
+    :return:
+    """
+    words = parse_tesseract_tsv("")
+    assert len(words) == 0 and generate_text_from_tesseract_words(words) == ""
+
+
+def test_generate_text_from_tesseract_words_matches_dataframe():
+    """
+
+    :return:
+    """
+    words = parse_tesseract_tsv(read_test_tsv())
+    dataframe = pd.read_pickle(TEST_DATAFRAME)
+    assert generate_text_from_tesseract_words(words) == generate_text_from_ocr_output(
+        dataframe
+    )
+
+
+def test_ocr_using_tesseract_engine_parsers_match():
+    """
+
+    :return:
+    """
+    assert ocr_using_tesseract_engine(
+        TESTFILE_IMAGE_PATH, output_parser="tsv"
+    ) == ocr_using_tesseract_engine(TESTFILE_IMAGE_PATH, output_parser="dataframe")